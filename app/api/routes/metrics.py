@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.services.lastfm_async import singleflight_stats as async_singleflight_stats
+from app.services.lastfm_service import cache_stats, rate_limiter_stats, singleflight_stats
+from app.utils.metrics import render_gauges, render_metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text format: span/request latency histograms plus cache, limiter and coalescing counters."""
+    extra = (
+        render_gauges("app_cache", cache_stats(), "Shared cache backend counter")
+        + render_gauges("app_lastfm_rate_limiter", rate_limiter_stats(), "Last.fm rate limiter state")
+        + render_gauges("app_lastfm_singleflight", singleflight_stats(), "Coalesced Last.fm calls (sync client)")
+        + render_gauges("app_lastfm_async_singleflight", async_singleflight_stats(), "Coalesced Last.fm calls (async client)")
+    )
+    return PlainTextResponse(render_metrics(extra), media_type="text/plain; version=0.0.4")
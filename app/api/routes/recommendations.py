@@ -1,11 +1,20 @@
-from fastapi import APIRouter, Query, HTTPException
-from typing import Optional, List, Dict, Any
-from pydantic import BaseModel
+from fastapi import APIRouter, Query, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Tuple
+from pydantic import BaseModel, Field, field_validator
+import asyncio
+import json
+import logging
 
-from app.services.lastfm_service import track_get_similar, artist_get_similar
+from app.services.lastfm_async import track_get_similar, artist_get_similar
 from app.services.personal_recommendations import get_personal_recommendations
-from app.services.discover_recommendations import get_discover_recommendations
+from app.services.discover_recommendations import get_discover_recommendations, iter_discover_events
+from app.services.rec_snapshots import get_snapshot_recommendations
+from app.core.config import settings
+from app.utils.ranking import top_k, top_k_indices
 
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -87,33 +96,53 @@ def _normalize_artist_tracks(artist_data: Dict[str, Any], reason: str) -> List[R
     )]
 
 
+async def _track_seed_recommendations(track: str, artist: str, limit: int) -> List[RecommendationResponse]:
+    """Similar tracks for one (track, artist) seed via track.getSimilar, deduped, best first."""
+    tracks_data = (await track_get_similar(track=track, artist=artist, limit=limit)).get("similartracks", {}).get("track", [])
+    if not tracks_data:
+        return []
+    if isinstance(tracks_data, dict):
+        tracks_data = [tracks_data]
+    
+    recommendations = []
+    for track_data in tracks_data:
+        match_score = track_data.get("match")
+        try:
+            match_score = float(match_score) if match_score else None
+        except (ValueError, TypeError):
+            match_score = None
+        
+        normalized = _normalize_track_from_similar(track_data, reason=f"Similar to {track} by {artist}", match_score=match_score)
+        if normalized:
+            recommendations.append(normalized)
+    
+    return _dedupe_recommendations(recommendations, limit=limit)
+
+
+async def _artist_seed_recommendations(artist: str, limit: int) -> List[RecommendationResponse]:
+    """Similar artists for one artist seed via artist.getSimilar, deduped, best first."""
+    artists_data = (await artist_get_similar(artist=artist, limit=limit)).get("similarartists", {}).get("artist", [])
+    if not artists_data:
+        return []
+    if isinstance(artists_data, dict):
+        artists_data = [artists_data]
+    
+    recommendations = []
+    for artist_data in artists_data:
+        recommendations.extend(_normalize_artist_tracks(artist_data, reason=f"Similar to {artist}"))
+    
+    return _dedupe_recommendations(recommendations, limit=limit)
+
+
 @router.get("/track", response_model=List[RecommendationResponse])
-def get_track_recommendations(
+async def get_track_recommendations(
     track: str = Query(..., description="Track name"),
     artist: str = Query(..., description="Artist name"),
     limit: int = Query(10, ge=1, le=50, description="Number of recommendations to return"),
 ):
     """Get similar tracks based on a specific track using Last.fm track.getSimilar."""
     try:
-        tracks_data = track_get_similar(track=track, artist=artist, limit=limit).get("similartracks", {}).get("track", [])
-        if not tracks_data:
-            return []
-        if isinstance(tracks_data, dict):
-            tracks_data = [tracks_data]
-        
-        recommendations = []
-        for track_data in tracks_data:
-            match_score = track_data.get("match")
-            try:
-                match_score = float(match_score) if match_score else None
-            except (ValueError, TypeError):
-                match_score = None
-            
-            normalized = _normalize_track_from_similar(track_data, reason=f"Similar to {track} by {artist}", match_score=match_score)
-            if normalized:
-                recommendations.append(normalized)
-        
-        return _dedupe_recommendations(recommendations, limit=limit)
+        return await _track_seed_recommendations(track, artist, limit)
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
@@ -121,23 +150,13 @@ def get_track_recommendations(
 
 
 @router.get("/artist", response_model=List[RecommendationResponse])
-def get_artist_recommendations(
+async def get_artist_recommendations(
     artist: str = Query(..., description="Artist name"),
     limit: int = Query(10, ge=1, le=50, description="Number of recommendations to return"),
 ):
     """Get similar artists based on a specific artist using Last.fm artist.getSimilar."""
     try:
-        artists_data = artist_get_similar(artist=artist, limit=limit).get("similarartists", {}).get("artist", [])
-        if not artists_data:
-            return []
-        if isinstance(artists_data, dict):
-            artists_data = [artists_data]
-        
-        recommendations = []
-        for artist_data in artists_data:
-            recommendations.extend(_normalize_artist_tracks(artist_data, reason=f"Similar to {artist}"))
-        
-        return _dedupe_recommendations(recommendations, limit=limit)
+        return await _artist_seed_recommendations(artist, limit)
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
@@ -145,7 +164,8 @@ def get_artist_recommendations(
 
 
 @router.get("/personal", response_model=List[RecommendationResponse])
-def get_personal_recommendations_endpoint(
+async def get_personal_recommendations_endpoint(
+    response: Response,
     user_id: str = Query(..., description="Authenticated user ID (e.g. Supabase auth user id)"),
     limit: int = Query(20, ge=1, le=50, description="Number of recommendations to return"),
 ):
@@ -154,9 +174,17 @@ def get_personal_recommendations_endpoint(
     top tracks and artists, candidates from Last.fm, reranked by a personal model
     (artist affinity, liked artists, already-logged penalty, Last.fm score).
     Requires Supabase configured and listening_logs data for the user.
+    With REC_SNAPSHOTS_ENABLED, served from the user's precomputed snapshot (X-Snapshot-* headers).
+    X-Failed-Seeds is the number of seeds whose Last.fm lookups failed or timed out:
+    when non-zero, the list was built from fewer candidates than usual.
     """
     try:
-        recs = get_personal_recommendations(user_id=user_id, limit=limit)
+        if settings.REC_SNAPSHOTS_ENABLED:
+            recs, headers = await run_in_threadpool(get_snapshot_recommendations, "personal", user_id, limit)
+            response.headers.update(headers)
+        else:
+            recs, failed_seeds = await run_in_threadpool(get_personal_recommendations, user_id=user_id, limit=limit)
+            response.headers["X-Failed-Seeds"] = str(failed_seeds)
         out = [RecommendationResponse(**r) for r in recs]
         return _dedupe_recommendations(out, limit=limit)
     except Exception as e:
@@ -164,7 +192,8 @@ def get_personal_recommendations_endpoint(
 
 
 @router.get("/discover", response_model=List[RecommendationResponse])
-def get_discover_recommendations_endpoint(
+async def get_discover_recommendations_endpoint(
+    response: Response,
     user_id: Optional[str] = Query(None, description="Optional user ID for personalized discover (from your logged artists, tags, etc.)"),
     limit: int = Query(30, ge=1, le=50, description="Number of recommendations to return"),
 ):
@@ -172,17 +201,65 @@ def get_discover_recommendations_endpoint(
     Discover: recommendations from your logged artists (artist.getSimilar), tags (tag.getTopArtists,
     tag.getTopTracks, tag.getTopAlbums) and global charts (chart.getTopArtists, chart.getTopTracks).
     If user_id is omitted, returns chart-based recommendations only.
+    With REC_SNAPSHOTS_ENABLED, a user's discover list is served from their precomputed snapshot.
     """
     try:
-        recs = get_discover_recommendations(user_id=user_id, limit=limit)
+        if settings.REC_SNAPSHOTS_ENABLED and user_id:
+            recs, headers = await run_in_threadpool(get_snapshot_recommendations, "discover", user_id, limit)
+            response.headers.update(headers)
+        else:
+            recs = await run_in_threadpool(get_discover_recommendations, user_id=user_id, limit=limit)
         out = [RecommendationResponse(**r) for r in recs]
         return _dedupe_recommendations(out, limit=limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Discover recommendations failed: {str(e)}")
 
 
+def _ndjson_events(events: Iterable[Dict[str, Any]], limit: int) -> Iterator[bytes]:
+    """Encode discover events as NDJSON lines; items get the RecommendationResponse shape."""
+    try:
+        for event in events:
+            items = [RecommendationResponse(**r) for r in event.get("items", [])]
+            if event["event"] == "ranked":
+                items = _dedupe_recommendations(items, limit=limit)
+            payload = {**event, "items": [item.model_dump() for item in items]}
+            yield (json.dumps(payload) + "\n").encode("utf-8")
+    except Exception as e:
+        # Headers are already sent, so report the failure in-band
+        logger.error(f"Discover stream failed: {e}")
+        yield (json.dumps({"event": "error", "detail": f"Discover recommendations failed: {str(e)}"}) + "\n").encode("utf-8")
+
+
+@router.get("/discover/stream")
+async def stream_discover_recommendations_endpoint(
+    user_id: Optional[str] = Query(None, description="Optional user ID for personalized discover (from your logged artists, tags, etc.)"),
+    limit: int = Query(30, ge=1, le=50, description="Number of recommendations in the final ranked list"),
+):
+    """
+    Discover as a stream of newline-delimited JSON events, so the page can render
+    sections as their Last.fm calls return instead of waiting for the slowest one:
+    {"event": "section", "section", "title", "items"} per section (because_you_liked,
+    because_you_like, when_youre_feeling, top_this_week; fastest first, no item twice),
+    then {"event": "ranked", "items", "dropped"} with the same list /discover returns.
+    A failure after the stream started is sent as {"event": "error", "detail"}.
+    With REC_SNAPSHOTS_ENABLED, a user's stream is just the ranked event from their snapshot.
+    """
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if settings.REC_SNAPSHOTS_ENABLED and user_id:
+        try:
+            recs, snapshot_headers = await run_in_threadpool(get_snapshot_recommendations, "discover", user_id, limit)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Discover recommendations failed: {str(e)}")
+        headers.update(snapshot_headers)
+        events: Iterable[Dict[str, Any]] = [{"event": "ranked", "items": recs, "dropped": 0}]
+    else:
+        events = iter_discover_events(user_id=user_id, limit=limit)
+    # A sync iterator: Starlette advances it in the threadpool, so the blocking Last.fm calls stay off the loop
+    return StreamingResponse(_ndjson_events(events, limit), media_type="application/x-ndjson", headers=headers)
+
+
 @router.get("/combined", response_model=List[RecommendationResponse])
-def get_combined_recommendations(
+async def get_combined_recommendations(
     track: Optional[str] = Query(None, description="Track name (optional)"),
     artist: Optional[str] = Query(None, description="Artist name (required if track is provided)"),
     limit: int = Query(20, ge=1, le=50, description="Total number of recommendations to return"),
@@ -195,8 +272,17 @@ def get_combined_recommendations(
     seen_ids = set()
     
     try:
+        # Fetch similar tracks and similar artists concurrently
         if track:
-            tracks_data = track_get_similar(track=track, artist=artist, limit=limit).get("similartracks", {}).get("track", [])
+            similar_tracks, similar_artists = await asyncio.gather(
+                track_get_similar(track=track, artist=artist, limit=limit),
+                artist_get_similar(artist=artist, limit=limit),
+            )
+        else:
+            similar_tracks, similar_artists = {}, await artist_get_similar(artist=artist, limit=limit)
+
+        if track:
+            tracks_data = similar_tracks.get("similartracks", {}).get("track", [])
             if isinstance(tracks_data, dict):
                 tracks_data = [tracks_data]
             
@@ -212,7 +298,7 @@ def get_combined_recommendations(
                     seen_ids.add(normalized.id)
                     all_recommendations.append(normalized)
         
-        artists_data = artist_get_similar(artist=artist, limit=limit).get("similarartists", {}).get("artist", [])
+        artists_data = similar_artists.get("similarartists", {}).get("artist", [])
         if isinstance(artists_data, dict):
             artists_data = [artists_data]
         
@@ -222,9 +308,116 @@ def get_combined_recommendations(
                     seen_ids.add(normalized.id)
                     all_recommendations.append(normalized)
         
-        all_recommendations.sort(key=lambda x: x.match_score if x.match_score is not None else 0.0, reverse=True)
-        return _dedupe_recommendations(all_recommendations, limit=limit)
+        ranked = top_k(all_recommendations, limit, key=lambda x: x.match_score if x.match_score is not None else 0.0)
+        return _dedupe_recommendations(ranked, limit=limit)
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get combined recommendations: {str(e)}")
+
+
+class BatchSeed(BaseModel):
+    track: Optional[str] = None  # with artist: track.getSimilar; without: artist.getSimilar
+    artist: str = Field(..., min_length=1)
+
+    @field_validator("track", "artist", mode="before")
+    @classmethod
+    def strip_names(cls, v):
+        """Strip whitespace so a blank artist is rejected (422) and a blank track means no track."""
+        if isinstance(v, str):
+            v = v.strip()
+        return v
+
+    @field_validator("track")
+    @classmethod
+    def blank_track_is_none(cls, v: Optional[str]) -> Optional[str]:
+        return v or None
+
+
+class BatchRecommendationRequest(BaseModel):
+    seeds: List[BatchSeed] = Field(..., min_length=1, max_length=settings.BATCH_MAX_SEEDS)
+    limit_per_seed: int = Field(10, ge=1, le=50, description="Recommendations per seed group")
+    limit: int = Field(50, ge=1, le=200, description="Length of the merged list")
+
+
+class SeedRecommendations(BaseModel):
+    seed: BatchSeed
+    recommendations: List[RecommendationResponse]
+    error: Optional[str] = None
+
+
+class BatchRecommendationResponse(BaseModel):
+    groups: List[SeedRecommendations]
+    merged: List[RecommendationResponse]
+
+
+def _seed_key(seed: BatchSeed) -> Tuple[str, str]:
+    return _normalize_text_key(seed.artist), _normalize_text_key(seed.track or "")
+
+
+RRF_K = 60  # reciprocal rank fusion damping: rank 1 scores 1/61, rank 10 scores 1/70
+
+
+def _merge_seed_groups(groups: List[List[RecommendationResponse]], limit: int) -> List[RecommendationResponse]:
+    """
+    One ranked list from per-seed lists by reciprocal rank fusion: an item scores
+    sum(1 / (RRF_K + rank)) over the groups it appears in, so items several seeds agree
+    on rise to the top. Ranks rather than match scores, because artist.getSimilar
+    results carry none. Each item keeps the reason from its best-ranked group.
+    """
+    scores: Dict[str, float] = {}
+    first: Dict[str, Tuple[int, RecommendationResponse]] = {}
+    for group in groups:
+        for rank, item in enumerate(group, start=1):
+            key = item.id or f"{_normalize_text_key(item.artist)}::{_normalize_text_key(item.track)}"
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank)
+            if key not in first or rank < first[key][0]:
+                first[key] = (rank, item)
+    keys = list(scores)
+    return [first[keys[i]][1] for i in top_k_indices([scores[k] for k in keys], limit)]
+
+
+@router.post("/batch", response_model=BatchRecommendationResponse)
+async def get_batch_recommendations(body: BatchRecommendationRequest):
+    """
+    Recommendations for many seeds in one request: (track, artist) seeds use
+    track.getSimilar, artist-only seeds artist.getSimilar. Seeds are looked up
+    concurrently (BATCH_MAX_CONCURRENCY at a time, BATCH_DEADLINE_SECONDS overall) and
+    repeated seeds only once. Returns one group per seed, in request order (a seed that
+    failed or timed out has an error and no recommendations), plus a merged list
+    deduplicated across seeds and ranked by reciprocal rank fusion.
+    """
+    semaphore = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+
+    async def _lookup(seed: BatchSeed) -> List[RecommendationResponse]:
+        async with semaphore:
+            if seed.track:
+                return await _track_seed_recommendations(seed.track, seed.artist, body.limit_per_seed)
+            return await _artist_seed_recommendations(seed.artist, body.limit_per_seed)
+
+    # Shared dedupe: identical seeds (after normalization) share one lookup
+    tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+    for seed in body.seeds:
+        key = _seed_key(seed)
+        if key not in tasks:
+            tasks[key] = asyncio.create_task(_lookup(seed))
+    done, pending = await asyncio.wait(tasks.values(), timeout=settings.BATCH_DEADLINE_SECONDS)
+    for task in pending:
+        task.cancel()
+    # Let the cancelled lookups unwind (and release the semaphore) before responding
+    await asyncio.gather(*pending, return_exceptions=True)
+    if pending:
+        logger.warning(f"Batch deadline reached with {len(pending)} of {len(tasks)} seeds unfinished")
+
+    groups: List[SeedRecommendations] = []
+    for seed in body.seeds:
+        task = tasks[_seed_key(seed)]
+        if task in pending:
+            groups.append(SeedRecommendations(seed=seed, recommendations=[], error="Timed out"))
+        elif task.exception() is not None:
+            groups.append(SeedRecommendations(seed=seed, recommendations=[], error=str(task.exception())))
+        else:
+            groups.append(SeedRecommendations(seed=seed, recommendations=task.result()))
+
+    unique_groups = [task.result() for task in tasks.values() if task in done and task.exception() is None]
+    return BatchRecommendationResponse(groups=groups, merged=_merge_seed_groups(unique_groups, body.limit))
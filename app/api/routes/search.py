@@ -1,7 +1,15 @@
 from fastapi import APIRouter, Query, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from typing import Optional, List
 from pydantic import BaseModel
-from app.services.lastfm_service import track_search, artist_search
+import logging
+from app.services.lastfm_async import track_search, artist_search, track_get_info
+from app.services.personal_model import score_search_results_batch
+from app.services.search_enrichment import enrich_tracks_concurrently
+from app.services.user_profile import get_user_profile
+from app.utils.ranking import top_k_indices
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -11,6 +19,10 @@ class TrackResponse(BaseModel):
     artist: str
     id: str
     source: str = "lastfm"
+    # Only set in personalized mode (?user_id=...)
+    tags: Optional[List[str]] = None
+    genre: Optional[str] = None
+    personal_score: Optional[float] = None
 
 
 class ArtistResponse(BaseModel):
@@ -28,16 +40,38 @@ def _track_text_key(track_name: str, artist_name: str) -> str:
     return f"{_normalize_text_key(artist_name)}::{_normalize_text_key(track_name)}"
 
 
-@router.get("/search", response_model=List[TrackResponse])
-def search_tracks(
+async def _personalize(tracks: List[TrackResponse], user_id: str) -> List[TrackResponse]:
+    """
+    Enrich results with track.getInfo tags/genre (bounded concurrency, overall deadline)
+    and rerank them with the user's personal model. Returns tracks unchanged if the
+    user has no profile.
+    """
+    profile = await run_in_threadpool(get_user_profile, user_id)
+    if not profile:
+        return tracks
+
+    enriched, _ = await enrich_tracks_concurrently([t.model_dump() for t in tracks], track_get_info)
+    scores = score_search_results_batch(enriched, profile)
+    return [
+        TrackResponse(**{**enriched[i], "personal_score": round(float(scores[i]), 4)})
+        for i in top_k_indices(scores, None)
+    ]
+
+
+@router.get("/search", response_model=List[TrackResponse], response_model_exclude_none=True)
+async def search_tracks(
     q: str = Query(..., description="Search query (track name)"),
     artist: Optional[str] = Query(None, description="Optional artist name to filter results"),
     limit: int = Query(20, ge=1, le=50, description="Number of results to return"),
     page: int = Query(1, ge=1, description="Page number"),
+    user_id: Optional[str] = Query(None, description="Rerank results for this user (personalized search)"),
 ):
-    """Search for tracks using Last.fm API."""
+    """
+    Search for tracks using Last.fm API.
+    With user_id, results are enriched with tags/genre and reranked by the personal model.
+    """
     try:
-        result = track_search(track=q, artist=artist, limit=limit, page=page)
+        result = await track_search(track=q, artist=artist, limit=limit, page=page)
         tracks_data = result.get("results", {}).get("trackmatches", {}).get("track", [])
         
         if not tracks_data:
@@ -69,6 +103,11 @@ def search_tracks(
                 source="lastfm",
             ))
         
+        if user_id and normalized_tracks:
+            try:
+                return await _personalize(normalized_tracks, user_id)
+            except Exception as e:
+                logger.error(f"Personalized search failed, returning plain results: {e}")
         return normalized_tracks
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -77,14 +116,14 @@ def search_tracks(
 
 
 @router.get("/search/artists", response_model=List[ArtistResponse])
-def search_artists(
+async def search_artists(
     q: str = Query(..., description="Artist name to search"),
     limit: int = Query(20, ge=1, le=50, description="Number of results to return"),
     page: int = Query(1, ge=1, description="Page number"),
 ):
     """Search for artists using Last.fm artist.search."""
     try:
-        result = artist_search(artist=q, limit=limit, page=page)
+        result = await artist_search(artist=q, limit=limit, page=page)
         artists_data = result.get("results", {}).get("artistmatches", {}).get("artist", [])
 
         if not artists_data:
@@ -9,6 +9,93 @@ class Settings(BaseSettings):
     LASTFM_API_KEY: str = Field(default_factory=lambda: os.getenv("LASTFM_API_KEY", ""))
     LASTFM_BASE_URL: str = "https://ws.audioscrobbler.com/2.0/"
 
+    # Last.fm HTTP transport (shared keep-alive session)
+    LASTFM_POOL_CONNECTIONS: int = 4  # number of per-host pools kept alive
+    LASTFM_POOL_MAXSIZE: int = 32  # max open connections per host
+    LASTFM_POOL_BLOCK: bool = False  # wait for a free connection instead of opening extras
+    LASTFM_MAX_RETRIES: int = 2  # retries on 5xx and connection errors (429 is paced by the rate limiter)
+    LASTFM_BACKOFF_FACTOR: float = 0.3  # sleep = factor * 2^(retry - 1)
+
+    # Client-side Last.fm rate limiting (one API key for the whole process)
+    LASTFM_RATE_LIMIT_PER_SECOND: float = 5.0
+    LASTFM_RATE_LIMIT_BURST: float = 10.0
+    LASTFM_RATE_LIMIT_BACKGROUND_RESERVE: float = 0.25  # share of the bucket kept for interactive calls
+    LASTFM_RATE_LIMIT_MAX_WAIT_SECONDS: float = 10.0
+    LASTFM_RATE_LIMIT_RETRIES: int = 2  # retries after Last.fm error 29 / HTTP 429
+
+    # Shared cache backend for Last.fm responses and user profiles:
+    # "memory" (per worker) or "sqlite" (shared on local disk across workers/restarts)
+    CACHE_BACKEND: str = "memory"
+    CACHE_SQLITE_PATH: str = ".cache/musicboxd_cache.sqlite3"
+    CACHE_MAX_ENTRIES: int = 5000
+
+    # Last.fm response cache (TTLs per method live in lastfm_service.CACHE_TTLS)
+    LASTFM_CACHE_ENABLED: bool = True
+
+    # Build profiles from the get_user_preference_summary RPC (supabase sql/user_preference_aggregates.sql)
+    # instead of aggregating raw listening_logs and artist_logs in Python
+    PROFILE_USE_SQL_AGGREGATES: bool = False
+
+    # Read listening_logs + artist_logs with tag names through one RPC (supabase sql/profile_logs.sql).
+    # If the functions are missing the per-table queries are used (without artist logs) for a while
+    PROFILE_USE_LOGS_RPC: bool = True
+    PROFILE_LOGS_RPC_RETRY_SECONDS: float = 300.0
+
+    # Max age of a cached profile snapshot before a full rebuild (new logs are folded in incrementally)
+    PROFILE_CACHE_TTL_SECONDS: float = 6 * 3600.0
+
+    # Discover fan-out: seed sections are fetched concurrently under a total deadline
+    DISCOVER_MAX_CONCURRENCY: int = 6
+    DISCOVER_DEADLINE_SECONDS: float = 8.0
+
+    # Personal recommendations: per-seed Last.fm lookups run in parallel
+    PERSONAL_MAX_CONCURRENCY: int = 8
+    PERSONAL_SEED_TIMEOUT_SECONDS: float = 5.0
+    PERSONAL_DEADLINE_SECONDS: float = 10.0
+
+    # Batch recommendations: seeds per request, looked up concurrently under a total deadline
+    BATCH_MAX_SEEDS: int = 50
+    BATCH_MAX_CONCURRENCY: int = 8
+    BATCH_DEADLINE_SECONDS: float = 10.0
+
+    # Personalized search: track.getInfo enrichment runs concurrently under a total deadline
+    SEARCH_ENRICH_MAX_CONCURRENCY: int = 8
+    SEARCH_ENRICH_DEADLINE_SECONDS: float = 3.0
+    SEARCH_TAGS_CACHE_TTL_SECONDS: float = 7 * 24 * 3600.0
+
+    # Local track metadata store (tags/genre/similar lists persisted on disk)
+    TRACK_METADATA_ENABLED: bool = True
+    TRACK_METADATA_PATH: str = ".cache/track_metadata.sqlite3"
+    TRACK_METADATA_SIMILAR_MAX_AGE_SECONDS: float = 30 * 24 * 3600.0
+
+    # Offline warm-up job (python -m app.jobs.warm)
+    WARM_MAX_CONCURRENCY: int = 4
+    WARM_CHECKPOINT_PATH: str = ".cache/warm_checkpoint.json"
+    WARM_CHECKPOINT_MAX_AGE_SECONDS: float = 6 * 3600.0  # resume only within this window
+
+    # Precomputed recommendation snapshots for /personal and /discover (stale-while-revalidate)
+    REC_SNAPSHOTS_ENABLED: bool = False
+    REC_SNAPSHOT_POOL_SIZE: int = 50  # ranked items kept per user (max endpoint limit)
+    REC_SNAPSHOT_FRESH_SECONDS: float = 15 * 60.0  # served without a refresh
+    REC_SNAPSHOT_MAX_STALE_SECONDS: float = 24 * 3600.0  # served while a refresh runs; dropped after
+    REC_SNAPSHOT_WORKERS: int = 2
+    REC_SNAPSHOT_SWEEP_SECONDS: float = 60.0  # how often active users are checked for new logs
+    REC_SNAPSHOT_ACTIVE_SECONDS: float = 2 * 3600.0  # users requested within this window are kept warm
+
+    # Local item-item co-occurrence index (python -m app.jobs.build_cooccurrence):
+    # "off", "blend" (alongside Last.fm similar) or "only" (Last.fm only for seeds the index doesn't know)
+    COOCCURRENCE_MODE: str = "blend"
+    COOCCURRENCE_INDEX_PATH: str = ".cache/cooccurrence_index.json.gz"
+
+    # "Listeners like you": LSH index over user taste vectors (python -m app.jobs.build_taste_index).
+    # Opt-in: it mixes other users' top tracks into /personal. Users seen by /personal are added
+    # incrementally, but without a built index each worker only knows the users it has served.
+    TASTE_NEIGHBORS_ENABLED: bool = False
+    TASTE_INDEX_PATH: str = ".cache/taste_index.npz"
+    TASTE_NEIGHBORS_K: int = 20  # similar users whose top tracks become candidates
+    TASTE_INDEX_WRITE_INTERVAL_SECONDS: float = 5.0  # how often queued profile inserts are applied
+    TASTE_INDEX_COMPACT_FRACTION: float = 0.25  # compact once retired rows exceed this share of rows
+
     # Supabase (for personal recommendations from listening_logs)
     # Try VITE_ prefixed vars first (for consistency), fallback to non-prefixed
     SUPABASE_URL: str | None = Field(default_factory=lambda: os.getenv("VITE_SUPABASE_URL") or os.getenv("SUPABASE_URL"))
@@ -0,0 +1,79 @@
+"""
+Build the local item-item co-occurrence index from all users' logs.
+
+    python -m app.jobs.build_cooccurrence [--output PATH] [--neighbors 50] [--min-users 2]
+
+Reads listening_logs and artist_logs page by page, builds the index
+(app/services/cooccurrence.py) and writes it to COOCCURRENCE_INDEX_PATH. Running
+app processes pick up the new file on their next reload check.
+"""
+from typing import Any, Dict, Iterator, List
+import argparse
+import logging
+import sys
+import time
+
+from app.core.config import settings
+from app.db.supabase_client import get_supabase
+from app.services.cooccurrence import build_index, save_index
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 1000
+
+
+def _iter_rows(supabase, table: str, columns: str) -> Iterator[Dict[str, Any]]:
+    """Every row of a table, PAGE_SIZE at a time in id order."""
+    start = 0
+    while True:
+        res = supabase.table(table).select(columns).order("id").range(start, start + PAGE_SIZE - 1).execute()
+        rows: List[Dict[str, Any]] = res.data or []
+        yield from rows
+        if len(rows) < PAGE_SIZE:
+            return
+        start += PAGE_SIZE
+
+
+def main(argv: List[str] | None = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Build the local item-item co-occurrence index")
+    parser.add_argument("--output", default=None, help="index file (default: COOCCURRENCE_INDEX_PATH)")
+    parser.add_argument("--neighbors", type=int, default=50, help="neighbors kept per item")
+    parser.add_argument("--min-users", type=int, default=2, help="drop pairs co-logged by fewer users")
+    parser.add_argument("--max-items-per-user", type=int, default=200)
+    parser.add_argument("--skip-artist-logs", action="store_true")
+    args = parser.parse_args(argv)
+
+    supabase = get_supabase()
+    if not supabase:
+        logger.error("Supabase not configured (SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY)")
+        return 1
+
+    started = time.monotonic()
+    listening_logs = list(_iter_rows(supabase, "listening_logs", "id, user_id, artist, track, rating, favorite, logged_at"))
+    artist_logs: List[Dict[str, Any]] = []
+    if not args.skip_artist_logs:
+        try:
+            artist_logs = list(_iter_rows(supabase, "artist_logs", "id, user_id, artist_name, favorite, logged_at"))
+        except Exception as e:
+            logger.warning(f"Skipping artist_logs: {e}")
+    logger.info(f"Loaded {len(listening_logs)} listening_logs and {len(artist_logs)} artist_logs")
+
+    payload = build_index(
+        listening_logs,
+        artist_logs,
+        max_items_per_user=args.max_items_per_user,
+        neighbors=args.neighbors,
+        min_users=args.min_users,
+    )
+    output = args.output or settings.COOCCURRENCE_INDEX_PATH
+    save_index(payload, output)
+    logger.info(
+        f"Wrote {output}: {len(payload['artists'])} artists, {len(payload['tracks'])} tracks "
+        f"from {payload['users']} users in {time.monotonic() - started:.1f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Build the "listeners like you" taste index from all users' logs.
+
+    python -m app.jobs.build_taste_index [--output PATH] [--tables 32] [--bits 12] [--probes 8]
+
+Reads listening_logs and artist_logs page by page, folds each user's rows and
+their tags into a profile (same weights and LOG_LIMIT window per table as
+get_user_profile), vectorizes them and bulk-loads a TasteIndex
+(app/services/taste_index.py), written to TASTE_INDEX_PATH. App processes load it
+on start and keep adding users they see.
+"""
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Tuple
+import argparse
+import logging
+import sys
+import time
+
+from app.core.config import settings
+from app.db.supabase_client import get_supabase
+from app.jobs.build_cooccurrence import _iter_rows
+from app.services.taste_index import TasteIndex, iter_profiles_to_csr
+from app.services.user_profile import (
+    ARTIST_LOG_COLUMNS,
+    LOG_COLUMNS,
+    LOG_LIMIT,
+    ProfileSnapshot,
+    UserProfile,
+    _fetch_log_tag_names,
+)
+
+logger = logging.getLogger(__name__)
+
+TAG_BATCH = 500  # log ids per log_tags / artist_log_tags lookup
+
+
+def _recent(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Like get_user_profile: only the most recent LOG_LIMIT logs of each table count
+    rows.sort(key=lambda r: r.get("logged_at") or "", reverse=True)
+    return rows[:LOG_LIMIT]
+
+
+def _tag_names(supabase, rows: List[Dict[str, Any]], link_table: str) -> Dict[Any, List[str]]:
+    tag_names: Dict[Any, List[str]] = {}
+    log_ids = [r["id"] for r in rows if r.get("id")]
+    for i in range(0, len(log_ids), TAG_BATCH):
+        tag_names.update(_fetch_log_tag_names(supabase, log_ids[i:i + TAG_BATCH], link_table=link_table))
+    return tag_names
+
+
+def _profiles(
+    supabase,
+    rows_by_user: Dict[Any, List[Dict[str, Any]]],
+    artist_rows_by_user: Dict[Any, List[Dict[str, Any]]],
+    with_tags: bool,
+) -> Iterator[Tuple[str, UserProfile]]:
+    for user_id in dict.fromkeys([*rows_by_user, *artist_rows_by_user]):
+        rows = _recent(rows_by_user.get(user_id, []))
+        artist_rows = _recent(artist_rows_by_user.get(user_id, []))
+        tag_names: Dict[Any, List[str]] = {}
+        if with_tags:
+            tag_names = _tag_names(supabase, rows, "log_tags")
+            artist_tag_names = _tag_names(supabase, artist_rows, "artist_log_tags")
+            artist_rows = [{**r, "tag_names": artist_tag_names.get(r.get("id"), [])} for r in artist_rows]
+        snap = ProfileSnapshot()
+        snap.fold(rows, tag_names)
+        snap.fold_artist_logs(artist_rows)
+        yield str(user_id), snap.to_profile()
+
+
+def _load_by_user(supabase, table: str, columns: str) -> Dict[Any, List[Dict[str, Any]]]:
+    rows_by_user: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+    for row in _iter_rows(supabase, table, f"user_id, {columns}"):
+        rows_by_user[row.get("user_id")].append(row)
+    return rows_by_user
+
+
+def main(argv: List[str] | None = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Build the listeners-like-you taste index")
+    parser.add_argument("--output", default=None, help="index file (default: TASTE_INDEX_PATH)")
+    parser.add_argument("--tables", type=int, default=32, help="LSH hash tables")
+    parser.add_argument("--bits", type=int, default=12, help="bits per table signature")
+    parser.add_argument("--probes", type=int, default=8, help="extra buckets probed per table at query time")
+    parser.add_argument("--skip-tags", action="store_true", help="leave log tags out of the profiles (faster)")
+    parser.add_argument("--skip-artist-logs", action="store_true", help="build from listening_logs only")
+    args = parser.parse_args(argv)
+
+    supabase = get_supabase()
+    if not supabase:
+        logger.error("Supabase not configured (SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY)")
+        return 1
+
+    started = time.monotonic()
+    rows_by_user = _load_by_user(supabase, "listening_logs", LOG_COLUMNS)
+    artist_rows_by_user: Dict[Any, List[Dict[str, Any]]] = {}
+    if not args.skip_artist_logs:
+        try:
+            artist_rows_by_user = _load_by_user(supabase, "artist_logs", ARTIST_LOG_COLUMNS)
+        except Exception as e:
+            logger.warning(f"Skipping artist_logs: {e}")
+    logger.info(f"Loaded listening_logs for {len(rows_by_user)} users and artist_logs for {len(artist_rows_by_user)} users")
+
+    # Profile rollups log per user; keep the job output readable
+    logging.getLogger("app.services.user_profile").setLevel(logging.WARNING)
+    users, indptr, idx, val, tracks = iter_profiles_to_csr(
+        _profiles(supabase, rows_by_user, artist_rows_by_user, not args.skip_tags)
+    )
+    index = TasteIndex(n_tables=args.tables, n_bits=args.bits, probes=args.probes)
+    index.add_batch(users, indptr, idx, val, tracks)
+
+    output = args.output or settings.TASTE_INDEX_PATH
+    index.save(output)
+    logger.info(f"Wrote {output}: {index.stats()} in {time.monotonic() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Offline warm-up: prefetch the Last.fm responses users hit most, so the first
+requests after a deploy are served from cache.
+
+    python -m app.jobs.warm [--top-tracks 50] [--top-artists 50] [--fresh]
+
+Prefetches:
+- chart.getTopArtists / chart.getTopTracks
+- tag.getTopTracks / tag.getTopArtists for every preset_tags name
+- track.getSimilar / artist.getSimilar for the most-logged tracks and artists
+
+Arguments match the live call sites, so the cache keys line up. Warming only helps
+other processes when the cache is shared (CACHE_BACKEND=sqlite); similar-track
+lists also land in the local track metadata store.
+
+Calls run on a bounded pool at background priority under the shared rate limiter.
+Finished tasks are checkpointed, so an interrupted or rate-limited run resumes
+where it stopped; the checkpoint is removed once a run completes.
+"""
+from collections import Counter
+from typing import Any, Callable, Dict, List, Tuple
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+from app.core.config import settings
+from app.db.supabase_client import get_supabase
+from app.utils.fanout import fan_out
+from app.utils.rate_limiter import Priority, request_priority
+from app.services.discover_recommendations import _similar_tracks
+from app.services.lastfm_service import (
+    artist_get_similar,
+    chart_get_top_artists,
+    chart_get_top_tracks,
+    close_session,
+    tag_get_top_artists,
+    tag_get_top_tracks,
+)
+
+logger = logging.getLogger(__name__)
+
+# Limits used by the live endpoints (cache keys include the limit)
+CHART_LIMIT = 10  # discover charts
+TAG_LIMIT = 5  # discover "When you're feeling (tag)"
+SIMILAR_LIMIT = 10  # personal recommendations, /track and /artist defaults
+DISCOVER_ARTIST_SIMILAR_LIMIT = 3  # discover "Because you like (artist)"
+
+LOG_SAMPLE = 5000  # recent listening_logs used to find popular seeds
+BATCH_SIZE = 50  # tasks per checkpoint write
+
+Task = Tuple[str, Callable[[], Any]]
+
+
+def _load_checkpoint(path: str, max_age: float) -> Tuple[float, set[str]]:
+    """(started_at, finished task keys) of an unfinished run, or a fresh start."""
+    now = time.time()
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return now, set()
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable checkpoint {path}: {e}")
+        return now, set()
+    started_at = float(data.get("started_at", 0))
+    if now - started_at > max_age:
+        # Entries warmed that long ago may have expired from the cache
+        logger.info(f"Checkpoint from {now - started_at:.0f}s ago is too old, starting over")
+        return now, set()
+    return started_at, set(data.get("done", []))
+
+
+def _save_checkpoint(path: str, started_at: float, done: set[str]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"started_at": started_at, "done": sorted(done)}, f)
+    os.replace(tmp, path)
+
+
+def _preset_tag_names(supabase) -> List[str]:
+    res = supabase.table("preset_tags").select("name").execute()
+    return sorted({(row.get("name") or "").strip() for row in (res.data or [])} - {""})
+
+
+def _popular_seeds(supabase, top_tracks: int, top_artists: int) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """Most-logged (track, artist) pairs and artists among the most recent LOG_SAMPLE logs."""
+    res = (
+        supabase.table("listening_logs")
+        .select("track, artist")
+        .order("logged_at", desc=True)
+        .limit(LOG_SAMPLE)
+        .execute()
+    )
+    track_counts: Counter = Counter()
+    artist_counts: Counter = Counter()
+    names: Dict[str, str] = {}  # normalized artist -> first spelling seen
+    for row in res.data or []:
+        artist = (row.get("artist") or "").strip()
+        track = (row.get("track") or "").strip()
+        if not artist:
+            continue
+        key = artist.lower()
+        names.setdefault(key, artist)
+        artist_counts[key] += 1
+        if track:
+            track_counts[(track, artist)] += 1
+    tracks = [t for t, _ in track_counts.most_common(top_tracks)]
+    artists = [names[a] for a, _ in artist_counts.most_common(top_artists)]
+    return tracks, artists
+
+
+def build_tasks(top_tracks: int, top_artists: int) -> List[Task]:
+    """Every (checkpoint key, call) pair for one warm-up run."""
+    tasks: List[Task] = [
+        ("chart:artists", lambda: chart_get_top_artists(limit=CHART_LIMIT)),
+        ("chart:tracks", lambda: chart_get_top_tracks(limit=CHART_LIMIT)),
+    ]
+
+    supabase = get_supabase()
+    if not supabase:
+        logger.warning("Supabase not configured: warming charts only")
+        return tasks
+
+    try:
+        tags = _preset_tag_names(supabase)
+    except Exception as e:
+        logger.error(f"Could not load preset_tags: {e}")
+        tags = []
+    for tag in tags:
+        tasks.append((f"tag_tracks:{tag}", lambda t=tag: tag_get_top_tracks(tag=t, limit=TAG_LIMIT)))
+        tasks.append((f"tag_artists:{tag}", lambda t=tag: tag_get_top_artists(tag=t, limit=TAG_LIMIT)))
+
+    try:
+        seed_tracks, seed_artists = _popular_seeds(supabase, top_tracks, top_artists)
+    except Exception as e:
+        logger.error(f"Could not load popular seeds from listening_logs: {e}")
+        seed_tracks, seed_artists = [], []
+    for track, artist in seed_tracks:
+        # Through discover's read-through helper so the list is also kept in the metadata store
+        tasks.append((
+            f"track_similar:{artist.lower()}::{track.lower()}",
+            lambda t=track, a=artist: _similar_tracks(t, a, SIMILAR_LIMIT),
+        ))
+    for artist in seed_artists:
+        tasks.append((f"artist_similar:{artist.lower()}", lambda a=artist: artist_get_similar(artist=a, limit=SIMILAR_LIMIT)))
+        tasks.append((
+            f"artist_similar_discover:{artist.lower()}",
+            lambda a=artist: artist_get_similar(artist=a, limit=DISCOVER_ARTIST_SIMILAR_LIMIT),
+        ))
+
+    logger.info(
+        f"Warm-up plan: 2 chart calls, {2 * len(tags)} tag calls, "
+        f"{len(seed_tracks)} track seeds, {len(seed_artists)} artist seeds"
+    )
+    return tasks
+
+
+def run(
+    top_tracks: int = 50,
+    top_artists: int = 50,
+    checkpoint_path: str | None = None,
+    fresh: bool = False,
+    max_concurrency: int | None = None,
+) -> Dict[str, int]:
+    """Run (or resume) a warm-up. Returns counts of done / skipped / failed tasks."""
+    checkpoint_path = checkpoint_path or settings.WARM_CHECKPOINT_PATH
+    max_concurrency = max_concurrency or settings.WARM_MAX_CONCURRENCY
+    if (settings.CACHE_BACKEND or "memory").strip().lower() == "memory":
+        logger.warning("CACHE_BACKEND=memory: warmed responses stay in this process; use sqlite to share them")
+
+    if fresh:
+        started_at, done = time.time(), set()
+    else:
+        started_at, done = _load_checkpoint(checkpoint_path, settings.WARM_CHECKPOINT_MAX_AGE_SECONDS)
+    tasks = [(key, fn) for key, fn in build_tasks(top_tracks, top_artists) if key not in done]
+    skipped = len(done)
+    failed = 0
+    logger.info(f"Warming {len(tasks)} tasks ({skipped} already done)")
+
+    # Background priority keeps part of the rate-limit budget free for live traffic
+    with request_priority(Priority.BACKGROUND):
+        for start in range(0, len(tasks), BATCH_SIZE):
+            batch = tasks[start:start + BATCH_SIZE]
+            results = fan_out([lambda fn=fn: fn() is not None for _, fn in batch], max_workers=max_concurrency)
+            for (key, _), ok in zip(batch, results):
+                if ok:
+                    done.add(key)
+                else:
+                    failed += 1
+            _save_checkpoint(checkpoint_path, started_at, done)
+            logger.info(f"Warm-up progress: {min(start + BATCH_SIZE, len(tasks))}/{len(tasks)}")
+
+    if failed == 0:
+        try:
+            os.remove(checkpoint_path)
+        except FileNotFoundError:
+            pass
+    else:
+        logger.warning(f"{failed} tasks failed; rerun to resume from {checkpoint_path}")
+    return {"done": len(tasks) - failed, "skipped": skipped, "failed": failed}
+
+
+def main(argv: List[str] | None = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Prefetch popular Last.fm responses into the shared cache")
+    parser.add_argument("--top-tracks", type=int, default=50, help="most-logged tracks to warm similar tracks for")
+    parser.add_argument("--top-artists", type=int, default=50, help="most-logged artists to warm similar artists for")
+    parser.add_argument("--checkpoint", default=None, help="checkpoint file (default: WARM_CHECKPOINT_PATH)")
+    parser.add_argument("--fresh", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--max-concurrency", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    started = time.monotonic()
+    try:
+        counts = run(args.top_tracks, args.top_artists, args.checkpoint, args.fresh, args.max_concurrency)
+    finally:
+        close_session()
+    logger.info(f"Warm-up finished in {time.monotonic() - started:.1f}s: {counts}")
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
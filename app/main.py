@@ -1,8 +1,16 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import logging
+import time
 from app.core.config import settings
+from app.services.lastfm_service import close_session
+from app.services.lastfm_async import close_client
+from app.services.rec_snapshots import stop_refresher
+from app.services.taste_index import stop_taste_writer
+from app.utils.metrics import collect_spans, observe_request, server_timing
 from app.api.routes.health import router as health_router
+from app.api.routes.metrics import router as metrics_router
 from app.api.routes.search import router as search_router
 from app.api.routes.recommendations import router as recommendations_router
 
@@ -12,7 +20,18 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-app = FastAPI(title="MusicBoxd API", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    stop_refresher()
+    stop_taste_writer()
+    # Release pooled Last.fm connections
+    close_session()
+    await close_client()
+
+
+app = FastAPI(title="MusicBoxd API", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,8 +39,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let browser clients read the degraded-result and snapshot freshness headers
+    expose_headers=["X-Failed-Seeds", "X-Snapshot-Status", "X-Snapshot-Age", "X-Snapshot-Built-At", "Server-Timing"],
 )
 
+
+def _route_template(scope) -> str:
+    """Matched route path with its router prefix, e.g. /api/recommendations/personal ("unmatched" for 404s)."""
+    route = scope.get("route")
+    template = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if not template:
+        return "unmatched"
+    # Included routers may report the path relative to their prefix; recover the prefix from the URL
+    concrete = template.format(**scope.get("path_params", {}))
+    path = scope.get("path", "")
+    prefix = path[: len(path) - len(concrete)] if path.endswith(concrete) else ""
+    return prefix + template
+
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """Per-request spans -> Server-Timing header; request latency -> /metrics."""
+    started = time.perf_counter()
+    status = 500
+    with collect_spans() as spans:
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            elapsed = time.perf_counter() - started
+            observe_request(request.method, _route_template(request.scope), status, elapsed)
+    response.headers["Server-Timing"] = server_timing(spans, elapsed)
+    return response
+
+
 app.include_router(health_router, tags=["health"])
+app.include_router(metrics_router, tags=["metrics"])
 app.include_router(search_router, prefix="/api", tags=["search"])
 app.include_router(recommendations_router, prefix="/api/recommendations", tags=["recommendations"])
@@ -0,0 +1,266 @@
+"""
+Pluggable cache backends for Last.fm responses and user profiles.
+
+- TTLCache: in-process LRU with per-entry TTL (default, per worker).
+- SQLiteCache: shared, persistent cache on local disk (WAL mode), so several
+  uvicorn workers share warm entries and survive restarts.
+
+Pick one with settings.CACHE_BACKEND ("memory" or "sqlite") and use get_cache().
+Values stored in a shared backend must be JSON-serializable or bytes.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """Interface every cache backend implements. Keys are strings; ttl is in seconds."""
+
+    # True if get/set do I/O (disk, network); async callers then run them in a worker thread
+    blocking = False
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class TTLCache(CacheBackend):
+    """
+    Thread-safe cache with a per-entry TTL and bounded size.
+    When full, the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache stored in a local SQLite file in WAL mode, shared by every process
+    that opens the same path. Entries carry an absolute expiry (wall clock) and a
+    last-access time used for LRU eviction once max_entries is exceeded.
+    Hit/miss counters are per process; size is read from the database.
+    """
+
+    blocking = True  # every get() also writes accessed_at
+
+    # Check the size bound every N writes rather than on each one
+    EVICT_CHECK_INTERVAL = 100
+
+    def __init__(self, path: str, max_entries: int = 50000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "create table if not exists cache ("
+            " key text primary key,"
+            " value text not null,"
+            " expires_at real not null,"
+            " accessed_at real not null)"
+        )
+        conn.execute("create index if not exists cache_accessed_idx on cache (accessed_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections are not shareable across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("pragma journal_mode=wal")
+            conn.execute("pragma synchronous=normal")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute("select value, expires_at from cache where key = ?", (key,)).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            value, expires_at = row
+            if expires_at <= now:
+                conn.execute("delete from cache where key = ? and expires_at <= ?", (key, now))
+                self._count("expirations")
+                self._count("misses")
+                return None
+            conn.execute("update cache set accessed_at = ? where key = ?", (now, key))
+            self._count("hits")
+            # bytes values are stored as raw blobs, everything else as JSON text
+            return value if isinstance(value, bytes) else json.loads(value)
+        except sqlite3.Error as e:
+            logger.error(f"SQLite cache read failed: {e}")
+            self._count("misses")
+            return None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        now = time.time()
+        try:
+            self._conn().execute(
+                "insert or replace into cache (key, value, expires_at, accessed_at) values (?, ?, ?, ?)",
+                (key, value if isinstance(value, bytes) else json.dumps(value), now + ttl, now),
+            )
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.error(f"SQLite cache write failed: {e}")
+            return
+        with self._lock:
+            self._writes += 1
+            check = self._writes % self.EVICT_CHECK_INTERVAL == 0
+        if check:
+            self._evict()
+
+    def _evict(self) -> None:
+        now = time.time()
+        try:
+            conn = self._conn()
+            expired = conn.execute("delete from cache where expires_at <= ?", (now,)).rowcount
+            (size,) = conn.execute("select count(*) from cache").fetchone()
+            excess = size - self.max_entries
+            evicted = 0
+            if excess > 0:
+                evicted = conn.execute(
+                    "delete from cache where key in (select key from cache order by accessed_at limit ?)",
+                    (excess,),
+                ).rowcount
+            with self._lock:
+                self.expirations += max(0, expired)
+                self.evictions += max(0, evicted)
+        except sqlite3.Error as e:
+            logger.error(f"SQLite cache eviction failed: {e}")
+
+    def delete(self, key: str) -> None:
+        try:
+            self._conn().execute("delete from cache where key = ?", (key,))
+        except sqlite3.Error as e:
+            logger.error(f"SQLite cache delete failed: {e}")
+
+    def clear(self) -> None:
+        try:
+            self._conn().execute("delete from cache")
+        except sqlite3.Error as e:
+            logger.error(f"SQLite cache clear failed: {e}")
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            (size,) = self._conn().execute("select count(*) from cache").fetchone()
+        except sqlite3.Error:
+            size = -1
+        with self._lock:
+            return {
+                "backend": "sqlite",
+                "path": self.path,
+                "size": size,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+_cache: CacheBackend | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> CacheBackend:
+    """Process-wide cache backend selected by settings.CACHE_BACKEND."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                backend = (settings.CACHE_BACKEND or "memory").strip().lower()
+                if backend == "sqlite":
+                    _cache = SQLiteCache(settings.CACHE_SQLITE_PATH, max_entries=settings.CACHE_MAX_ENTRIES)
+                else:
+                    if backend != "memory":
+                        logger.warning(f"Unknown CACHE_BACKEND '{backend}', using in-process memory cache")
+                    _cache = TTLCache(max_entries=settings.CACHE_MAX_ENTRIES)
+    return _cache
@@ -0,0 +1,220 @@
+"""
+Local item-to-item recommender built from our own listening_logs / artist_logs.
+
+An offline job (python -m app.jobs.build_cooccurrence) turns every user's logs
+into per-item weights (same rating / recency / favorite weights as the profile),
+then scores item pairs by cosine similarity over users:
+
+    sim(i, j) = sum_u w_u(i) * w_u(j) / (|w(i)| * |w(j)|)
+
+keeping the top neighbors of every artist and track. The result is a gzipped
+JSON file; CooccurrenceIndex loads it into plain dicts so lookups are a hash
+probe and a slice.
+"""
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import gzip
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+from app.core.config import settings
+from app.services.user_profile import _log_weight, _normalize_artist, _track_id
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT = 1
+
+
+def _neighbors(
+    user_items: Iterable[Dict[str, float]],
+    max_items_per_user: int,
+    neighbors: int,
+    min_users: int,
+) -> Dict[str, List[Tuple[str, float]]]:
+    """Top cosine neighbors per item from per-user {item: weight} maps."""
+    # pairs[a][b] = [sum of w_u(a) * w_u(b), number of users who logged both]
+    pairs: Dict[str, Dict[str, List[float]]] = defaultdict(dict)
+    norms: Dict[str, float] = defaultdict(float)
+
+    for items in user_items:
+        # Cap heavy users: only their strongest items take part in pairs (keeps this O(users * cap^2))
+        top = sorted(items.items(), key=lambda kv: kv[1], reverse=True)[:max_items_per_user]
+        for item, w in top:
+            norms[item] += w * w
+        for a in range(len(top)):
+            item_a, w_a = top[a]
+            row_a = pairs[item_a]
+            for b in range(a + 1, len(top)):
+                item_b, w_b = top[b]
+                d = w_a * w_b
+                for row, other in ((row_a, item_b), (pairs[item_b], item_a)):
+                    acc = row.get(other)
+                    if acc is None:
+                        row[other] = [d, 1]
+                    else:
+                        acc[0] += d
+                        acc[1] += 1
+
+    out: Dict[str, List[Tuple[str, float]]] = {}
+    for item, row in pairs.items():
+        norm_i = math.sqrt(norms[item])
+        scored = [
+            (other, d / (norm_i * math.sqrt(norms[other])))
+            for other, (d, n) in row.items()
+            if n >= min_users
+        ]
+        if scored:
+            scored.sort(key=lambda x: (-x[1], x[0]))
+            out[item] = [(other, round(sim, 4)) for other, sim in scored[:neighbors]]
+    return out
+
+
+def build_index(
+    listening_logs: Iterable[Dict[str, Any]],
+    artist_logs: Iterable[Dict[str, Any]] = (),
+    max_items_per_user: int = 200,
+    neighbors: int = 50,
+    min_users: int = 2,
+) -> Dict[str, Any]:
+    """
+    Build the index payload from raw log rows.
+    listening_logs rows: user_id, artist, track, rating, favorite, logged_at.
+    artist_logs rows: user_id, artist_name, favorite, logged_at (count toward artists only).
+    Pairs co-logged by fewer than min_users users are dropped as noise.
+    """
+    user_artists: Dict[Any, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    user_tracks: Dict[Any, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    artist_labels: Dict[str, str] = {}
+    track_labels: Dict[str, Tuple[str, str]] = {}
+
+    for row in listening_logs:
+        artist = (row.get("artist") or "").strip()
+        track = (row.get("track") or "").strip()
+        if not artist:
+            continue
+        w = _log_weight(row)
+        a_key = _normalize_artist(artist)
+        artist_labels.setdefault(a_key, artist)
+        user_artists[row.get("user_id")][a_key] += w
+        if track:
+            t_key = _track_id(artist, track)
+            track_labels.setdefault(t_key, (track, artist))
+            user_tracks[row.get("user_id")][t_key] += w
+
+    for row in artist_logs:
+        artist = (row.get("artist_name") or "").strip()
+        if not artist:
+            continue
+        a_key = _normalize_artist(artist)
+        artist_labels.setdefault(a_key, artist)
+        user_artists[row.get("user_id")][a_key] += _log_weight(row)
+
+    artist_neighbors = _neighbors(user_artists.values(), max_items_per_user, neighbors, min_users)
+    track_neighbors = _neighbors(user_tracks.values(), max_items_per_user, neighbors, min_users)
+    return {
+        "format": INDEX_FORMAT,
+        "built_at": time.time(),
+        "users": len(set(user_artists) | set(user_tracks)),
+        "artists": {
+            key: {"name": artist_labels[key], "neighbors": nbrs}
+            for key, nbrs in artist_neighbors.items()
+        },
+        "tracks": {
+            key: {"track": track_labels[key][0], "artist": track_labels[key][1], "neighbors": nbrs}
+            for key, nbrs in track_neighbors.items()
+        },
+    }
+
+
+def save_index(payload: Dict[str, Any], path: str) -> None:
+    """Write atomically so a running app never loads a half-written file."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(payload, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+class CooccurrenceIndex:
+    """In-memory neighbor lists: item key -> [(neighbor key, score)], best first."""
+
+    def __init__(self, payload: Dict[str, Any]):
+        if payload.get("format") != INDEX_FORMAT:
+            raise ValueError(f"Unsupported co-occurrence index format {payload.get('format')}")
+        self.built_at = payload.get("built_at", 0.0)
+        self.users = payload.get("users", 0)
+        self._artist_names = {k: v["name"] for k, v in payload["artists"].items()}
+        self._artist_neighbors = {k: v["neighbors"] for k, v in payload["artists"].items()}
+        self._track_labels = {k: (v["track"], v["artist"]) for k, v in payload["tracks"].items()}
+        self._track_neighbors = {k: v["neighbors"] for k, v in payload["tracks"].items()}
+
+    @classmethod
+    def load(cls, path: str) -> "CooccurrenceIndex":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def similar_artists(self, artist: str, k: int = 10) -> List[Tuple[str, float]]:
+        """[(artist name, score)] for artists co-logged with `artist`, best first."""
+        nbrs = self._artist_neighbors.get(_normalize_artist(artist), ())
+        return [(self._artist_names.get(key, key), score) for key, score in nbrs[:k]]
+
+    def similar_tracks(self, track: str, artist: str, k: int = 10) -> List[Tuple[str, str, float]]:
+        """[(track, artist, score)] for tracks co-logged with the given track, best first."""
+        nbrs = self._track_neighbors.get(_track_id(artist, track), ())
+        out = []
+        for key, score in nbrs[:k]:
+            label = self._track_labels.get(key)
+            if label:
+                out.append((label[0], label[1], score))
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "built_at": self.built_at,
+            "users": self.users,
+            "artists": len(self._artist_neighbors),
+            "tracks": len(self._track_neighbors),
+        }
+
+
+_index: CooccurrenceIndex | None = None
+_index_mtime: float | None = None
+_index_checked_at = 0.0
+_index_lock = threading.Lock()
+
+# How often the index file is checked for a newer build
+RELOAD_CHECK_SECONDS = 60.0
+
+
+def get_cooccurrence_index() -> Optional[CooccurrenceIndex]:
+    """
+    Process-wide index loaded from COOCCURRENCE_INDEX_PATH, or None when the mode is
+    off or no index has been built. A rebuilt file is picked up within RELOAD_CHECK_SECONDS.
+    """
+    global _index, _index_mtime, _index_checked_at
+    if settings.COOCCURRENCE_MODE == "off":
+        return None
+    now = time.monotonic()
+    if _index is not None and now - _index_checked_at < RELOAD_CHECK_SECONDS:
+        return _index
+    with _index_lock:
+        if _index is not None and now - _index_checked_at < RELOAD_CHECK_SECONDS:
+            return _index
+        _index_checked_at = now
+        path = settings.COOCCURRENCE_INDEX_PATH
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return _index
+        if mtime != _index_mtime:
+            try:
+                _index = CooccurrenceIndex.load(path)
+                _index_mtime = mtime
+                logger.info(f"Loaded co-occurrence index: {_index.stats()}")
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Failed to load co-occurrence index {path}: {e}")
+    return _index
@@ -1,10 +1,17 @@
 """Discover recommendations: personalized sections based on user's listening history."""
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 import logging
 import random
+import time
 
-from app.services.user_profile import get_user_profile
-from app.services.personal_model import score_discover_item
+from app.core.config import settings
+from app.utils.fanout import fan_out, fan_out_iter
+from app.utils.metrics import record_span, span
+from app.utils.rate_limiter import Priority, request_priority
+from app.utils.ranking import top_k_indices
+from app.services.user_profile import UserProfile, get_user_profile
+from app.services.personal_model import score_discover_items_batch
+from app.services.track_metadata import get_metadata_store
 from app.services.lastfm_service import (
     artist_get_similar,
     track_get_similar,
@@ -48,14 +55,54 @@ def _norm_artist_placeholder(artist_data: Dict[str, Any], reason: str) -> Option
     return {"track": f"Artist: {name}", "artist": name, "id": aid, "reason": reason, "match_score": None, "source": "lastfm"}
 
 
+def _similar_tracks(track_name: str, artist_name: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    track.getSimilar entries for a seed, read through the local metadata store.
+    Stored lists are compact ({name, artist, mbid, match}) and reused while they
+    hold at least `limit` entries.
+    """
+    store = get_metadata_store()
+    seed_id = _track_id(artist_name, track_name)
+    if store is not None:
+        meta = store.get(seed_id)
+        if meta is not None and meta["similar"] is not None and len(meta["similar"]) >= limit:
+            return meta["similar"][:limit]
+
+    data = track_get_similar(track=track_name, artist=artist_name, limit=limit)
+    tracks = data.get("similartracks", {}).get("track", []) or []
+    if isinstance(tracks, dict):
+        tracks = [tracks]
+    if store is not None:
+        store.put_similar(seed_id, [
+            {
+                "name": _extract_str(t.get("name", "")),
+                "artist": _extract_str(t.get("artist", "")),
+                "mbid": _extract_str(t.get("mbid", "")),
+                "match": t.get("match"),
+            }
+            for t in tracks
+        ])
+    return tracks
+
+
+def _attach_stored_metadata(items: List[Dict[str, Any]]) -> None:
+    """Fill in tags/genre from the local metadata store (no network) so the rerank can use them."""
+    store = get_metadata_store()
+    if store is None or not items:
+        return
+    known = store.get_many(item["id"] for item in items)
+    for item in items:
+        meta = known.get(item["id"])
+        if meta is not None and meta["tags"] is not None:
+            item.setdefault("tags", meta["tags"])
+            item.setdefault("genre", meta["genre"])
+
+
 def _get_recommendations_from_track(track_name: str, artist_name: str, limit: int = 5) -> List[Dict[str, Any]]:
     """Get similar tracks using track.getSimilar."""
     try:
         logger.info(f"Getting similar tracks for: {track_name} by {artist_name}")
-        data = track_get_similar(track=track_name, artist=artist_name, limit=limit)
-        tracks = data.get("similartracks", {}).get("track", []) or []
-        if isinstance(tracks, dict):
-            tracks = [tracks]
+        tracks = _similar_tracks(track_name, artist_name, limit)
         
         results = []
         for t in tracks:
@@ -178,6 +225,121 @@ def _get_chart_recommendations(limit: int = 10) -> List[Dict[str, Any]]:
     return results
 
 
+CHART_SECTION = ("top_this_week", "Top this week")
+
+
+def _plan_discover(user_id: Optional[str]) -> Tuple[Optional[UserProfile], List[Tuple[str, str, Callable[[], List[Dict[str, Any]]]]]]:
+    """
+    Load the user's profile and pick the personal sections to fetch:
+    (section key, title, call) per seed, in display order. No sections without a profile.
+    """
+    personal_calls: List[Tuple[str, str, Callable[[], List[Dict[str, Any]]]]] = []
+    if not user_id:
+        return None, personal_calls
+
+    logger.info(f"Loading profile for user: {user_id}")
+    profile = get_user_profile(user_id)
+    if not profile:
+        logger.warning(f"Could not load profile for user_id: {user_id}")
+        return None, personal_calls
+    logger.info(
+        f"Profile loaded: {len(profile.top_tracks)} tracks, {len(profile.top_artists)} artists, {len(profile.top_tags)} tags"
+    )
+
+    # Add a bit of randomness so each refresh can use different seeds
+    rng = random.Random()  # local RNG, no fixed seed
+
+    # 1. "Because you liked (song)" - pick up to 2 random top tracks
+    if profile.top_tracks:
+        track_seeds = profile.top_tracks[:10]  # look at up to top 10
+        rng.shuffle(track_seeds)
+        selected_tracks = track_seeds[:2]
+        logger.info(f"Using track seeds: {selected_tracks}")
+        for track, artist, _ in selected_tracks:
+            personal_calls.append((
+                "because_you_liked",
+                f"Because you liked {track}",
+                lambda t=track, a=artist: _get_recommendations_from_track(t, a, limit=3),
+            ))
+    else:
+        logger.warning("No top tracks found in profile")
+
+    # 2. "Because you like (artist)" - pick up to 2 random top artists
+    if profile.top_artists:
+        artist_seeds = profile.top_artists[:10]
+        rng.shuffle(artist_seeds)
+        selected_artists = artist_seeds[:2]
+        logger.info(f"Using artist seeds: {[a[0] for a in selected_artists]}")
+        for artist_name, _ in selected_artists:
+            personal_calls.append((
+                "because_you_like",
+                f"Because you like {artist_name}",
+                lambda a=artist_name: _get_recommendations_from_artist(a, limit=3),
+            ))
+    else:
+        logger.warning("No top artists found in profile")
+
+    # 3. "When you're feeling (tag)" - pick up to 2 random top tags
+    if profile.top_tags:
+        tag_seeds = profile.top_tags[:10]
+        rng.shuffle(tag_seeds)
+        selected_tags = tag_seeds[:2]
+        logger.info(f"Using tag seeds: {[t[0] for t in selected_tags]}")
+        for tag_name, _ in selected_tags:
+            personal_calls.append((
+                "when_youre_feeling",
+                f"When you're feeling {tag_name}",
+                lambda t=tag_name: _get_recommendations_from_tag(t, limit=5),
+            ))
+    else:
+        logger.warning("No top tags found in profile")
+
+    return profile, personal_calls
+
+
+def _merge_sections(
+    profile: Optional[UserProfile],
+    personal_sections: List[Optional[List[Dict[str, Any]]]],
+    chart_recs: Optional[List[Dict[str, Any]]],
+    limit: int,
+) -> List[Dict[str, Any]]:
+    """
+    Personal sections in section order (deduped, reranked by the personal model, top
+    `limit` kept), then the chart recommendations.
+    """
+    all_recommendations = []
+    seen_ids = set()
+
+    def _add(recs: List[Dict[str, Any]]) -> None:
+        for rec in recs:
+            if rec["id"] not in seen_ids:
+                seen_ids.add(rec["id"])
+                all_recommendations.append(rec)
+
+    for recs in personal_sections:
+        _add(recs or [])
+
+    if profile:
+        logger.info(f"Total personalized recommendations before reranking: {len(all_recommendations)}")
+
+        # 4. Rerank by personal model
+        if all_recommendations:
+            with span("rerank"):
+                _attach_stored_metadata(all_recommendations)
+                # Only the best `limit` can make it into the response
+                scores = score_discover_items_batch(all_recommendations, profile)
+                ranked = [all_recommendations[i] for i in top_k_indices(scores, limit)]
+            logger.info(f"Reranked {len(all_recommendations)} recommendations, kept top {len(ranked)}")
+            all_recommendations[:] = ranked
+
+    # 5. Always add chart recommendations (top artists/tracks)
+    logger.info("Adding chart recommendations")
+    _add(chart_recs or [])
+
+    logger.info(f"Total recommendations: {len(all_recommendations)}")
+    return all_recommendations[:limit]
+
+
 def get_discover_recommendations(user_id: Optional[str] = None, limit: int = 30) -> List[Dict[str, Any]]:
     """
     Get personalized discover recommendations organized by sections:
@@ -188,86 +350,60 @@ def get_discover_recommendations(user_id: Optional[str] = None, limit: int = 30)
     
     If user_id is None, returns only chart recommendations.
     """
-    all_recommendations = []
-    seen_ids = set()
-    
-    if user_id:
-        logger.info(f"Loading profile for user: {user_id}")
-        profile = get_user_profile(user_id)
-        if profile:
-            logger.info(
-                f"Profile loaded: {len(profile.top_tracks)} tracks, {len(profile.top_artists)} artists, {len(profile.top_tags)} tags"
-            )
+    profile, personal_calls = _plan_discover(user_id)
 
-            # Add a bit of randomness so each refresh can use different seeds
-            rng = random.Random()  # local RNG, no fixed seed
-
-            # 1. "Because you liked (song)" - pick up to 2 random top tracks
-            if profile.top_tracks:
-                track_seeds = profile.top_tracks[:10]  # look at up to top 10
-                rng.shuffle(track_seeds)
-                selected_tracks = track_seeds[:2]
-                logger.info(f"Using track seeds: {selected_tracks}")
-                for track, artist, _ in selected_tracks:
-                    recs = _get_recommendations_from_track(track, artist, limit=3)
-                    for rec in recs:
-                        if rec["id"] not in seen_ids:
-                            seen_ids.add(rec["id"])
-                            all_recommendations.append(rec)
-            else:
-                logger.warning("No top tracks found in profile")
-
-            # 2. "Because you like (artist)" - pick up to 2 random top artists
-            if profile.top_artists:
-                artist_seeds = profile.top_artists[:10]
-                rng.shuffle(artist_seeds)
-                selected_artists = artist_seeds[:2]
-                logger.info(f"Using artist seeds: {[a[0] for a in selected_artists]}")
-                for artist_name, _ in selected_artists:
-                    recs = _get_recommendations_from_artist(artist_name, limit=3)
-                    for rec in recs:
-                        if rec["id"] not in seen_ids:
-                            seen_ids.add(rec["id"])
-                            all_recommendations.append(rec)
-            else:
-                logger.warning("No top artists found in profile")
-
-            # 3. "When you're feeling (tag)" - pick up to 2 random top tags
-            if profile.top_tags:
-                tag_seeds = profile.top_tags[:10]
-                rng.shuffle(tag_seeds)
-                selected_tags = tag_seeds[:2]
-                logger.info(f"Using tag seeds: {[t[0] for t in selected_tags]}")
-                for tag_name, _ in selected_tags:
-                    recs = _get_recommendations_from_tag(tag_name, limit=5)
-                    for rec in recs:
-                        if rec["id"] not in seen_ids:
-                            seen_ids.add(rec["id"])
-                            all_recommendations.append(rec)
-            else:
-                logger.warning("No top tags found in profile")
-            
-            logger.info(f"Total personalized recommendations before reranking: {len(all_recommendations)}")
-            
-            # 4. Rerank by personal model
-            if all_recommendations:
-                scored_items = [
-                    (score_discover_item(item, profile), item)
-                    for item in all_recommendations
-                ]
-                scored_items.sort(key=lambda x: x[0], reverse=True)
-                all_recommendations = [item for _, item in scored_items]
-                logger.info(f"Reranked {len(all_recommendations)} recommendations")
-        else:
-            logger.warning(f"Could not load profile for user_id: {user_id}")
-    
-    # 5. Always add chart recommendations (top artists/tracks)
-    logger.info("Adding chart recommendations")
-    chart_recs = _get_chart_recommendations(limit=10)
-    for rec in chart_recs:
-        if rec["id"] not in seen_ids:
-            seen_ids.add(rec["id"])
-            all_recommendations.append(rec)
-    
-    logger.info(f"Total recommendations: {len(all_recommendations)}")
-    return all_recommendations[:limit]
+    # Each section is a Last.fm call (or pair of calls); they run concurrently and are
+    # merged back in section order so dedupe keeps the same precedence as a serial run.
+    # Chart recommendations (top artists/tracks) are fetched alongside the seeds.
+    # Discover fan-out yields to interactive Last.fm traffic under the rate limiter.
+    with request_priority(Priority.BACKGROUND), span("gather"):
+        sections = fan_out(
+            [call for _, _, call in personal_calls] + [lambda: _get_chart_recommendations(limit=10)],
+            max_workers=settings.DISCOVER_MAX_CONCURRENCY,
+            timeout=settings.DISCOVER_DEADLINE_SECONDS,
+        )
+    *personal_sections, chart_recs = sections
+    dropped = sum(1 for recs in sections if recs is None)
+    if dropped:
+        logger.warning(f"Dropped {dropped} discover sections that missed the deadline")
+
+    return _merge_sections(profile, personal_sections, chart_recs, limit)
+
+
+def iter_discover_events(user_id: Optional[str] = None, limit: int = 30) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming form of get_discover_recommendations. Yields one
+    {"event": "section", "section", "title", "items"} per section as soon as its
+    Last.fm calls return (fastest first; items already sent in an earlier section
+    are left out), then {"event": "ranked", "items", "dropped"} with exactly the
+    list get_discover_recommendations would return. Blocking: iterate it off the
+    event loop.
+    """
+    profile, personal_calls = _plan_discover(user_id)
+    labels = [(section, title) for section, title, _ in personal_calls] + [CHART_SECTION]
+
+    # Submitted now, so the calls keep BACKGROUND priority wherever the iteration resumes
+    started = time.perf_counter()
+    with request_priority(Priority.BACKGROUND):
+        completed = fan_out_iter(
+            [call for _, _, call in personal_calls] + [lambda: _get_chart_recommendations(limit=10)],
+            max_workers=settings.DISCOVER_MAX_CONCURRENCY,
+            timeout=settings.DISCOVER_DEADLINE_SECONDS,
+        )
+
+    sections: List[Optional[List[Dict[str, Any]]]] = [None] * len(labels)
+    sent: set[str] = set()
+    for index, recs in completed:
+        sections[index] = recs
+        fresh = [rec for rec in recs or [] if rec["id"] not in sent]
+        sent.update(rec["id"] for rec in fresh)
+        if fresh:
+            section, title = labels[index]
+            yield {"event": "section", "section": section, "title": title, "items": fresh}
+    record_span("gather", time.perf_counter() - started)
+
+    dropped = sum(1 for recs in sections if recs is None)
+    if dropped:
+        logger.warning(f"Dropped {dropped} discover sections that missed the deadline")
+    *personal_sections, chart_recs = sections
+    yield {"event": "ranked", "items": _merge_sections(profile, personal_sections, chart_recs, limit), "dropped": dropped}
@@ -0,0 +1,189 @@
+# app/services/lastfm_async.py
+"""Asyncio-native Last.fm client: same functions as lastfm_service, awaitable."""
+from typing import Any, Dict, Optional
+import asyncio
+import httpx
+
+from app.core.config import settings
+from app.services.cache import get_cache
+from app.utils.metrics import span
+from app.utils.singleflight import AsyncSingleFlight
+from app.services.lastfm_service import (
+    DEFAULT_TIMEOUT,
+    RETRY_STATUS_CODES,
+    _budget_exhausted,
+    _build_params,
+    _cache_get,
+    _cache_key,
+    _cache_set,
+    _check_payload,
+    _is_rate_limited,
+    _limiter,
+)
+
+_client: httpx.AsyncClient | None = None
+_flights = AsyncSingleFlight()
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Process-wide async client with a bounded keep-alive pool.
+    Created lazily on first use so it binds to the running event loop.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.LASTFM_POOL_MAXSIZE,
+                max_keepalive_connections=settings.LASTFM_POOL_MAXSIZE,
+            ),
+            transport=httpx.AsyncHTTPTransport(retries=settings.LASTFM_MAX_RETRIES),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _cache_get_async(method: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # A disk-backed cache (SQLite reads also write accessed_at) must not block the event loop
+    if get_cache().blocking:
+        return await asyncio.to_thread(_cache_get, method, params)
+    return _cache_get(method, params)
+
+
+async def _cache_set_async(method: str, params: Dict[str, Any], data: Dict[str, Any]) -> None:
+    if get_cache().blocking:
+        await asyncio.to_thread(_cache_set, method, params, data)
+    else:
+        _cache_set(method, params, data)
+
+
+def singleflight_stats() -> Dict[str, int]:
+    """How many upstream calls were executed vs. coalesced onto an in-flight one."""
+    return _flights.stats()
+
+
+async def _call_lastfm(method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Async counterpart of lastfm_service._call_lastfm.
+    Retries 5xx with the same exponential backoff as the sync session; 429 and
+    Last.fm error 29 go through the shared limiter instead.
+    Shares the response cache with the sync client (disk backends are read and
+    written in a worker thread); concurrent identical calls on the event loop
+    are coalesced into one request.
+    """
+    with span("lastfm", method=method):
+        cached = await _cache_get_async(method, params)
+        if cached is not None:
+            return cached
+        return await _flights.do(_cache_key(method, params), lambda: _fetch_lastfm(method, params))
+
+
+async def _fetch_lastfm(method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    client = get_client()
+    query = _build_params(method, params)
+    attempt = 0
+    rate_limit_attempt = 0
+    while True:
+        if not await _limiter.acquire_async(timeout=settings.LASTFM_RATE_LIMIT_MAX_WAIT_SECONDS):
+            raise _budget_exhausted()
+        resp = await client.get(settings.LASTFM_BASE_URL, params=query)
+        data = resp.json() if resp.status_code < 400 else None
+        if _is_rate_limited(resp.status_code, data):
+            # Back off adaptively and wait for a token again instead of failing the request
+            _limiter.on_rate_limited()
+            if rate_limit_attempt < settings.LASTFM_RATE_LIMIT_RETRIES:
+                rate_limit_attempt += 1
+                continue
+        elif resp.status_code in RETRY_STATUS_CODES and attempt < settings.LASTFM_MAX_RETRIES:
+            attempt += 1
+            retry_after = resp.headers.get("Retry-After")
+            try:
+                delay = float(retry_after) if retry_after else settings.LASTFM_BACKOFF_FACTOR * (2 ** (attempt - 1))
+            except ValueError:
+                delay = settings.LASTFM_BACKOFF_FACTOR * (2 ** (attempt - 1))
+            await asyncio.sleep(delay)
+            continue
+        resp.raise_for_status()
+        data = _check_payload(data)
+        _limiter.on_success()
+        await _cache_set_async(method, params, data)
+        return data
+
+
+async def track_search(track: str, artist: Optional[str] = None, limit: int = 10, page: int = 1) -> Dict[str, Any]:
+    """
+    Uses track.search (no auth required).
+    """
+    params: Dict[str, Any] = {"track": track, "limit": limit, "page": page}
+    if artist:
+        params["artist"] = artist
+    return await _call_lastfm("track.search", params)
+
+
+async def track_get_info(track: str, artist: str, autocorrect: int = 1) -> Dict[str, Any]:
+    """
+    Uses track.getInfo to get detailed track metadata including tags, genre, etc.
+    """
+    return await _call_lastfm("track.getInfo", {
+        "track": track,
+        "artist": artist,
+        "autocorrect": autocorrect
+    })
+
+
+async def artist_search(artist: str, limit: int = 10, page: int = 1) -> Dict[str, Any]:
+    """
+    Uses artist.search (no auth required).
+    """
+    return await _call_lastfm("artist.search", {"artist": artist, "limit": limit, "page": page})
+
+
+async def track_get_similar(track: str, artist: str, limit: int = 10) -> Dict[str, Any]:
+    """
+    Uses track.getSimilar to get similar tracks.
+    """
+    return await _call_lastfm("track.getSimilar", {"track": track, "artist": artist, "limit": limit})
+
+
+async def artist_get_similar(artist: str, limit: int = 10) -> Dict[str, Any]:
+    """
+    Uses artist.getSimilar to get similar artists.
+    """
+    return await _call_lastfm("artist.getSimilar", {"artist": artist, "limit": limit})
+
+
+async def tag_get_similar(tag: str, limit: int = 10) -> Dict[str, Any]:
+    """Uses tag.getSimilar to get similar tags."""
+    return await _call_lastfm("tag.getSimilar", {"tag": tag, "limit": limit})
+
+
+async def tag_get_top_artists(tag: str, limit: int = 10, page: int = 1) -> Dict[str, Any]:
+    """Uses tag.getTopArtists for top artists by tag."""
+    return await _call_lastfm("tag.getTopArtists", {"tag": tag, "limit": limit, "page": page})
+
+
+async def tag_get_top_tracks(tag: str, limit: int = 10, page: int = 1) -> Dict[str, Any]:
+    """Uses tag.getTopTracks for top tracks by tag."""
+    return await _call_lastfm("tag.getTopTracks", {"tag": tag, "limit": limit, "page": page})
+
+
+async def tag_get_top_albums(tag: str, limit: int = 10, page: int = 1) -> Dict[str, Any]:
+    """Uses tag.getTopAlbums for top albums by tag."""
+    return await _call_lastfm("tag.getTopAlbums", {"tag": tag, "limit": limit, "page": page})
+
+
+async def chart_get_top_artists(limit: int = 10, page: int = 1) -> Dict[str, Any]:
+    """Uses chart.getTopArtists for global top artists chart."""
+    return await _call_lastfm("chart.getTopArtists", {"limit": limit, "page": page})
+
+
+async def chart_get_top_tracks(limit: int = 10, page: int = 1) -> Dict[str, Any]:
+    """Uses chart.getTopTracks for global top tracks chart."""
+    return await _call_lastfm("chart.getTopTracks", {"limit": limit, "page": page})
@@ -1,34 +1,209 @@
 # app/services/lastfm_service.py
 from typing import Any, Dict, Optional
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from app.core.config import settings
+from app.services.cache import get_cache
+from app.utils.metrics import span
+from app.utils.rate_limiter import AdaptiveTokenBucket
+from app.utils.singleflight import SingleFlight
 
 DEFAULT_TIMEOUT = 15
+# Transient server errors retried with backoff by the transport. HTTP 429 is
+# deliberately absent: _fetch_lastfm handles it so the shared limiter backs off.
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+RATE_LIMIT_ERROR = 29  # Last.fm "Rate limit exceeded"
 
+# Cache TTL (seconds) per Last.fm method. Charts move fastest; similarity and
+# track metadata change on a scale of days. Methods not listed are not cached.
+CACHE_TTLS: Dict[str, float] = {
+    "chart.getTopArtists": 15 * 60,
+    "chart.getTopTracks": 15 * 60,
+    "track.search": 10 * 60,
+    "artist.search": 10 * 60,
+    "tag.getTopArtists": 6 * 3600,
+    "tag.getTopTracks": 6 * 3600,
+    "tag.getTopAlbums": 6 * 3600,
+    "tag.getSimilar": 24 * 3600,
+    "track.getSimilar": 12 * 3600,
+    "artist.getSimilar": 24 * 3600,
+    "track.getInfo": 24 * 3600,
+}
 
-def _call_lastfm(method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+# Identical concurrent lookups (same cache key) share one upstream request
+_flights = SingleFlight()
+
+# Paces every upstream request made with settings.LASTFM_API_KEY in this process
+_limiter = AdaptiveTokenBucket(
+    rate=settings.LASTFM_RATE_LIMIT_PER_SECOND,
+    burst=settings.LASTFM_RATE_LIMIT_BURST,
+    background_reserve=settings.LASTFM_RATE_LIMIT_BACKGROUND_RESERVE,
+)
+
+
+class LastFmError(RuntimeError):
+    """Error reported by Last.fm in the JSON payload (see code, e.g. 29 = rate limit)."""
+
+    def __init__(self, code: Any, message: Any):
+        super().__init__(f"Last.fm error {code}: {message}")
+        self.code = code
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
     """
-    Generic Last.fm REST call.
-    Last.fm expects method + api_key + format=json on the root endpoint.
+    Keep-alive session with a bounded connection pool per host and retry/backoff
+    on 5xx, so every Last.fm call reuses warm TCP+TLS connections. 429s are
+    returned to _fetch_lastfm, which slows the shared limiter before retrying.
     """
+    retry = Retry(
+        total=settings.LASTFM_MAX_RETRIES,
+        connect=settings.LASTFM_MAX_RETRIES,
+        read=settings.LASTFM_MAX_RETRIES,
+        status=settings.LASTFM_MAX_RETRIES,
+        backoff_factor=settings.LASTFM_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.LASTFM_POOL_CONNECTIONS,
+        pool_maxsize=settings.LASTFM_POOL_MAXSIZE,
+        pool_block=settings.LASTFM_POOL_BLOCK,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+
+def get_session() -> requests.Session:
+    """Process-wide Last.fm session (created lazily, shared by all threads)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def close_session() -> None:
+    """Close pooled connections (e.g. on app shutdown)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def _build_params(method: str, params: Dict[str, Any]) -> Dict[str, Any]:
     base_params = {
         "method": method,
         "api_key": settings.LASTFM_API_KEY,
         "format": "json",
     }
     base_params.update(params)
+    return base_params
 
-    resp = requests.get(settings.LASTFM_BASE_URL, params=base_params, timeout=DEFAULT_TIMEOUT)
-    resp.raise_for_status()
-    data = resp.json()
 
+def _check_payload(data: Any) -> Dict[str, Any]:
     # Last.fm returns errors in JSON payload sometimes
     if isinstance(data, dict) and data.get("error"):
-        raise RuntimeError(f"Last.fm error {data.get('error')}: {data.get('message')}")
+        raise LastFmError(data.get("error"), data.get("message"))
     return data
 
 
+def _is_rate_limited(status_code: int, data: Any) -> bool:
+    if status_code == 429:
+        return True
+    return isinstance(data, dict) and str(data.get("error")) == str(RATE_LIMIT_ERROR)
+
+
+def _budget_exhausted() -> LastFmError:
+    return LastFmError(RATE_LIMIT_ERROR, "Local request budget exhausted, try again shortly")
+
+
+def _cache_key(method: str, params: Dict[str, Any]) -> str:
+    """(method, normalized params): case/whitespace-insensitive values, order-independent."""
+    normalized = "&".join(
+        f"{k}={' '.join(str(v).strip().lower().split())}"
+        for k, v in sorted(params.items())
+        if v is not None
+    )
+    return f"lastfm:{method}:{normalized}"
+
+
+def _cache_get(method: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not settings.LASTFM_CACHE_ENABLED or method not in CACHE_TTLS:
+        return None
+    return get_cache().get(_cache_key(method, params))
+
+
+def _cache_set(method: str, params: Dict[str, Any], data: Dict[str, Any]) -> None:
+    if not settings.LASTFM_CACHE_ENABLED or method not in CACHE_TTLS:
+        return
+    get_cache().set(_cache_key(method, params), data, CACHE_TTLS[method])
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction counters for the shared cache backend (Last.fm responses, profiles)."""
+    return get_cache().stats()
+
+
+def rate_limiter_stats() -> Dict[str, Any]:
+    """Current refill rate, tokens and grant/wait/reject counters of the shared limiter."""
+    return _limiter.stats()
+
+
+def singleflight_stats() -> Dict[str, int]:
+    """How many upstream calls were executed vs. coalesced onto an in-flight one."""
+    return _flights.stats()
+
+
+def _call_lastfm(method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Generic Last.fm REST call.
+    Last.fm expects method + api_key + format=json on the root endpoint.
+    Successful responses are cached per method (see CACHE_TTLS); errors are not.
+    Concurrent identical calls are coalesced into one request.
+    Timed as the "lastfm" span, labeled by method.
+    """
+    with span("lastfm", method=method):
+        cached = _cache_get(method, params)
+        if cached is not None:
+            return cached
+        return _flights.do(_cache_key(method, params), lambda: _fetch_lastfm(method, params))
+
+
+def _fetch_lastfm(method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    query = _build_params(method, params)
+    attempt = 0
+    while True:
+        if not _limiter.acquire(timeout=settings.LASTFM_RATE_LIMIT_MAX_WAIT_SECONDS):
+            raise _budget_exhausted()
+        resp = get_session().get(settings.LASTFM_BASE_URL, params=query, timeout=DEFAULT_TIMEOUT)
+        data = resp.json() if resp.status_code < 400 else None
+        if _is_rate_limited(resp.status_code, data):
+            # Back off adaptively and wait for a token again instead of failing the request
+            _limiter.on_rate_limited()
+            if attempt < settings.LASTFM_RATE_LIMIT_RETRIES:
+                attempt += 1
+                continue
+        resp.raise_for_status()
+        data = _check_payload(data)
+        _limiter.on_success()
+        _cache_set(method, params, data)
+        return data
+
+
 def track_search(track: str, artist: Optional[str] = None, limit: int = 10, page: int = 1) -> Dict[str, Any]:
     """
     Uses track.search (no auth required).
@@ -1,8 +1,17 @@
 """Personal recommendations: seed from user's listening_logs, fetch candidates from Last.fm, rerank by personal model."""
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+import logging
 
+from app.core.config import settings
+from app.utils.fanout import fan_out
+from app.utils.metrics import timed
+from app.utils.ranking import top_k
 from app.services.user_profile import UserProfile, get_user_profile, _track_id
 from app.services.lastfm_service import track_get_similar, artist_get_similar
+from app.services.cooccurrence import CooccurrenceIndex, get_cooccurrence_index
+from app.services.taste_index import get_taste_index, get_taste_writer, taste_neighbor_tracks
+
+logger = logging.getLogger(__name__)
 
 
 def _extract_string(field_value: Any) -> str:
@@ -42,50 +51,140 @@ def _normalize_artist_placeholder(artist_data: Dict[str, Any], reason: str) -> O
     }
 
 
-def _gather_candidates(profile: UserProfile, limit_per_seed: int) -> List[Dict[str, Any]]:
-    seen: set[str] = set()
-    candidates: List[Dict[str, Any]] = []
-
-    # Seed from top tracks (similar tracks)
-    for track, artist, _ in (profile.top_tracks[:5] or []):
+def _similar_tracks_for_seed(track: str, artist: str, limit: int) -> List[Dict[str, Any]]:
+    data = track_get_similar(track=track, artist=artist, limit=limit)
+    tracks = data.get("similartracks", {}).get("track", []) or []
+    if isinstance(tracks, dict):
+        tracks = [tracks]
+    out = []
+    for t in tracks:
+        ms = t.get("match")
         try:
-            data = track_get_similar(track=track, artist=artist, limit=limit_per_seed)
-            tracks = data.get("similartracks", {}).get("track", []) or []
-            if isinstance(tracks, dict):
-                tracks = [tracks]
-            for t in tracks:
-                ms = t.get("match")
-                try:
-                    ms = float(ms) if ms is not None else None
-                except (TypeError, ValueError):
-                    ms = None
-                rec = _normalize_track(t, reason=f"Similar to {track}", match_score=ms)
-                if rec and rec["id"] not in seen:
-                    seen.add(rec["id"])
-                    candidates.append(rec)
-        except Exception:
-            continue
+            ms = float(ms) if ms is not None else None
+        except (TypeError, ValueError):
+            ms = None
+        rec = _normalize_track(t, reason=f"Similar to {track}", match_score=ms)
+        if rec:
+            out.append(rec)
+    return out
+
+
+def _similar_artists_for_seed(artist_name: str, limit: int) -> List[Dict[str, Any]]:
+    data = artist_get_similar(artist=artist_name, limit=limit)
+    artists = data.get("similarartists", {}).get("artist", []) or []
+    if isinstance(artists, dict):
+        artists = [artists]
+    out = []
+    for a in artists:
+        rec = _normalize_artist_placeholder(a, reason=f"Similar to {artist_name}")
+        if rec:
+            out.append(rec)
+    return out
+
+
+def _local_similar_tracks(index: CooccurrenceIndex, track: str, artist: str, limit: int) -> List[Dict[str, Any]]:
+    out = []
+    for name, artist_name, score in index.similar_tracks(track, artist, k=limit):
+        rec = _normalize_track({"name": name, "artist": artist_name}, reason=f"Listeners of {track} also logged", match_score=score)
+        if rec:
+            out.append(rec)
+    return out
+
+
+def _local_similar_artists(index: CooccurrenceIndex, artist_name: str, limit: int) -> List[Dict[str, Any]]:
+    out = []
+    for name, _ in index.similar_artists(artist_name, k=limit):
+        rec = _normalize_artist_placeholder({"name": name}, reason=f"Listeners of {artist_name} also logged")
+        if rec:
+            out.append(rec)
+    return out
 
-    # Seed from top artists (similar artists – as placeholders)
+
+def _taste_neighbor_candidates(user_id: str, profile: UserProfile, limit: int) -> List[Dict[str, Any]]:
+    """
+    Top tracks of the user's nearest taste neighbors (TASTE_NEIGHBORS_ENABLED).
+    Only queries the index; the user's profile is queued for the background writer.
+    """
+    index = get_taste_index()
+    if index is None:
+        return []
+    try:
+        get_taste_writer().submit(user_id, profile)
+        tracks = taste_neighbor_tracks(index, user_id, profile, neighbors=settings.TASTE_NEIGHBORS_K, limit=limit)
+    except Exception as e:
+        logger.error(f"Taste neighbor lookup failed for {user_id}: {e}")
+        return []
+    out = []
+    for name, artist_name, score in tracks:
+        rec = _normalize_track({"name": name, "artist": artist_name}, reason="Listeners like you logged this", match_score=score)
+        if rec:
+            out.append(rec)
+    return out
+
+
+@timed("gather")
+def _gather_candidates(
+    profile: UserProfile,
+    limit_per_seed: int,
+    user_id: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Fetch similar tracks/artists for the user's top seeds in parallel.
+    Results are merged in seed order (tracks first, then artists), so candidate
+    order and dedupe are the same as a serial run. Returns (candidates, failed_seeds):
+    a seed that errors or exceeds its timeout contributes nothing and is counted.
+
+    Neighbors from the local co-occurrence index (COOCCURRENCE_MODE) are added after
+    the Last.fm results; in "only" mode Last.fm is asked only for seeds the index doesn't know.
+    With a user_id, top tracks of similar users (taste index) come last.
+    """
+    index = get_cooccurrence_index()
+    local_only = settings.COOCCURRENCE_MODE == "only"
+    local: List[List[Dict[str, Any]]] = []
+    calls = []
+
+    # Seed from top tracks (similar tracks), then top artists (similar artists – as placeholders)
+    for track, artist, _ in (profile.top_tracks[:5] or []):
+        recs = _local_similar_tracks(index, track, artist, limit_per_seed) if index else []
+        local.append(recs)
+        if not (local_only and recs):
+            calls.append(lambda t=track, a=artist: _similar_tracks_for_seed(t, a, limit_per_seed))
     for (artist_name, _) in (profile.top_artists[:5] or []):
-        try:
-            data = artist_get_similar(artist=artist_name, limit=limit_per_seed)
-            artists = data.get("similarartists", {}).get("artist", []) or []
-            if isinstance(artists, dict):
-                artists = [artists]
-            for a in artists:
-                rec = _normalize_artist_placeholder(a, reason=f"Similar to {artist_name}")
-                if rec and rec["id"] not in seen:
-                    seen.add(rec["id"])
-                    candidates.append(rec)
-        except Exception:
+        recs = _local_similar_artists(index, artist_name, limit_per_seed) if index else []
+        local.append(recs)
+        if not (local_only and recs):
+            calls.append(lambda a=artist_name: _similar_artists_for_seed(a, limit_per_seed))
+    if user_id:
+        local.append(_taste_neighbor_candidates(user_id, profile, limit=2 * limit_per_seed))
+
+    results = fan_out(
+        calls,
+        max_workers=settings.PERSONAL_MAX_CONCURRENCY,
+        timeout=settings.PERSONAL_DEADLINE_SECONDS,
+        task_timeout=settings.PERSONAL_SEED_TIMEOUT_SECONDS,
+    )
+
+    seen: set[str] = set()
+    candidates: List[Dict[str, Any]] = []
+    failed_seeds = 0
+    for recs in results + local:
+        if recs is None:
+            failed_seeds += 1
             continue
+        for rec in recs:
+            if rec["id"] not in seen:
+                seen.add(rec["id"])
+                candidates.append(rec)
 
-    return candidates
+    if failed_seeds:
+        logger.warning(f"{failed_seeds} of {len(calls)} seeds failed or timed out")
+    return candidates, failed_seeds
 
 
-def _rerank_by_personal_model(candidates: List[Dict[str, Any]], profile: UserProfile) -> List[Dict[str, Any]]:
-    """Score and sort by personal model: artist affinity, liked artist boost, already-logged penalty, Last.fm match."""
+@timed("rerank")
+def _rerank_by_personal_model(candidates: List[Dict[str, Any]], profile: UserProfile, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Score and rank by personal model: artist affinity, liked artist boost, already-logged penalty, Last.fm match.
+    Returns the best `limit` candidates (all of them if None)."""
     scored = []
     for c in candidates:
         artist = c.get("artist") or ""
@@ -103,27 +202,27 @@ def _rerank_by_personal_model(candidates: List[Dict[str, Any]], profile: UserPro
 
         scored.append((score, c))
 
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [c for _, c in scored]
+    return [c for _, c in top_k(scored, limit, key=lambda x: x[0])]
 
 
-def get_personal_recommendations(user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+def get_personal_recommendations(user_id: str, limit: int = 20) -> Tuple[List[Dict[str, Any]], int]:
     """
     Get recommendations personalized to the user: build profile from listening_logs,
     gather candidates from Last.fm (similar to user's top tracks/artists), rerank by personal model.
-    Returns list of { track, artist, id, reason, match_score } with source="lastfm" implied.
+    Returns (list of { track, artist, id, reason, match_score } with source="lastfm" implied,
+    number of seeds that failed or timed out); a non-zero count means the list is degraded.
     """
     profile = get_user_profile(user_id)
     if not profile:
-        return []
+        return [], 0
 
-    candidates = _gather_candidates(profile, limit_per_seed=10)
+    candidates, failed_seeds = _gather_candidates(profile, limit_per_seed=10, user_id=user_id)
     if not candidates:
-        return []
+        return [], failed_seeds
 
-    reranked = _rerank_by_personal_model(candidates, profile)
+    reranked = _rerank_by_personal_model(candidates, profile, limit=limit)
     out = []
-    for c in reranked[:limit]:
+    for c in reranked:
         out.append({
             "track": c["track"],
             "artist": c["artist"],
@@ -132,4 +231,4 @@ def get_personal_recommendations(user_id: str, limit: int = 20) -> List[Dict[str
             "reason": c.get("reason"),
             "match_score": c.get("match_score"),
         })
-    return out
+    return out, failed_seeds
@@ -0,0 +1,231 @@
+"""
+Precomputed per-user recommendation snapshots (REC_SNAPSHOTS_ENABLED).
+
+Instead of building /personal and /discover inside the request, a ranked pool of
+REC_SNAPSHOT_POOL_SIZE items per user is stored in the shared cache and served
+by slicing it. Snapshots are stale-while-revalidate:
+
+- fresh (younger than REC_SNAPSHOT_FRESH_SECONDS): served as is
+- stale (up to REC_SNAPSHOT_MAX_STALE_SECONDS): served, and a background refresh is queued
+- missing: built in the request (concurrent requests share one build)
+
+A background refresher also sweeps recently active users every
+REC_SNAPSHOT_SWEEP_SECONDS and rebuilds snapshots whose user has logged since
+(listening_logs version changed) or that have gone stale.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+import queue
+import threading
+import time
+
+from app.core.config import settings
+from app.db.supabase_client import get_supabase
+from app.services.cache import get_cache
+from app.services.discover_recommendations import get_discover_recommendations
+from app.services.personal_recommendations import get_personal_recommendations
+from app.services.user_profile import _fetch_logs_version
+from app.utils.rate_limiter import Priority, request_priority
+from app.utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+def _build_discover(user_id: str, limit: int) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    return get_discover_recommendations(user_id=user_id, limit=limit), None
+
+
+# kind -> builder returning (ranked items, failed seed count or None if the kind has no seeds)
+BUILDERS: Dict[str, Callable[..., Tuple[List[Dict[str, Any]], Optional[int]]]] = {
+    "personal": get_personal_recommendations,
+    "discover": _build_discover,
+}
+
+_flights = SingleFlight()
+
+
+def _snapshot_key(kind: str, user_id: str) -> str:
+    return f"rec_snapshot:{kind}:{user_id}"
+
+
+def _logs_version(user_id: str) -> Optional[List[Any]]:
+    supabase = get_supabase()
+    if not supabase:
+        return None
+    version = _fetch_logs_version(supabase, user_id)
+    return list(version) if version is not None else None
+
+
+def build_snapshot(kind: str, user_id: str) -> Dict[str, Any]:
+    """Compute the ranked pool for (kind, user) and store it. Returns the snapshot."""
+    version = _logs_version(user_id)
+    items, failed_seeds = BUILDERS[kind](user_id=user_id, limit=settings.REC_SNAPSHOT_POOL_SIZE)
+    snap = {"items": items, "built_at": time.time(), "logs_version": version, "failed_seeds": failed_seeds}
+    get_cache().set(_snapshot_key(kind, user_id), snap, settings.REC_SNAPSHOT_MAX_STALE_SECONDS)
+    logger.info(f"Built {kind} snapshot for {user_id}: {len(items)} items")
+    return snap
+
+
+def _headers(status: str, snap: Dict[str, Any], now: float) -> Dict[str, str]:
+    headers = {
+        "X-Snapshot-Status": status,
+        "X-Snapshot-Age": str(int(max(0.0, now - snap["built_at"]))),
+        "X-Snapshot-Built-At": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(snap["built_at"])),
+    }
+    if snap.get("failed_seeds") is not None:
+        headers["X-Failed-Seeds"] = str(snap["failed_seeds"])
+    return headers
+
+
+def get_snapshot_recommendations(kind: str, user_id: str, limit: int) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """
+    The user's top `limit` items from their snapshot, plus response headers
+    describing its freshness (X-Snapshot-Status: fresh | stale | miss, X-Snapshot-Age in seconds)
+    and, for personal snapshots, how many seeds failed when it was built (X-Failed-Seeds).
+    """
+    refresher = get_refresher()
+    refresher.touch(kind, user_id)
+    key = _snapshot_key(kind, user_id)
+    snap = get_cache().get(key)
+    now = time.time()
+    if snap is None:
+        snap = _flights.do(key, lambda: build_snapshot(kind, user_id))
+        status = "miss"
+    elif now - snap["built_at"] <= settings.REC_SNAPSHOT_FRESH_SECONDS:
+        status = "fresh"
+    else:
+        status = "stale"
+        refresher.request(kind, user_id)
+    return snap["items"][:limit], _headers(status, snap, time.time())
+
+
+class SnapshotRefresher:
+    """
+    Background threads that rebuild queued snapshots (deduplicated per user and kind)
+    at BACKGROUND rate-limit priority, plus a periodic sweep over recently active users.
+    """
+
+    def __init__(self, workers: int, sweep_interval: float, active_window: float):
+        self.workers = max(1, workers)
+        self.sweep_interval = sweep_interval
+        self.active_window = active_window
+        self._queue: "queue.Queue[Tuple[str, str]]" = queue.Queue()
+        self._queued: set[Tuple[str, str]] = set()
+        self._active: Dict[Tuple[str, str], float] = {}  # (kind, user_id) -> last request time
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.refreshed = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"rec-snapshot-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        t = threading.Thread(target=self._sweep_loop, name="rec-snapshot-sweep", daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        for t in self._threads:
+            t.join(max(0.0, deadline - time.monotonic()))
+        self._threads.clear()
+
+    def touch(self, kind: str, user_id: str) -> None:
+        with self._lock:
+            self._active[(kind, user_id)] = time.time()
+
+    def request(self, kind: str, user_id: str) -> None:
+        """Queue a rebuild unless one is already queued or running."""
+        item = (kind, user_id)
+        with self._lock:
+            if item in self._queued:
+                return
+            self._queued.add(item)
+        self._queue.put(item)
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            try:
+                kind, user_id = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            ok = False
+            try:
+                with request_priority(Priority.BACKGROUND):
+                    _flights.do(_snapshot_key(kind, user_id), lambda: build_snapshot(kind, user_id))
+                ok = True
+            except Exception as e:
+                logger.error(f"Snapshot refresh failed for {kind}/{user_id}: {e}")
+            finally:
+                # Counters are shared by the worker threads and read by stats()
+                with self._lock:
+                    if ok:
+                        self.refreshed += 1
+                    else:
+                        self.failed += 1
+                    self._queued.discard((kind, user_id))
+
+    def _sweep_loop(self) -> None:
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Snapshot sweep failed: {e}")
+
+    def sweep(self) -> None:
+        """Queue rebuilds for active users whose snapshot is missing, stale, or behind their logs."""
+        now = time.time()
+        with self._lock:
+            for item, seen in list(self._active.items()):
+                if now - seen > self.active_window:
+                    del self._active[item]
+            active = list(self._active)
+
+        cache = get_cache()
+        for kind, user_id in active:
+            snap = cache.get(_snapshot_key(kind, user_id))
+            if snap is None or now - snap["built_at"] > settings.REC_SNAPSHOT_FRESH_SECONDS:
+                self.request(kind, user_id)
+                continue
+            version = _logs_version(user_id)
+            if version is not None and version != snap.get("logs_version"):
+                self.request(kind, user_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "active_users": len(self._active),
+                "queued": len(self._queued),
+                "refreshed": self.refreshed,
+                "failed": self.failed,
+            }
+
+
+_refresher: SnapshotRefresher | None = None
+_refresher_lock = threading.Lock()
+
+
+def get_refresher() -> SnapshotRefresher:
+    """Process-wide refresher, started on first use."""
+    global _refresher
+    if _refresher is None:
+        with _refresher_lock:
+            if _refresher is None:
+                refresher = SnapshotRefresher(
+                    workers=settings.REC_SNAPSHOT_WORKERS,
+                    sweep_interval=settings.REC_SNAPSHOT_SWEEP_SECONDS,
+                    active_window=settings.REC_SNAPSHOT_ACTIVE_SECONDS,
+                )
+                refresher.start()
+                _refresher = refresher
+    return _refresher
+
+
+def stop_refresher() -> None:
+    global _refresher
+    if _refresher is not None:
+        _refresher.stop()
+        _refresher = None
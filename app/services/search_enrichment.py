@@ -1,5 +1,15 @@
 """Enrich search results with track.getInfo metadata (tags, genre)."""
-from typing import Dict, Any, List, Optional, Callable
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
+import asyncio
+import logging
+import time
+
+from app.core.config import settings
+from app.services.cache import get_cache
+from app.services.track_metadata import get_metadata_store
+from app.utils.metrics import timed
+
+logger = logging.getLogger(__name__)
 
 
 def extract_tags_from_track_info(track_info: Dict[str, Any]) -> List[str]:
@@ -46,13 +56,18 @@ def enrich_track_with_info(
     track_get_info_func: Callable[[str, str], Dict[str, Any]]
 ) -> Dict[str, Any]:
     """
-    Enrich a track with metadata from track.getInfo.
+    Enrich a track with metadata from track.getInfo (or the local metadata store if known).
     Returns dict with added 'tags' and 'genre' fields.
     """
     try:
-        info = track_get_info_func(track=track_name, artist=artist_name)
-        tags = extract_tags_from_track_info(info)
-        genre = extract_genre_from_track_info(info)
+        stored = _stored_tags([track_id]).get(track_id)
+        if stored is not None:
+            tags, genre = stored["tags"], stored["genre"]
+        else:
+            info = track_get_info_func(track=track_name, artist=artist_name)
+            tags = extract_tags_from_track_info(info)
+            genre = extract_genre_from_track_info(info)
+            _save_tags(track_id, tags, genre)
         
         return {
             "track": track_name,
@@ -72,3 +87,122 @@ def enrich_track_with_info(
             "tags": [],
             "genre": None,
         }
+
+
+def _tags_cache_key(track_id: str) -> str:
+    return f"track_tags:{track_id}"
+
+
+def _stored_tags(track_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Known {"tags", "genre"} per track id: local metadata store (one query), else the shared cache."""
+    store = get_metadata_store()
+    if store is not None:
+        return {
+            tid: {"tags": meta["tags"], "genre": meta["genre"]}
+            for tid, meta in store.get_many(track_ids).items()
+            if meta["tags"] is not None
+        }
+    cache = get_cache()
+    found = {}
+    for tid in track_ids:
+        cached = cache.get(_tags_cache_key(tid))
+        if cached is not None:
+            found[tid] = cached
+    return found
+
+
+def _save_tags(track_id: str, tags: List[str], genre: Optional[str]) -> None:
+    _save_tags_many([(track_id, tags, genre)])
+
+
+def _save_tags_many(items: List[Tuple[str, List[str], Optional[str]]]) -> None:
+    """Store (track_id, tags, genre) rows: one metadata store transaction, else one cache entry each."""
+    store = get_metadata_store()
+    if store is not None:
+        store.put_tags_many(items)
+        return
+    cache = get_cache()
+    for track_id, tags, genre in items:
+        cache.set(_tags_cache_key(track_id), {"tags": tags, "genre": genre}, settings.SEARCH_TAGS_CACHE_TTL_SECONDS)
+
+
+def _with_tags(track: Dict[str, Any], tags: List[str], genre: Optional[str]) -> Dict[str, Any]:
+    return {**track, "source": track.get("source", "lastfm"), "tags": tags, "genre": genre}
+
+
+async def _enrich_one(
+    track: Dict[str, Any],
+    track_get_info_func: Callable[..., Awaitable[Dict[str, Any]]],
+    semaphore: asyncio.Semaphore,
+) -> Dict[str, Any]:
+    """Tags/genre for one track from track.getInfo (bounded by the semaphore); stored by the caller."""
+    async with semaphore:
+        info = await track_get_info_func(track=track["track"], artist=track["artist"])
+    return _with_tags(track, extract_tags_from_track_info(info), extract_genre_from_track_info(info))
+
+
+@timed("enrich")
+async def enrich_tracks_concurrently(
+    tracks: List[Dict[str, Any]],
+    track_get_info_func: Callable[..., Awaitable[Dict[str, Any]]],
+    max_concurrency: int | None = None,
+    deadline: float | None = None,
+) -> tuple[List[Dict[str, Any]], int]:
+    """
+    Enrich many tracks (each needs track, artist, id). Tracks with stored metadata
+    are served locally; the rest go to track.getInfo with at most max_concurrency
+    calls in flight, under one overall deadline in seconds.
+    Returns (enriched tracks in input order, number enriched). Tracks whose lookup
+    failed or had not finished by the deadline come back unenriched (no tags/genre).
+    Stored metadata is read and the new lookups are written (in one batch) in a
+    worker thread, off the event loop.
+    """
+    if not tracks:
+        return [], 0
+    max_concurrency = max_concurrency or settings.SEARCH_ENRICH_MAX_CONCURRENCY
+    deadline = settings.SEARCH_ENRICH_DEADLINE_SECONDS if deadline is None else deadline
+
+    known = await asyncio.to_thread(_stored_tags, [t["id"] for t in tracks])
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    tasks = {
+        i: asyncio.create_task(_enrich_one(t, track_get_info_func, semaphore))
+        for i, t in enumerate(tracks)
+        if t["id"] not in known
+    }
+    started = time.monotonic()
+    pending: set = set()
+    if tasks:
+        _, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+        for task in pending:
+            task.cancel()
+
+    results: List[Dict[str, Any]] = []
+    fetched: List[Tuple[str, List[str], Optional[str]]] = []
+    enriched = 0
+    for i, track in enumerate(tracks):
+        task = tasks.get(i)
+        if task is None:
+            meta = known[track["id"]]
+            results.append(_with_tags(track, meta["tags"], meta["genre"]))
+            enriched += 1
+        elif task in pending:
+            results.append(_with_tags(track, [], None))
+        elif task.exception() is not None:
+            logger.debug(f"Enrichment failed for {track.get('id')}: {task.exception()}")
+            results.append(_with_tags(track, [], None))
+        else:
+            result = task.result()
+            results.append(result)
+            fetched.append((result["id"], result["tags"], result["genre"]))
+            enriched += 1
+    if fetched:
+        try:
+            await asyncio.to_thread(_save_tags_many, fetched)
+        except Exception as e:
+            logger.error(f"Saving enriched tags failed: {e}")
+    if pending:
+        logger.info(
+            f"Search enrichment deadline hit after {time.monotonic() - started:.2f}s: "
+            f"{enriched}/{len(tracks)} enriched ({len(known)} from local metadata)"
+        )
+    return results, enriched
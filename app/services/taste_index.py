@@ -0,0 +1,653 @@
+"""
+"Listeners like you": approximate nearest neighbors over user taste vectors.
+
+Each UserProfile becomes a sparse vector of its artist / tag / genre weights
+(feature-hashed into TASTE_DIM dimensions, L2-normalized, so dot = cosine).
+TasteIndex finds similar users with random-projection LSH:
+
+- n_tables hash tables, each keyed by the sign pattern of n_bits random projections
+- per table, signatures of indexed rows are kept sorted (np.searchsorted lookups);
+  rows inserted since the last rebuild sit in a small delta that is scanned linearly
+  and merged once it grows past a fraction of the index (incremental insertion)
+- queries also probe the buckets one bit-flip away on the least certain projections
+  (multi-probe LSH), which buys recall without more tables
+- candidates from all tables are re-scored exactly against the stored sparse vectors
+
+Updating a user appends a new row and retires the old one; retired rows are
+dropped by compact(). Neighbors' top tracks become recommendation candidates.
+In the app, profile inserts are queued to TasteIndexWriter, a background thread
+that also merges the delta and compacts, so request threads only query.
+Benchmarks: python -m benchmarks.taste_ann
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.user_profile import UserProfile, _normalize_artist, _normalize_genre, _normalize_tag
+from app.utils.ranking import top_k, top_k_indices
+
+logger = logging.getLogger(__name__)
+
+TASTE_DIM = 1 << 14
+FAMILY_WEIGHTS = {"a": 0.5, "t": 0.3, "g": 0.2}  # artists, tags, genres
+TOP_TRACKS_PER_USER = 10
+SIGNATURE_CHUNK_NNZ = 100_000
+INDEX_FORMAT = 1
+
+
+def _feature_index(key: str) -> int:
+    # crc32 is stable across processes (unlike hash()), so saved indexes stay valid
+    return zlib.crc32(key.encode("utf-8")) % TASTE_DIM
+
+
+def profile_vector(profile: UserProfile) -> Tuple[np.ndarray, np.ndarray]:
+    """Sparse (indices, values) taste vector for a profile, unit length (empty if no data)."""
+    families = {
+        "a": [(_normalize_artist(a), s) for a, s in profile.top_artists],
+        "t": [(_normalize_tag(t), s) for t, s in profile.top_tags],
+        "g": [(_normalize_genre(g), s) for g, s in profile.genre_preferences.items()],
+    }
+    acc: Dict[int, float] = {}
+    for family, items in families.items():
+        # Normalize each family first so e.g. 30 artists don't drown out 5 genres
+        norm = sum(s * s for _, s in items) ** 0.5
+        if not items or norm <= 0:
+            continue
+        scale = FAMILY_WEIGHTS[family] / norm
+        for key, s in items:
+            if key:
+                i = _feature_index(f"{family}:{key}")
+                acc[i] = acc.get(i, 0.0) + s * scale
+    if not acc:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+    idx = np.fromiter(acc.keys(), dtype=np.int32, count=len(acc))
+    val = np.fromiter(acc.values(), dtype=np.float32, count=len(acc))
+    order = np.argsort(idx)
+    idx, val = idx[order], val[order]
+    return idx, val / np.float32(np.linalg.norm(val))
+
+
+def _gather_positions(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(start, start + length) for each row, without a Python loop."""
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    bounds = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    return np.arange(total, dtype=np.int64) + np.repeat(starts - bounds, lengths)
+
+
+def _grow(a: np.ndarray, needed: int) -> np.ndarray:
+    if needed <= a.shape[0]:
+        return a
+    new = np.empty((max(needed, a.shape[0] * 2, 1024),) + a.shape[1:], dtype=a.dtype)
+    new[: a.shape[0]] = a
+    return new
+
+
+class TasteIndex:
+    """Random-projection LSH over sparse unit vectors, keyed by user id."""
+
+    def __init__(
+        self,
+        n_tables: int = 32,
+        n_bits: int = 12,
+        probes: int = 8,
+        seed: int = 7,
+        delta_fraction: float = 0.05,
+    ):
+        if not 1 <= n_bits <= 32:
+            raise ValueError("n_bits must be between 1 and 32")
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.probes = min(probes, n_bits)
+        self.seed = seed
+        self.delta_fraction = delta_fraction
+        # Projection rows are drawn per feature on first use (seeded by (seed, feature)), so
+        # memory grows with the features actually seen rather than all TASTE_DIM of them
+        self._plane_slot = np.full(TASTE_DIM, -1, dtype=np.int32)
+        self._plane_rows = np.empty((0, n_tables * n_bits), dtype=np.float32)
+        self._plane_count = 0
+        self._plane_lock = threading.Lock()
+        self._weights = (1 << np.arange(n_bits, dtype=np.uint64)).astype(np.uint64)
+        self._lock = threading.RLock()
+
+        # Rows (append-only; a re-inserted user gets a new row and the old one is retired)
+        self._n = 0
+        self._sigs = np.empty((0, n_tables), dtype=np.uint32)
+        self._alive = np.empty(0, dtype=bool)
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._idx = np.empty(0, dtype=np.int32)
+        self._val = np.empty(0, dtype=np.float32)
+        self._nnz = 0
+        self._row_user: List[str] = []
+        self._user_row: Dict[str, int] = {}
+        self._fingerprints: Dict[str, int] = {}
+        self._top_tracks: Dict[str, Tuple[Tuple[str, str, float], ...]] = {}
+
+        # Sorted per-table signatures for rows [0, _indexed)
+        self._indexed = 0
+        self._generation = 0  # bumped by compact(), which renumbers rows
+        self._sorted_sigs = [np.empty(0, dtype=np.uint32) for _ in range(n_tables)]
+        self._sorted_rows = [np.empty(0, dtype=np.int64) for _ in range(n_tables)]
+
+    def __len__(self) -> int:
+        return len(self._user_row)
+
+    # ---- hashing -------------------------------------------------------------
+    def _planes(self, idx: np.ndarray) -> np.ndarray:
+        """(len(idx), n_tables * n_bits) Gaussian projection rows for feature indices idx."""
+        slots = self._plane_slot[idx]
+        if (slots < 0).any():
+            with self._plane_lock:
+                missing = np.unique(idx[self._plane_slot[idx] < 0])
+                if missing.shape[0]:
+                    start = self._plane_count
+                    self._plane_rows = _grow(self._plane_rows, start + missing.shape[0])
+                    width = self.n_tables * self.n_bits
+                    for i, feature in enumerate(missing):
+                        rng = np.random.default_rng([self.seed, int(feature)])
+                        self._plane_rows[start + i] = rng.standard_normal(width, dtype=np.float32)
+                    self._plane_count = start + missing.shape[0]
+                    # Publish slots only after the rows are written, for lock-free readers
+                    self._plane_slot[missing] = np.arange(start, self._plane_count, dtype=np.int32)
+                slots = self._plane_slot[idx]
+                return self._plane_rows[slots]
+        return self._plane_rows[slots]
+
+    def _signatures(self, indptr: np.ndarray, idx: np.ndarray, val: np.ndarray) -> np.ndarray:
+        """(rows, n_tables) uint32 signatures for a CSR batch."""
+        rows = indptr.shape[0] - 1
+        out = np.empty((rows, self.n_tables), dtype=np.uint32)
+        # Chunk rows so the (nonzeros x projections) intermediate stays around SIGNATURE_CHUNK_NNZ
+        start = 0
+        while start < rows:
+            end = int(np.searchsorted(indptr, indptr[start] + SIGNATURE_CHUNK_NNZ, side="right")) - 1
+            end = min(rows, max(end, start + 1))
+            sub = indptr[start:end + 1] - indptr[start]
+            lo, hi = indptr[start], indptr[end]
+            proj = np.zeros((end - start, self.n_tables * self.n_bits), dtype=np.float32)
+            if hi > lo:
+                # proj[r] = sum over the row's nonzeros of val * planes[idx]
+                contrib = self._planes(idx[lo:hi]) * val[lo:hi, None]
+                nonempty = np.flatnonzero(np.diff(sub) > 0)
+                proj[nonempty] = np.add.reduceat(contrib, sub[nonempty], axis=0)
+            bits = (proj > 0).reshape(end - start, self.n_tables, self.n_bits).astype(np.uint64)
+            out[start:end] = (bits @ self._weights).astype(np.uint32)
+            start = end
+        return out
+
+    def _probe_keys(self, idx: np.ndarray, val: np.ndarray, probes: int) -> np.ndarray:
+        """(n_tables, 1 + probes) bucket keys for a query: its own bucket, then single bit flips."""
+        proj = (self._planes(idx) * val[:, None]).sum(axis=0).reshape(self.n_tables, self.n_bits)
+        sig = ((proj > 0).astype(np.uint64) @ self._weights).astype(np.uint32)
+        # Flip the bits whose projections were closest to zero first
+        flips = np.argsort(np.abs(proj), axis=1)[:, :probes]
+        flipped = sig[:, None] ^ self._weights[flips].astype(np.uint32)
+        return np.concatenate([sig[:, None], flipped], axis=1)
+
+    # ---- insertion -----------------------------------------------------------
+    def add(
+        self,
+        user_id: str,
+        idx: np.ndarray,
+        val: np.ndarray,
+        top_tracks: Sequence[Tuple[str, str, float]] = (),
+        reindex: bool = True,
+    ) -> bool:
+        """Insert or update one user. Returns False if the vector is unchanged."""
+        fingerprint = zlib.crc32(idx.tobytes() + val.tobytes())
+        with self._lock:
+            if self._fingerprints.get(user_id) == fingerprint:
+                return False
+        self.add_batch([user_id], np.array([0, idx.shape[0]], dtype=np.int64), idx, val, [top_tracks], reindex=reindex)
+        return True
+
+    def add_batch(
+        self,
+        user_ids: Sequence[str],
+        indptr: np.ndarray,
+        idx: np.ndarray,
+        val: np.ndarray,
+        top_tracks: Optional[Sequence[Sequence[Tuple[str, str, float]]]] = None,
+        reindex: bool = True,
+    ) -> None:
+        """
+        Insert or update many users from CSR arrays (indptr has len(user_ids) + 1 entries).
+        With reindex=False the delta is never merged here; the caller runs maintain().
+        """
+        count = len(user_ids)
+        if count == 0:
+            return
+        idx = np.asarray(idx, dtype=np.int32)
+        val = np.asarray(val, dtype=np.float32)
+        indptr = np.asarray(indptr, dtype=np.int64) - int(indptr[0])
+        sigs = self._signatures(indptr, idx, val)
+
+        with self._lock:
+            start, nnz = self._n, self._nnz
+            self._sigs = _grow(self._sigs, start + count)
+            self._alive = _grow(self._alive, start + count)
+            self._indptr = _grow(self._indptr, start + count + 1)
+            self._idx = _grow(self._idx, nnz + idx.shape[0])
+            self._val = _grow(self._val, nnz + idx.shape[0])
+
+            self._sigs[start:start + count] = sigs
+            self._alive[start:start + count] = True
+            self._indptr[start + 1:start + count + 1] = indptr[1:] + nnz
+            self._idx[nnz:nnz + idx.shape[0]] = idx
+            self._val[nnz:nnz + idx.shape[0]] = val
+            self._n += count
+            self._nnz += idx.shape[0]
+
+            for i, user_id in enumerate(user_ids):
+                old = self._user_row.get(user_id)
+                if old is not None:
+                    self._alive[old] = False
+                row = start + i
+                self._user_row[user_id] = row
+                self._row_user.append(user_id)
+                lo, hi = indptr[i], indptr[i + 1]
+                self._fingerprints[user_id] = zlib.crc32(idx[lo:hi].tobytes() + val[lo:hi].tobytes())
+                if top_tracks is not None:
+                    self._top_tracks[user_id] = tuple(top_tracks[i])
+
+            if reindex and self._delta_too_large():
+                self._reindex()
+
+    def add_profile(self, user_id: str, profile: UserProfile, reindex: bool = True) -> bool:
+        """Insert or update a user from their profile (no-op if their taste vector is unchanged)."""
+        idx, val = profile_vector(profile)
+        tracks = [(t, a, s) for t, a, s in profile.top_tracks[:TOP_TRACKS_PER_USER]]
+        if not idx.shape[0]:
+            return False
+        return self.add(user_id, idx, val, tracks, reindex=reindex)
+
+    def _delta_too_large(self) -> bool:
+        return self._n - self._indexed > max(1024, self.delta_fraction * self._indexed)
+
+    def _reindex(self) -> None:
+        """Merge the delta into the sorted per-table arrays (holding the lock)."""
+        rows = np.flatnonzero(self._alive[: self._n])
+        for t in range(self.n_tables):
+            keys = self._sigs[rows, t]
+            order = np.argsort(keys, kind="stable")
+            self._sorted_sigs[t] = keys[order]
+            self._sorted_rows[t] = rows[order]
+        self._indexed = self._n
+
+    def reindex(self) -> None:
+        """
+        Merge the delta like _reindex, but sort outside the lock so queries keep
+        running; rows added meanwhile stay in the delta.
+        """
+        with self._lock:
+            n, generation = self._n, self._generation
+            rows = np.flatnonzero(self._alive[:n])
+            sigs = self._sigs[rows]
+        sorted_sigs, sorted_rows = [], []
+        for t in range(self.n_tables):
+            order = np.argsort(sigs[:, t], kind="stable")
+            sorted_sigs.append(sigs[order, t])
+            sorted_rows.append(rows[order])
+        with self._lock:
+            if self._generation != generation:
+                return  # compacted meanwhile; rows were renumbered and the tables rebuilt
+            # Rows retired since the snapshot are filtered by _alive at query time
+            self._sorted_sigs = sorted_sigs
+            self._sorted_rows = sorted_rows
+            self._indexed = n
+
+    def maintain(self, compact_fraction: float = 0.25) -> Optional[str]:
+        """
+        Compact if retired rows exceed compact_fraction of all rows, else merge an
+        oversized delta. Returns "compact", "reindex" or None (nothing to do).
+        """
+        with self._lock:
+            retired = self._n - len(self._user_row)
+            if self._n and retired > compact_fraction * self._n:
+                self.compact()
+                return "compact"
+            if not self._delta_too_large():
+                return None
+        self.reindex()
+        return "reindex"
+
+    def compact(self) -> None:
+        """Drop retired rows (after many profile updates) and rebuild the tables."""
+        with self._lock:
+            live = np.flatnonzero(self._alive[: self._n])
+            lengths = np.diff(self._indptr[: self._n + 1])[live]
+            starts = self._indptr[live]
+            take = _gather_positions(starts, lengths)
+            self._idx = self._idx[take].copy()
+            self._val = self._val[take].copy()
+            self._indptr = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+            self._sigs = self._sigs[live].copy()
+            self._alive = np.ones(live.shape[0], dtype=bool)
+            self._row_user = [self._row_user[r] for r in live]
+            self._user_row = {u: i for i, u in enumerate(self._row_user)}
+            self._n = live.shape[0]
+            self._nnz = self._idx.shape[0]
+            self._generation += 1
+            self._reindex()
+
+    # ---- queries -------------------------------------------------------------
+    def _candidates(self, keys: np.ndarray) -> np.ndarray:
+        """Live rows sharing any probed bucket (keys: n_tables x probes) in any table."""
+        found = []
+        for t in range(self.n_tables):
+            table = self._sorted_sigs[t]
+            lo = np.searchsorted(table, keys[t], side="left")
+            hi = np.searchsorted(table, keys[t], side="right")
+            found.append(self._sorted_rows[t][_gather_positions(lo, hi - lo)])
+        if self._n > self._indexed:
+            delta_sigs = self._sigs[self._indexed:self._n]
+            hit = (delta_sigs[:, :, None] == keys[None, :, :]).any(axis=(1, 2))
+            found.append(np.flatnonzero(hit) + self._indexed)
+        rows = np.unique(np.concatenate(found))
+        return rows[self._alive[rows]]
+
+    def _scores(self, rows: np.ndarray, idx: np.ndarray, val: np.ndarray) -> np.ndarray:
+        """Exact dot products between the query and each row's stored vector."""
+        if rows.shape[0] == 0:
+            return np.empty(0, dtype=np.float32)
+        dense = np.zeros(TASTE_DIM, dtype=np.float32)
+        dense[idx] = val
+        starts = self._indptr[rows]
+        lengths = self._indptr[rows + 1] - starts
+        # Gather every candidate's nonzeros into one flat array, then sum per row
+        flat = _gather_positions(starts, lengths)
+        if flat.shape[0] == 0:
+            return np.zeros(rows.shape[0], dtype=np.float32)
+        products = dense[self._idx[flat]] * self._val[flat]
+        bounds = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        scores = np.zeros(rows.shape[0], dtype=np.float32)
+        nonempty = lengths > 0
+        scores[nonempty] = np.add.reduceat(products, bounds[nonempty])
+        return scores
+
+    def query(
+        self,
+        idx: np.ndarray,
+        val: np.ndarray,
+        k: int = 20,
+        exclude: Optional[str] = None,
+        probes: Optional[int] = None,
+    ) -> List[Tuple[str, float]]:
+        """Top-k (user_id, cosine similarity) among LSH candidates, best first."""
+        if not idx.shape[0]:
+            return []
+        keys = self._probe_keys(idx, val, self.probes if probes is None else min(probes, self.n_bits))
+        with self._lock:
+            rows = self._candidates(keys)
+            if exclude is not None and exclude in self._user_row:
+                rows = rows[rows != self._user_row[exclude]]
+            scores = self._scores(rows, idx, val)
+            best = top_k_indices(scores, k)
+            return [(self._row_user[rows[i]], float(scores[i])) for i in best]
+
+    def exact_query(self, idx: np.ndarray, val: np.ndarray, k: int = 20, exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Brute-force top-k over every live row (ground truth for recall measurements)."""
+        with self._lock:
+            rows = np.flatnonzero(self._alive[: self._n])
+            if exclude is not None and exclude in self._user_row:
+                rows = rows[rows != self._user_row[exclude]]
+            scores = self._scores(rows, idx, val)
+            best = top_k_indices(scores, k)
+            return [(self._row_user[rows[i]], float(scores[i])) for i in best]
+
+    def neighbors(self, user_id: str, profile: UserProfile, k: int = 20) -> List[Tuple[str, float]]:
+        idx, val = profile_vector(profile)
+        return self.query(idx, val, k=k, exclude=user_id)
+
+    def top_tracks(self, user_id: str) -> Tuple[Tuple[str, str, float], ...]:
+        return self._top_tracks.get(user_id, ())
+
+    # ---- persistence ---------------------------------------------------------
+    def save(self, path: str) -> None:
+        """Write live rows to a compressed .npz (atomically)."""
+        with self._lock:
+            self.compact()
+            meta = {
+                "format": INDEX_FORMAT,
+                "dim": TASTE_DIM,
+                "n_tables": self.n_tables,
+                "n_bits": self.n_bits,
+                "probes": self.probes,
+                "seed": self.seed,
+                "users": self._row_user,
+                "top_tracks": {u: list(t) for u, t in self._top_tracks.items() if u in self._user_row},
+            }
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp = f"{path}.tmp.npz"
+            np.savez_compressed(
+                tmp,
+                indptr=self._indptr[: self._n + 1],
+                idx=self._idx[: self._nnz],
+                val=self._val[: self._nnz],
+                meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+            )
+            os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TasteIndex":
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            if meta.get("format") != INDEX_FORMAT or meta.get("dim") != TASTE_DIM:
+                raise ValueError(f"Incompatible taste index {path}")
+            index = cls(
+                n_tables=meta["n_tables"], n_bits=meta["n_bits"], probes=meta.get("probes", 8), seed=meta["seed"]
+            )
+            top = meta.get("top_tracks", {})
+            users = meta["users"]
+            index.add_batch(
+                users, data["indptr"], data["idx"], data["val"],
+                [[tuple(t) for t in top.get(u, [])] for u in users],
+            )
+        with index._lock:
+            index._reindex()
+        return index
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "users": len(self._user_row),
+                "rows": self._n,
+                "delta_rows": self._n - self._indexed,
+                "retired_rows": self._n - len(self._user_row),
+                "nnz": self._nnz,
+                "n_tables": self.n_tables,
+                "n_bits": self.n_bits,
+                "probes": self.probes,
+                "projection_features": self._plane_count,
+            }
+
+
+_index: TasteIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_taste_index() -> Optional[TasteIndex]:
+    """
+    Process-wide index: loaded from TASTE_INDEX_PATH if a build exists, else empty and
+    filled as users' profiles are seen. None when TASTE_NEIGHBORS_ENABLED is off.
+    """
+    global _index
+    if not settings.TASTE_NEIGHBORS_ENABLED:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = None
+                if os.path.exists(settings.TASTE_INDEX_PATH):
+                    try:
+                        started = time.monotonic()
+                        index = TasteIndex.load(settings.TASTE_INDEX_PATH)
+                        logger.info(f"Loaded taste index in {time.monotonic() - started:.1f}s: {index.stats()}")
+                    except (OSError, ValueError, KeyError) as e:
+                        logger.error(f"Failed to load taste index {settings.TASTE_INDEX_PATH}: {e}")
+                _index = index or TasteIndex()
+    return _index
+
+
+class TasteIndexWriter:
+    """
+    Background thread that applies queued profile inserts to a TasteIndex and runs
+    its maintenance (delta merge, compaction), so request threads never write to it.
+    Inserts are deduplicated per user; the latest queued profile wins.
+    """
+
+    def __init__(self, index: TasteIndex, interval: float, compact_fraction: float):
+        self.index = index
+        self.interval = interval
+        self.compact_fraction = compact_fraction
+        self._pending: Dict[str, UserProfile] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.applied = 0
+        self.reindexed = 0
+        self.compacted = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._work, name="taste-index-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, user_id: str, profile: UserProfile) -> None:
+        """Queue a user's profile for insertion (returns immediately)."""
+        with self._lock:
+            self._pending[user_id] = profile
+
+    def flush(self) -> None:
+        """Apply queued inserts and run maintenance now (on the calling thread)."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for user_id, profile in pending.items():
+            try:
+                if self.index.add_profile(user_id, profile, reindex=False):
+                    self.applied += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Taste index insert failed for {user_id}: {e}")
+        done = self.index.maintain(self.compact_fraction)
+        if done == "compact":
+            self.compacted += 1
+        elif done == "reindex":
+            self.reindexed += 1
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Taste index maintenance failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "applied": self.applied,
+            "reindexed": self.reindexed,
+            "compacted": self.compacted,
+            "failed": self.failed,
+        }
+
+
+_writer: TasteIndexWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def get_taste_writer() -> Optional[TasteIndexWriter]:
+    """Process-wide writer for get_taste_index(), started on first use (None when disabled)."""
+    global _writer
+    index = get_taste_index()
+    if index is None:
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                writer = TasteIndexWriter(
+                    index,
+                    interval=settings.TASTE_INDEX_WRITE_INTERVAL_SECONDS,
+                    compact_fraction=settings.TASTE_INDEX_COMPACT_FRACTION,
+                )
+                writer.start()
+                _writer = writer
+    return _writer
+
+
+def stop_taste_writer() -> None:
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+
+
+def taste_neighbor_tracks(
+    index: TasteIndex,
+    user_id: str,
+    profile: UserProfile,
+    neighbors: int = 20,
+    limit: int = 20,
+) -> List[Tuple[str, str, float]]:
+    """
+    Candidate (track, artist, score) from the top tracks of the user's nearest taste
+    neighbors. A track's score is the similarity of the neighbors who rank it as a
+    share of all neighbors' similarity (0-1), so tracks shared by several close
+    neighbors come first.
+    """
+    scores: Dict[Tuple[str, str], float] = {}
+    labels: Dict[Tuple[str, str], Tuple[str, str]] = {}
+    total = 0.0
+    for other, sim in index.neighbors(user_id, profile, k=neighbors):
+        if sim <= 0:
+            continue
+        total += sim
+        for track, artist, _ in index.top_tracks(other):
+            key = (_normalize_artist(artist), track.strip().lower())
+            labels.setdefault(key, (track, artist))
+            scores[key] = scores.get(key, 0.0) + sim
+    ranked = top_k(scores.items(), limit, key=lambda kv: kv[1])
+    return [(labels[key][0], labels[key][1], score / total) for key, score in ranked]
+
+
+def iter_profiles_to_csr(
+    items: Iterable[Tuple[str, UserProfile]],
+) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray, List[List[Tuple[str, str, float]]]]:
+    """Vectorize many profiles into CSR arrays for TasteIndex.add_batch."""
+    users: List[str] = []
+    indptr = [0]
+    idx_parts: List[np.ndarray] = []
+    val_parts: List[np.ndarray] = []
+    tracks: List[List[Tuple[str, str, float]]] = []
+    for user_id, profile in items:
+        idx, val = profile_vector(profile)
+        if not idx.shape[0]:
+            continue
+        users.append(user_id)
+        idx_parts.append(idx)
+        val_parts.append(val)
+        indptr.append(indptr[-1] + idx.shape[0])
+        tracks.append([(t, a, s) for t, a, s in profile.top_tracks[:TOP_TRACKS_PER_USER]])
+    if not users:
+        return [], np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32), []
+    return users, np.array(indptr, dtype=np.int64), np.concatenate(idx_parts), np.concatenate(val_parts), tracks
@@ -0,0 +1,252 @@
+"""
+Persistent local store for track metadata (tags, genre, similar tracks).
+
+Track tags and similar-track lists almost never change, so once a track has been
+looked up on Last.fm its metadata is kept in a local SQLite file (WAL mode) and
+later reads are served from disk instead of the network. Keys are the track's
+mbid or the "<artist>_<track>" id used across the API.
+
+Tags/genre and similar lists are written independently: a row can know a track's
+tags without its similar list and vice versa (NULL = not fetched yet).
+
+Bulk prefill from a JSONL dump:
+    python -m app.services.track_metadata prefill dump.jsonl
+One object per line: {"id"|("track","artist"[,"mbid"]), "tags", "genre", "similar"}.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PREFILL_BATCH_SIZE = 1000
+
+
+def metadata_track_id(track: str, artist: str, mbid: str = "") -> str:
+    """Store key for a track: its mbid, else the "<artist>_<track>" id form."""
+    mbid = (mbid or "").strip()
+    if mbid:
+        return mbid
+    a, t = (artist or "").strip().lower(), (track or "").strip().lower()
+    return f"{a}_{t}".replace(" ", "_").replace("/", "_")
+
+
+class TrackMetadataStore:
+    """
+    SQLite-backed track metadata, shared by every process that opens the same path.
+    Similar lists older than similar_max_age seconds are treated as missing.
+    """
+
+    def __init__(self, path: str, similar_max_age: float = 30 * 24 * 3600.0):
+        self.path = path
+        self.similar_max_age = similar_max_age
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn().execute(
+            "create table if not exists track_metadata ("
+            " track_id text primary key,"
+            " tags text,"
+            " genre text,"
+            " tags_updated_at real,"
+            " similar text,"
+            " similar_updated_at real)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections are not shareable across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("pragma journal_mode=wal")
+            conn.execute("pragma synchronous=normal")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def _row_to_dict(self, row: tuple, now: float) -> Dict[str, Any]:
+        track_id, tags, genre, _, similar, similar_at = row
+        fresh_similar = similar is not None and similar_at is not None and now - similar_at < self.similar_max_age
+        return {
+            "id": track_id,
+            "tags": json.loads(tags) if tags is not None else None,
+            "genre": genre,
+            "similar": json.loads(similar) if fresh_similar else None,
+        }
+
+    def get(self, track_id: str) -> Optional[Dict[str, Any]]:
+        """{"id", "tags", "genre", "similar"} for a track, or None if nothing is stored."""
+        return self.get_many([track_id]).get(track_id)
+
+    def get_many(self, track_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Stored metadata for each known id (unknown ids are left out)."""
+        ids = list(dict.fromkeys(i for i in track_ids if i))
+        if not ids:
+            return {}
+        now = time.time()
+        found: Dict[str, Dict[str, Any]] = {}
+        try:
+            conn = self._conn()
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows = conn.execute(
+                    "select track_id, tags, genre, tags_updated_at, similar, similar_updated_at"
+                    f" from track_metadata where track_id in ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for row in rows:
+                    found[row[0]] = self._row_to_dict(row, now)
+        except sqlite3.Error as e:
+            logger.error(f"Track metadata read failed: {e}")
+            return {}
+        self._count("hits", len(found))
+        self._count("misses", len(ids) - len(found))
+        return found
+
+    def put_tags(self, track_id: str, tags: List[str], genre: Optional[str]) -> None:
+        self._upsert([(track_id, json.dumps(tags), genre, None)], similar=False)
+
+    def put_tags_many(self, items: Iterable[Tuple[str, List[str], Optional[str]]]) -> None:
+        """put_tags for many (track_id, tags, genre) in one transaction."""
+        rows = [(tid, json.dumps(tags), genre, None) for tid, tags, genre in items]
+        if rows:
+            self._upsert(rows, similar=False)
+
+    def put_similar(self, track_id: str, similar: List[Dict[str, Any]]) -> None:
+        self._upsert([(track_id, None, None, json.dumps(similar))], similar=True)
+
+    def _upsert(self, rows: List[tuple], similar: bool) -> None:
+        now = time.time()
+        if similar:
+            sql = (
+                "insert into track_metadata (track_id, similar, similar_updated_at) values (?, ?, ?)"
+                " on conflict(track_id) do update set"
+                " similar = excluded.similar, similar_updated_at = excluded.similar_updated_at"
+            )
+            params = [(tid, sim, now) for tid, _, _, sim in rows]
+        else:
+            sql = (
+                "insert into track_metadata (track_id, tags, genre, tags_updated_at) values (?, ?, ?, ?)"
+                " on conflict(track_id) do update set"
+                " tags = excluded.tags, genre = excluded.genre, tags_updated_at = excluded.tags_updated_at"
+            )
+            params = [(tid, tags, genre, now) for tid, tags, genre, _ in rows]
+        try:
+            conn = self._conn()
+            conn.execute("begin")
+            try:
+                conn.executemany(sql, params)
+                conn.execute("commit")
+            except BaseException:
+                conn.execute("rollback")
+                raise
+        except sqlite3.Error as e:
+            logger.error(f"Track metadata write failed: {e}")
+            return
+        self._count("writes", len(params))
+
+    def prefill_jsonl(self, path: str) -> int:
+        """Bulk-load a JSONL dump (see module docstring). Returns the number of records loaded."""
+        tag_rows: List[tuple] = []
+        similar_rows: List[tuple] = []
+        loaded = 0
+
+        def flush() -> None:
+            if tag_rows:
+                self._upsert(tag_rows, similar=False)
+                tag_rows.clear()
+            if similar_rows:
+                self._upsert(similar_rows, similar=True)
+                similar_rows.clear()
+
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    logger.warning(f"Skipping malformed line {line_no} in {path}: {e}")
+                    continue
+                track_id = record.get("id") or metadata_track_id(
+                    record.get("track", ""), record.get("artist", ""), record.get("mbid", "")
+                )
+                if not track_id or track_id == "_":
+                    continue
+                if record.get("tags") is not None:
+                    tags = [str(t).strip().lower() for t in record["tags"] if str(t).strip()]
+                    tag_rows.append((track_id, json.dumps(tags), record.get("genre") or (tags[0] if tags else None), None))
+                if record.get("similar") is not None:
+                    similar_rows.append((track_id, None, None, json.dumps(record["similar"])))
+                loaded += 1
+                if len(tag_rows) + len(similar_rows) >= PREFILL_BATCH_SIZE:
+                    flush()
+        flush()
+        return loaded
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            (size,) = self._conn().execute("select count(*) from track_metadata").fetchone()
+        except sqlite3.Error:
+            size = -1
+        with self._lock:
+            return {"path": self.path, "size": size, "hits": self.hits, "misses": self.misses, "writes": self.writes}
+
+
+_store: TrackMetadataStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_metadata_store() -> TrackMetadataStore | None:
+    """Process-wide metadata store, or None if TRACK_METADATA_ENABLED is off or the file can't be opened."""
+    global _store
+    if not settings.TRACK_METADATA_ENABLED:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                try:
+                    _store = TrackMetadataStore(
+                        settings.TRACK_METADATA_PATH,
+                        similar_max_age=settings.TRACK_METADATA_SIMILAR_MAX_AGE_SECONDS,
+                    )
+                except (sqlite3.Error, OSError) as e:
+                    logger.error(f"Track metadata store unavailable: {e}")
+                    return None
+    return _store
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local track metadata store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    prefill = sub.add_parser("prefill", help="Bulk-load metadata from a JSONL dump")
+    prefill.add_argument("path")
+    sub.add_parser("stats", help="Show store size")
+    args = parser.parse_args()
+
+    store = get_metadata_store()
+    if store is None:
+        raise SystemExit("Track metadata store is disabled or unavailable")
+    if args.command == "prefill":
+        started = time.monotonic()
+        n = store.prefill_jsonl(args.path)
+        print(f"Loaded {n} records into {store.path} in {time.monotonic() - started:.1f}s")
+    print(store.stats())
@@ -1,10 +1,19 @@
-"""Build a personal model from the user's listening_logs in Supabase."""
+"""Build a personal model from the user's listening_logs and artist_logs in Supabase."""
+from array import array
+from bisect import bisect_left
 from collections import Counter, defaultdict
 from typing import Any, Dict
 from datetime import datetime, timezone
 import logging
+import marshal
+import time
 
+from app.core.config import settings
 from app.db.supabase_client import get_supabase
+from app.services.cache import get_cache
+from app.utils.interning import strings
+from app.utils.metrics import timed
+from app.utils.ranking import top_k
 
 logger = logging.getLogger(__name__)
 
@@ -26,11 +35,17 @@ def _track_id(artist: str, track: str) -> str:
 
 
 def _calculate_recency_weight(logged_at_str: str) -> float:
-    """Calculate recency weight: more recent logs have higher weight."""
+    """
+    Calculate recency weight: more recent logs have higher weight.
+    Age is counted in UTC calendar days, like user_pref_recency_weight in
+    "supabase sql/user_preference_aggregates.sql", so both paths bucket a log the same way.
+    """
     try:
         logged_at = datetime.fromisoformat(logged_at_str.replace('Z', '+00:00'))
+        if logged_at.tzinfo is None:
+            logged_at = logged_at.replace(tzinfo=timezone.utc)
         now = datetime.now(timezone.utc)
-        days_ago = (now - logged_at).days
+        days_ago = (now.date() - logged_at.astimezone(timezone.utc).date()).days
         
         # Recent (last 30 days): 1.5x weight
         if days_ago <= 30:
@@ -53,8 +68,54 @@ def _calculate_rating_weight(rating: int | None) -> float:
     return 0.5 + (rating / 10.0) * 1.5
 
 
+def _sorted_lookup(pairs: Dict[int, float]) -> tuple[array, array]:
+    """Parallel (sorted key ids, values) arrays for bisect lookups."""
+    keys = sorted(pairs)
+    return array("q", keys), array("d", (pairs[k] for k in keys))
+
+
+def _lookup(keys: array, values: array, s: str) -> float | None:
+    key_id = strings.lookup(s)
+    if key_id is None:
+        return None
+    i = bisect_left(keys, key_id)
+    if i < len(keys) and keys[i] == key_id:
+        return values[i]
+    return None
+
+
+def _contains(keys: array, s: str) -> bool:
+    key_id = strings.lookup(s)
+    if key_id is None:
+        return False
+    i = bisect_left(keys, key_id)
+    return i < len(keys) and keys[i] == key_id
+
+
 class UserProfile:
-    """Enhanced personal model with genre/tag preferences weighted by rating, recency, and favorites."""
+    """
+    Enhanced personal model with genre/tag preferences weighted by rating, recency, and favorites.
+
+    Stored compactly for large in-memory profile caches: weights live in typed
+    arrays, and the normalized artist/tag/genre lookup keys are int ids in the
+    process-wide string table, kept sorted for bisect instead of per-profile
+    dicts/sets. Display names (track titles and the spellings users typed) and
+    logged track ids are mostly unique to one user, so interning them would grow
+    the never-freed table with every user seen; each profile keeps them as its
+    own tuples/frozenset.
+    The list/dict/set attributes of the original model are exposed as read-only
+    views built on access; to_bytes()/from_bytes() give a cheap cache encoding.
+    """
+
+    __slots__ = (
+        "_artist_names", "_artist_scores", "_artist_keys", "_artist_key_scores",
+        "_track_names", "_track_artists", "_track_scores",
+        "_tag_names", "_tag_scores", "_tag_keys", "_tag_key_scores",
+        "_genre_names", "_genre_scores", "_genre_keys", "_genre_key_scores",
+        "_logged_ids", "_liked_names", "_liked_keys",
+    )
+
+    BYTES_FORMAT = 1
 
     def __init__(
         self,
@@ -65,26 +126,83 @@ class UserProfile:
         top_tags: list[tuple[str, float]] | None = None,  # (tag_name, weighted_score)
         genre_preferences: Dict[str, float] | None = None,  # genre -> weighted_score
     ):
-        self.top_artists = top_artists
-        self.top_tracks = top_tracks
-        self.logged_track_ids = logged_track_ids
-        self.liked_artists = liked_artists
-        self.top_tags = top_tags or []
-        self.genre_preferences = genre_preferences or {}
-        
-        # Build lookup dictionaries
-        self._artist_weights = {_normalize_artist(a): (name, score) for name, score in top_artists for a in [name]}
-        self._artist_set = set(self._artist_weights.keys())
-        self._liked_artist_set = {_normalize_artist(a) for a in (liked_artists or set())}
-        self._genre_weights = {_normalize_genre(g): score for g, score in self.genre_preferences.items()}
-        self._tag_weights = {_normalize_tag(t): score for t, score in self.top_tags}
+        top_tags = top_tags or []
+        genre_preferences = genre_preferences or {}
+        intern = strings.intern
+
+        self._artist_names = tuple(name for name, _ in top_artists)
+        self._artist_scores = array("d", (score for _, score in top_artists))
+        self._track_names = tuple(t for t, _, _ in top_tracks)
+        self._track_artists = tuple(a for _, a, _ in top_tracks)
+        self._track_scores = array("d", (score for _, _, score in top_tracks))
+        self._tag_names = tuple(t for t, _ in top_tags)
+        self._tag_scores = array("d", (score for _, score in top_tags))
+        self._genre_names = tuple(genre_preferences)
+        self._genre_scores = array("d", genre_preferences.values())
+
+        # Build lookup tables (later duplicates of a normalized key win, as with a dict)
+        self._artist_keys, self._artist_key_scores = _sorted_lookup(
+            {intern(_normalize_artist(name)): score for name, score in top_artists}
+        )
+        self._genre_keys, self._genre_key_scores = _sorted_lookup(
+            {intern(_normalize_genre(g)): score for g, score in genre_preferences.items()}
+        )
+        self._tag_keys, self._tag_key_scores = _sorted_lookup(
+            {intern(_normalize_tag(t)): score for t, score in top_tags}
+        )
+        self._logged_ids = frozenset(logged_track_ids)
+        liked_artists = sorted(liked_artists or set())
+        self._liked_names = tuple(liked_artists)
+        self._liked_keys = array("q", sorted({intern(_normalize_artist(a)) for a in liked_artists}))
+
+    # Read-only views matching the original attributes
+    @property
+    def top_artists(self) -> list[tuple[str, float]]:
+        return list(zip(self._artist_names, self._artist_scores))
+
+    @property
+    def top_tracks(self) -> list[tuple[str, str, float]]:
+        return list(zip(self._track_names, self._track_artists, self._track_scores))
+
+    @property
+    def top_tags(self) -> list[tuple[str, float]]:
+        return list(zip(self._tag_names, self._tag_scores))
+
+    @property
+    def genre_preferences(self) -> Dict[str, float]:
+        return dict(zip(self._genre_names, self._genre_scores))
+
+    @property
+    def logged_track_ids(self) -> frozenset[str]:
+        return self._logged_ids
+
+    @property
+    def liked_artists(self) -> set[str]:
+        return set(self._liked_names)
+
+    @property
+    def _artist_weights(self) -> Dict[str, tuple[str, float]]:
+        return {_normalize_artist(a): (a, s) for a, s in self.top_artists}
+
+    @property
+    def _liked_artist_set(self) -> set[str]:
+        return {strings.string(k) for k in self._liked_keys}
+
+    @property
+    def _genre_weights(self) -> Dict[str, float]:
+        name = strings.string
+        return {name(k): s for k, s in zip(self._genre_keys, self._genre_key_scores)}
+
+    @property
+    def _tag_weights(self) -> Dict[str, float]:
+        name = strings.string
+        return {name(k): s for k, s in zip(self._tag_keys, self._tag_key_scores)}
 
     def artist_score(self, artist: str) -> float:
         """Weight for a candidate artist (higher if user listens to this artist)."""
-        key = _normalize_artist(artist)
-        if key not in self._artist_weights:
+        score = _lookup(self._artist_keys, self._artist_key_scores, _normalize_artist(artist))
+        if score is None:
             return 0.0
-        _, score = self._artist_weights[key]
         # Normalize to 0-1.0 range (score is typically 1-20 range)
         return min(1.0, score / 20.0)
 
@@ -92,8 +210,7 @@ class UserProfile:
         """Weight for a candidate genre (higher if user listens to this genre)."""
         if not genre:
             return 0.0
-        key = _normalize_genre(genre)
-        score = self._genre_weights.get(key, 0.0)
+        score = _lookup(self._genre_keys, self._genre_key_scores, _normalize_genre(genre)) or 0.0
         # Normalize to 0-1.0 range (score is typically 1-20 range)
         return min(1.0, score / 20.0)
 
@@ -101,165 +218,525 @@ class UserProfile:
         """Weight for a candidate tag (higher if user uses this tag)."""
         if not tag:
             return 0.0
-        key = _normalize_tag(tag)
-        score = self._tag_weights.get(key, 0.0)
+        score = _lookup(self._tag_keys, self._tag_key_scores, _normalize_tag(tag)) or 0.0
         # Normalize to 0-1.0 range
         return min(1.0, score / 20.0)
 
     def is_logged(self, track_id: str) -> bool:
-        return (track_id or "").strip().lower() in self.logged_track_ids
+        return (track_id or "").strip().lower() in self._logged_ids
 
     def is_liked_artist(self, artist: str) -> bool:
-        return _normalize_artist(artist) in self._liked_artist_set
+        return _contains(self._liked_keys, _normalize_artist(artist))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form, used by the shared cache backend."""
+        return {
+            "top_artists": [[a, s] for a, s in self.top_artists],
+            "top_tracks": [[t, a, s] for t, a, s in self.top_tracks],
+            "logged_track_ids": sorted(self.logged_track_ids),
+            "liked_artists": sorted(self.liked_artists),
+            "top_tags": [[t, s] for t, s in self.top_tags],
+            "genre_preferences": self.genre_preferences,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "UserProfile":
+        return cls(
+            top_artists=[(a, s) for a, s in data.get("top_artists", [])],
+            top_tracks=[(t, a, s) for t, a, s in data.get("top_tracks", [])],
+            logged_track_ids=set(data.get("logged_track_ids", [])),
+            liked_artists=set(data.get("liked_artists", [])),
+            top_tags=[(t, s) for t, s in data.get("top_tags", [])],
+            genre_preferences=dict(data.get("genre_preferences", {})),
+        )
 
+    def to_bytes(self) -> bytes:
+        """Compact binary encoding (marshal of name lists + raw float arrays) for caching."""
+        return marshal.dumps((
+            self.BYTES_FORMAT,
+            list(self._artist_names), self._artist_scores.tobytes(),
+            list(self._track_names), list(self._track_artists), self._track_scores.tobytes(),
+            list(self._tag_names), self._tag_scores.tobytes(),
+            list(self._genre_names), self._genre_scores.tobytes(),
+            sorted(self._logged_ids),
+            list(self._liked_names),
+        ))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "UserProfile":
+        (
+            fmt,
+            artists, artist_scores,
+            tracks, track_artists, track_scores,
+            tags, tag_scores,
+            genres, genre_scores,
+            logged, liked,
+        ) = marshal.loads(data)
+        if fmt != cls.BYTES_FORMAT:
+            raise ValueError(f"Unsupported UserProfile bytes format {fmt}")
+
+        def floats(raw: bytes) -> array:
+            a = array("d")
+            a.frombytes(raw)
+            return a
+
+        return cls(
+            top_artists=list(zip(artists, floats(artist_scores))),
+            top_tracks=list(zip(tracks, track_artists, floats(track_scores))),
+            logged_track_ids=set(logged),
+            liked_artists=set(liked),
+            top_tags=list(zip(tags, floats(tag_scores))),
+            genre_preferences=dict(zip(genres, floats(genre_scores))),
+        )
 
-def get_user_profile(user_id: str) -> UserProfile | None:
+
+LOG_LIMIT = 500  # most recent listening_logs (and artist_logs) that make up a profile
+LOG_COLUMNS = "id, track_id, track, artist, genre, rating, liked, favorite, logged_at"
+ARTIST_LOG_COLUMNS = "id, artist_name, genre, genres, liked, favorite, logged_at"
+
+
+def _log_weight(row: Dict[str, Any]) -> float:
+    recency_weight = _calculate_recency_weight(row.get("logged_at", ""))
+    rating_weight = _calculate_rating_weight(row.get("rating"))
+    favorite_boost = 1.5 if row.get("favorite", False) else 1.0
+    return recency_weight * rating_weight * favorite_boost
+
+
+class ProfileSnapshot:
     """
-    Load listening_logs for user_id from Supabase and build an enhanced personal model.
-    Calculates preferences weighted by rating, recency, and favorites.
-    Returns None if Supabase is not configured or user has no logs.
+    Un-truncated aggregates behind a UserProfile plus the listening_logs version
+    they were built from (latest logged_at + row count). Cached per user so a new
+    log only costs folding in the delta instead of re-aggregating all history.
     """
-    supabase = get_supabase()
-    if not supabase:
-        logger.warning("Supabase client not available")
-        return None
 
+    def __init__(self) -> None:
+        self.artist_scores: Dict[str, float] = defaultdict(float)
+        self.track_scores: Dict[tuple[str, str], float] = defaultdict(float)
+        self.genre_scores: Dict[str, float] = defaultdict(float)
+        self.tag_counts: Counter = Counter()
+        self.logged_ids: set[str] = set()
+        self.liked_artists: set[str] = set()
+        self.latest_logged_at: str = ""
+        self.log_count = 0
+        self.built_at = time.time()
+
+    def fold(self, rows: list[Dict[str, Any]], log_tag_names: Dict[Any, list[str]]) -> None:
+        """Add listening_logs rows (and the tag names attached to them) to the aggregates."""
+        for row in rows:
+            artist = (row.get("artist") or "").strip()
+            track = (row.get("track") or "").strip()
+            genre = (row.get("genre") or "").strip()
+            liked = row.get("liked", False)
+            tid = (row.get("track_id") or _track_id(artist, track)).strip().lower()
+
+            total_weight = _log_weight(row)
+
+            if artist:
+                self.artist_scores[artist] += total_weight
+            if track and artist:
+                self.track_scores[(track, artist)] += total_weight
+            if genre:
+                self.genre_scores[genre] += total_weight
+            if tid:
+                self.logged_ids.add(tid)
+            if liked and artist:
+                self.liked_artists.add(artist)
+
+            log_id = row.get("id")
+            if log_id:
+                for tag_name in log_tag_names.get(log_id, []):
+                    self.tag_counts[tag_name] += total_weight
+
+            logged_at = row.get("logged_at") or ""
+            if logged_at > self.latest_logged_at:
+                self.latest_logged_at = logged_at
+        self.log_count += len(rows)
+
+    def fold_artist_logs(self, rows: list[Dict[str, Any]]) -> None:
+        """Add artist_logs rows (with their resolved tag_names) to the artist, genre and tag aggregates."""
+        for row in rows:
+            artist = (row.get("artist") or row.get("artist_name") or "").strip()
+            genres = list(dict.fromkeys(g.strip() for g in [row.get("genre") or "", *(row.get("genres") or [])] if g and g.strip()))
+
+            # Artist logs carry no rating: recency x favorite only
+            total_weight = _log_weight(row)
+
+            if artist:
+                self.artist_scores[artist] += total_weight
+                if row.get("liked", False):
+                    self.liked_artists.add(artist)
+            for genre in genres:
+                # One artist log spreads its weight over the artist's genres
+                self.genre_scores[genre] += total_weight / len(genres)
+            for tag_name in row.get("tag_names") or []:
+                self.tag_counts[tag_name] += total_weight
+
+            logged_at = row.get("logged_at") or ""
+            if logged_at > self.latest_logged_at:
+                self.latest_logged_at = logged_at
+        self.log_count += len(rows)
+
+    def to_profile(self) -> UserProfile:
+        # Sort and normalize
+        top_artists = top_k(self.artist_scores.items(), 30, key=lambda x: x[1])
+        top_tracks = [
+            (t, a, score) for (t, a), score in top_k(self.track_scores.items(), 50, key=lambda x: x[1])
+        ]
+        top_tags_list = top_k(self.tag_counts.items(), 20, key=lambda x: x[1])
+        genre_prefs = dict(top_k(self.genre_scores.items(), 20, key=lambda x: x[1]))
+
+        logger.info(f"Profile: {len(top_tags_list)} tags, {len(genre_prefs)} genres, {len(top_artists)} artists")
+        if top_tags_list:
+            logger.info(f"Top tags: {top_tags_list[:5]}")
+        if genre_prefs:
+            logger.info(f"Top genres: {list(genre_prefs.keys())[:5]}")
+
+        return UserProfile(
+            top_artists=top_artists,
+            top_tracks=top_tracks,
+            logged_track_ids=set(self.logged_ids),
+            liked_artists=set(self.liked_artists),
+            top_tags=top_tags_list,
+            genre_preferences=genre_prefs,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "artist_scores": dict(self.artist_scores),
+            "track_scores": [[t, a, s] for (t, a), s in self.track_scores.items()],
+            "genre_scores": dict(self.genre_scores),
+            "tag_counts": dict(self.tag_counts),
+            "logged_ids": sorted(self.logged_ids),
+            "liked_artists": sorted(self.liked_artists),
+            "latest_logged_at": self.latest_logged_at,
+            "log_count": self.log_count,
+            "built_at": self.built_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ProfileSnapshot":
+        snap = cls()
+        snap.artist_scores.update(data.get("artist_scores", {}))
+        snap.track_scores.update({(t, a): s for t, a, s in data.get("track_scores", [])})
+        snap.genre_scores.update(data.get("genre_scores", {}))
+        snap.tag_counts.update(data.get("tag_counts", {}))
+        snap.logged_ids = set(data.get("logged_ids", []))
+        snap.liked_artists = set(data.get("liked_artists", []))
+        snap.latest_logged_at = data.get("latest_logged_at", "")
+        snap.log_count = int(data.get("log_count", 0))
+        snap.built_at = float(data.get("built_at", 0.0))
+        return snap
+
+
+def _snapshot_cache_key(user_id: str) -> str:
+    return f"profile_snapshot:{user_id}"
+
+
+def _profile_cache_key(user_id: str, version: tuple[str, int]) -> str:
+    return f"profile:{user_id}:{version[0]}:{version[1]}"
+
+
+_logs_rpc_retry_at = 0.0
+
+
+def _logs_rpc_available() -> bool:
+    return settings.PROFILE_USE_LOGS_RPC and time.monotonic() >= _logs_rpc_retry_at
+
+
+def _logs_rpc_failed(e: Exception) -> None:
+    """Use the per-table queries for PROFILE_LOGS_RPC_RETRY_SECONDS (e.g. profile_logs.sql not applied yet)."""
+    global _logs_rpc_retry_at
+    _logs_rpc_retry_at = time.monotonic() + settings.PROFILE_LOGS_RPC_RETRY_SECONDS
+    logger.error(f"Profile logs RPC failed, falling back to per-table queries: {e}")
+
+
+def _fetch_logs_version(supabase, user_id: str) -> tuple[str, int] | None:
+    """
+    (latest logged_at, total row count) for the user's logs in one query: listening_logs
+    plus artist_logs via get_user_logs_version, or listening_logs alone without the RPC.
+    """
+    if _logs_rpc_available():
+        try:
+            r = supabase.rpc("get_user_logs_version", {"p_user_id": user_id}).execute()
+            row = (r.data or [{}])[0]
+            return row.get("latest_logged_at") or "", int(row.get("log_count") or 0)
+        except Exception as e:
+            _logs_rpc_failed(e)
     try:
         r = (
             supabase.table("listening_logs")
-            .select("id, track_id, track, artist, genre, rating, liked, favorite, logged_at")
+            .select("logged_at", count="exact")
             .eq("user_id", user_id)
             .order("logged_at", desc=True)
-            .limit(500)
+            .limit(1)
             .execute()
         )
     except Exception as e:
-        logger.error(f"Failed to fetch listening_logs: {e}")
+        logger.error(f"Failed to fetch listening_logs version: {e}")
         return None
+    rows = r.data or []
+    latest = (rows[0].get("logged_at") or "") if rows else ""
+    return latest, int(r.count or 0)
 
-    rows = (r.data or [])
-    if not rows:
-        logger.warning(f"No listening logs found for user {user_id}")
+
+def _fetch_logs(supabase, user_id: str, since: str | None = None) -> list[Dict[str, Any]] | None:
+    """Most recent listening_logs rows (optionally only those logged after `since`)."""
+    try:
+        q = (
+            supabase.table("listening_logs")
+            .select(LOG_COLUMNS)
+            .eq("user_id", user_id)
+        )
+        if since:
+            q = q.gt("logged_at", since)
+        r = q.order("logged_at", desc=True).limit(LOG_LIMIT).execute()
+    except Exception as e:
+        logger.error(f"Failed to fetch listening_logs: {e}")
         return None
+    return r.data or []
 
-    logger.info(f"Loaded {len(rows)} listening logs for user {user_id}")
 
-    log_ids = [row["id"] for row in rows if row.get("id")]
+def _fetch_log_tag_names(supabase, log_ids: list[Any], link_table: str = "log_tags") -> Dict[Any, list[str]]:
+    """Map log_id -> names of the preset and custom tags attached to it (artist_log_tags for artist logs)."""
+    log_tag_names: Dict[Any, list[str]] = defaultdict(list)
+    if not log_ids:
+        return log_tag_names
+    try:
+        lt = supabase.table(link_table).select("log_id, tag_id, user_tag_id").in_("log_id", log_ids).execute()
+
+        # Map log_id to its tags for weighted calculation
+        log_tag_map: Dict[int, list[tuple[str, int]]] = defaultdict(list)
+        preset_tag_ids = set()
+        user_tag_ids = set()
+
+        for lt_row in (lt.data or []):
+            log_id = lt_row.get("log_id")
+            if lt_row.get("tag_id"):
+                preset_tag_ids.add(lt_row["tag_id"])
+                log_tag_map[log_id].append(("preset", lt_row["tag_id"]))
+            if lt_row.get("user_tag_id"):
+                user_tag_ids.add(lt_row["user_tag_id"])
+                log_tag_map[log_id].append(("user", lt_row["user_tag_id"]))
+
+        # Fetch preset tag names
+        preset_tag_map: Dict[int, str] = {}
+        if preset_tag_ids:
+            pt = supabase.table("preset_tags").select("id, name").in_("id", list(preset_tag_ids)).execute()
+            for pt_row in (pt.data or []):
+                preset_tag_map[pt_row["id"]] = (pt_row.get("name") or "").strip()
+
+        # Fetch user tag names
+        user_tag_map: Dict[int, str] = {}
+        if user_tag_ids:
+            ut = supabase.table("tags").select("id, name").in_("id", list(user_tag_ids)).execute()
+            for ut_row in (ut.data or []):
+                user_tag_map[ut_row["id"]] = (ut_row.get("name") or "").strip()
+
+        for log_id, tag_refs in log_tag_map.items():
+            for tag_type, tag_id in tag_refs:
+                tag_name = preset_tag_map.get(tag_id) if tag_type == "preset" else user_tag_map.get(tag_id)
+                if tag_name:
+                    log_tag_names[log_id].append(tag_name)
+    except Exception as e:
+        logger.error(f"Failed to fetch tags: {e}")
+    return log_tag_names
+
 
-    # Fetch tags for these logs
-    tag_counts: Counter = Counter()
-    if log_ids:
+def _fetch_profile_logs(
+    supabase, user_id: str, since: str | None = None
+) -> tuple[list[Dict[str, Any]], list[Dict[str, Any]], Dict[Any, list[str]]] | None:
+    """
+    (listening_logs rows, artist_logs rows, log_id -> tag names) for the profile.
+    With the get_user_profile_logs RPC this is one round trip (tag names resolved
+    server-side); without it, listening_logs and their tags are read table by table
+    and artist logs are left out. None if the logs couldn't be fetched.
+    """
+    if _logs_rpc_available():
+        params: Dict[str, Any] = {"p_user_id": user_id, "p_limit": LOG_LIMIT}
+        if since:
+            params["p_since"] = since
         try:
-            lt = supabase.table("log_tags").select("log_id, tag_id, user_tag_id").in_("log_id", log_ids).execute()
-            
-            # Map log_id to its tags for weighted calculation
-            log_tag_map: Dict[int, list[tuple[str, int]]] = defaultdict(list)
-            preset_tag_ids = set()
-            user_tag_ids = set()
-            
-            for lt_row in (lt.data or []):
-                log_id = lt_row.get("log_id")
-                if lt_row.get("tag_id"):
-                    preset_tag_ids.add(lt_row["tag_id"])
-                    log_tag_map[log_id].append(("preset", lt_row["tag_id"]))
-                if lt_row.get("user_tag_id"):
-                    user_tag_ids.add(lt_row["user_tag_id"])
-                    log_tag_map[log_id].append(("user", lt_row["user_tag_id"]))
-            
-            # Fetch preset tag names
-            preset_tag_map: Dict[int, str] = {}
-            if preset_tag_ids:
-                pt = supabase.table("preset_tags").select("id, name").in_("id", list(preset_tag_ids)).execute()
-                for pt_row in (pt.data or []):
-                    preset_tag_map[pt_row["id"]] = (pt_row.get("name") or "").strip()
-            
-            # Fetch user tag names
-            user_tag_map: Dict[int, str] = {}
-            if user_tag_ids:
-                ut = supabase.table("tags").select("id, name").in_("id", list(user_tag_ids)).execute()
-                for ut_row in (ut.data or []):
-                    user_tag_map[ut_row["id"]] = (ut_row.get("name") or "").strip()
-            
-            # Calculate weighted tag counts
-            for row in rows:
-                log_id = row.get("id")
-                if not log_id:
-                    continue
-                
-                rating = row.get("rating")
-                favorite = row.get("favorite", False)
-                logged_at = row.get("logged_at", "")
-                
-                recency_weight = _calculate_recency_weight(logged_at)
-                rating_weight = _calculate_rating_weight(rating)
-                favorite_boost = 1.5 if favorite else 1.0
-                
-                total_weight = recency_weight * rating_weight * favorite_boost
-                
-                for tag_type, tag_id in log_tag_map.get(log_id, []):
-                    if tag_type == "preset":
-                        tag_name = preset_tag_map.get(tag_id)
-                    else:
-                        tag_name = user_tag_map.get(tag_id)
-                    
-                    if tag_name:
-                        tag_counts[tag_name] += total_weight
+            r = supabase.rpc("get_user_profile_logs", params).execute()
         except Exception as e:
-            logger.error(f"Failed to fetch tags: {e}")
+            _logs_rpc_failed(e)
+        else:
+            rows: list[Dict[str, Any]] = []
+            artist_rows: list[Dict[str, Any]] = []
+            log_tag_names: Dict[Any, list[str]] = {}
+            for row in r.data or []:
+                if row.get("source") == "artist":
+                    artist_rows.append(row)
+                    continue
+                rows.append(row)
+                if row.get("id") and row.get("tag_names"):
+                    log_tag_names[row["id"]] = row["tag_names"]
+            return rows, artist_rows, log_tag_names
+
+    rows = _fetch_logs(supabase, user_id, since=since)
+    if rows is None:
+        return None
+    log_ids = [row["id"] for row in rows if row.get("id")]
+    return rows, [], _fetch_log_tag_names(supabase, log_ids)
+
+
+def _build_snapshot(supabase, user_id: str) -> ProfileSnapshot | None:
+    """Full build from the user's most recent LOG_LIMIT listening_logs and artist_logs."""
+    fetched = _fetch_profile_logs(supabase, user_id)
+    if not fetched or not (fetched[0] or fetched[1]):
+        logger.warning(f"No listening logs found for user {user_id}")
+        return None
+
+    rows, artist_rows, log_tag_names = fetched
+    logger.info(f"Loaded {len(rows)} listening logs and {len(artist_rows)} artist logs for user {user_id}")
+
+    snap = ProfileSnapshot()
+    snap.fold(rows, log_tag_names)
+    snap.fold_artist_logs(artist_rows)
+    return snap
+
+
+def _update_snapshot(supabase, user_id: str, snap: ProfileSnapshot, version: tuple[str, int]) -> ProfileSnapshot | None:
+    """
+    Fold only the logs added since the snapshot into it. Returns None when the
+    delta can't be applied exactly (edits/deletes, or the LOG_LIMIT window would
+    slide), in which case the caller rebuilds from scratch.
+    """
+    latest, count = version
+    delta = count - snap.log_count
+    if delta <= 0 or count > LOG_LIMIT or not snap.latest_logged_at:
+        return None
+    fetched = _fetch_profile_logs(supabase, user_id, since=snap.latest_logged_at)
+    if fetched is None:
+        return None
+    rows, artist_rows, log_tag_names = fetched
+    if len(rows) + len(artist_rows) != delta or max(row.get("logged_at") or "" for row in rows + artist_rows) != latest:
+        return None
+    snap.fold(rows, log_tag_names)
+    snap.fold_artist_logs(artist_rows)
+    logger.info(f"Folded {len(rows) + len(artist_rows)} new logs into cached profile for user {user_id}")
+    return snap
+
+
+def _fetch_summary_profile(supabase, user_id: str) -> UserProfile | None:
+    """
+    Build the profile from server-side aggregates: one RPC returning the top-N
+    artists/tracks/genres/tags (weights already applied), liked artists and logged
+    track ids, over the same most recent LOG_LIMIT logs per table as the Python path.
+    Raises if the RPC is unavailable; returns None if the user has no logs.
+    """
+    r = supabase.rpc("get_user_preference_summary", {"p_user_id": user_id, "p_limit": LOG_LIMIT}).execute()
+    rows = r.data or []
+    if not rows:
+        logger.warning(f"No listening logs found for user {user_id}")
+        return None
 
-    # Calculate weighted preferences
-    artist_scores: Dict[str, float] = defaultdict(float)
-    track_scores: Dict[tuple[str, str], float] = defaultdict(float)
-    genre_scores: Dict[str, float] = defaultdict(float)
+    top_artists: list[tuple[str, float]] = []
+    top_tracks: list[tuple[str, str, float]] = []
+    top_tags: list[tuple[str, float]] = []
+    genre_prefs: Dict[str, float] = {}
     logged_ids: set[str] = set()
     liked_artists: set[str] = set()
-
     for row in rows:
-        artist = (row.get("artist") or "").strip()
-        track = (row.get("track") or "").strip()
-        genre = (row.get("genre") or "").strip()
-        rating = row.get("rating")
-        liked = row.get("liked", False)
-        favorite = row.get("favorite", False)
-        logged_at = row.get("logged_at", "")
-        tid = (row.get("track_id") or _track_id(artist, track)).strip().lower()
-
-        # Calculate weights
-        recency_weight = _calculate_recency_weight(logged_at)
-        rating_weight = _calculate_rating_weight(rating)
-        favorite_boost = 1.5 if favorite else 1.0
-        total_weight = recency_weight * rating_weight * favorite_boost
-
-        if artist:
-            artist_scores[artist] += total_weight
-        if track and artist:
-            track_scores[(track, artist)] += total_weight
-        if genre:
-            genre_scores[genre] += total_weight
-        if tid:
-            logged_ids.add(tid)
-        if liked and artist:
-            liked_artists.add(artist)
-
-    # Sort and normalize
-    top_artists = sorted(artist_scores.items(), key=lambda x: x[1], reverse=True)[:30]
-    top_tracks = [
-        (t, a, score) for (t, a), score in sorted(track_scores.items(), key=lambda x: x[1], reverse=True)[:50]
-    ]
-    top_tags_list = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:20]
-    genre_prefs = dict(sorted(genre_scores.items(), key=lambda x: x[1], reverse=True)[:20])
-
-    logger.info(f"Profile: {len(top_tags_list)} tags, {len(genre_prefs)} genres, {len(top_artists)} artists")
-    if top_tags_list:
-        logger.info(f"Top tags: {top_tags_list[:5]}")
-    if genre_prefs:
-        logger.info(f"Top genres: {list(genre_prefs.keys())[:5]}")
-
+        kind, label, score = row.get("kind"), row.get("label") or "", row.get("score")
+        if kind == "artist":
+            top_artists.append((label, float(score)))
+        elif kind == "track":
+            top_tracks.append((label, row.get("label2") or "", float(score)))
+        elif kind == "tag":
+            top_tags.append((label, float(score)))
+        elif kind == "genre":
+            genre_prefs[label] = float(score)
+        elif kind == "logged_track":
+            logged_ids.add(label)
+        elif kind == "liked_artist":
+            liked_artists.add(label)
+
+    # The RPC ranks within each kind, but row order across a union isn't guaranteed
+    top_artists.sort(key=lambda x: x[1], reverse=True)
+    top_tracks.sort(key=lambda x: x[2], reverse=True)
+    top_tags.sort(key=lambda x: x[1], reverse=True)
+    genre_prefs = dict(sorted(genre_prefs.items(), key=lambda x: x[1], reverse=True))
+
+    logger.info(f"Profile (sql): {len(top_tags)} tags, {len(genre_prefs)} genres, {len(top_artists)} artists")
     return UserProfile(
         top_artists=top_artists,
         top_tracks=top_tracks,
         logged_track_ids=logged_ids,
         liked_artists=liked_artists,
-        top_tags=top_tags_list,
+        top_tags=top_tags,
         genre_preferences=genre_prefs,
     )
+
+
+@timed("profile")
+def get_user_profile(user_id: str) -> UserProfile | None:
+    """
+    Build the user's personal model from listening_logs and artist_logs in Supabase.
+    Calculates preferences weighted by rating, recency, and favorites.
+
+    A snapshot of the aggregates is cached per user and validated against the
+    latest logged_at + row count (one cheap query). If unchanged it is reused;
+    if only new logs were added they are folded in (O(delta)); otherwise, or once
+    the snapshot is older than PROFILE_CACHE_TTL_SECONDS (recency weights drift,
+    tags may have been edited), it is rebuilt from scratch. Logs and their tag
+    names are read in one call (get_user_profile_logs, PROFILE_USE_LOGS_RPC).
+    With PROFILE_USE_SQL_AGGREGATES the server-side summary RPC is used instead.
+    Returns None if Supabase is not configured or user has no logs.
+    """
+    supabase = get_supabase()
+    if not supabase:
+        logger.warning("Supabase client not available")
+        return None
+
+    if settings.PROFILE_USE_SQL_AGGREGATES:
+        try:
+            return _fetch_summary_profile(supabase, user_id)
+        except Exception as e:
+            logger.error(f"get_user_preference_summary failed, falling back to listening_logs: {e}")
+
+    cache = get_cache()
+    version = _fetch_logs_version(supabase, user_id)
+
+    # Hot path: the finished profile for this exact logs version, as compact bytes
+    if version is not None:
+        cached_bytes = cache.get(_profile_cache_key(user_id, version))
+        if isinstance(cached_bytes, bytes):
+            try:
+                return UserProfile.from_bytes(cached_bytes)
+            except (ValueError, TypeError, EOFError) as e:
+                logger.error(f"Ignoring unreadable cached profile: {e}")
+
+    key = _snapshot_cache_key(user_id)
+    cached = cache.get(key)
+    snap = ProfileSnapshot.from_dict(cached) if cached is not None else None
+
+    if version is None:
+        # Supabase unreachable: serve the last known profile if we have one
+        return snap.to_profile() if snap else None
+
+    if snap is not None and (snap.latest_logged_at, snap.log_count) == version:
+        return _cache_profile(cache, user_id, version, snap)
+
+    updated = _update_snapshot(supabase, user_id, snap, version) if snap is not None else None
+    snap = updated or _build_snapshot(supabase, user_id)
+    if snap is None:
+        cache.delete(key)
+        return None
+
+    if snap.latest_logged_at == version[0]:
+        # Record the full row count (may exceed LOG_LIMIT) so the next request can compare cheaply.
+        # If a log landed between the version probe and the fetch, skip caching this round.
+        snap.log_count = version[1]
+        ttl = settings.PROFILE_CACHE_TTL_SECONDS - (time.time() - snap.built_at)
+        cache.set(key, snap.to_dict(), ttl)
+        return _cache_profile(cache, user_id, version, snap)
+    cache.delete(key)
+    return snap.to_profile()
+
+
+def _cache_profile(cache, user_id: str, version: tuple[str, int], snap: ProfileSnapshot) -> UserProfile:
+    """Build the profile from the snapshot and cache it for this logs version (expires with the snapshot)."""
+    profile = snap.to_profile()
+    ttl = settings.PROFILE_CACHE_TTL_SECONDS - (time.time() - snap.built_at)
+    cache.set(_profile_cache_key(user_id, version), profile.to_bytes(), ttl)
+    return profile
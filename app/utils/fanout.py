@@ -0,0 +1,111 @@
+"""Bounded concurrent fan-out for blocking calls (Last.fm lookups, enrichment, etc.)."""
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+import contextvars
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def fan_out_iter(
+    calls: Sequence[Callable[[], T]],
+    max_workers: int,
+    timeout: Optional[float] = None,
+    task_timeout: Optional[float] = None,
+) -> Iterator[Tuple[int, Optional[T]]]:
+    """
+    Like fan_out, but yields (index, result) pairs as the calls finish, fastest
+    first, so callers can stream partial results. A call that raises yields
+    (index, None); calls that time out (see fan_out) are never yielded.
+    The calls are submitted immediately, in a copy of the caller's contextvars
+    context (iterating later, from another context, doesn't change that).
+    """
+    if not calls:
+        return iter(())
+
+    started: Dict[int, float] = {}
+
+    def _run(index: int, fn: Callable[[], T]) -> T:
+        started[index] = time.monotonic()
+        return fn()
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(calls))), thread_name_prefix="fanout")
+    futures: Dict[Future, int] = {
+        executor.submit(contextvars.copy_context().run, _run, i, fn): i
+        for i, fn in enumerate(calls)
+    }
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    return _iter_completed(executor, futures, started, deadline, task_timeout)
+
+
+def _iter_completed(
+    executor: ThreadPoolExecutor,
+    futures: Dict[Future, int],
+    started: Dict[int, float],
+    deadline: Optional[float],
+    task_timeout: Optional[float],
+) -> Iterator[Tuple[int, Optional[Any]]]:
+    pending = set(futures)
+    try:
+        while pending:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                break
+
+            # Sleep until the next thing that can happen: overall deadline or a task's own timeout
+            wait_for = deadline - now if deadline is not None else None
+            if task_timeout is not None:
+                expired = set()
+                for f in pending:
+                    start = started.get(futures[f])
+                    if start is None:
+                        continue
+                    left = start + task_timeout - now
+                    if left <= 0:
+                        expired.add(f)
+                    else:
+                        wait_for = left if wait_for is None else min(wait_for, left)
+                for f in expired:
+                    logger.warning(f"Fan-out task {futures[f]} exceeded {task_timeout}s, dropping it")
+                    pending.discard(f)
+                if not pending:
+                    break
+                if wait_for is None:
+                    wait_for = task_timeout
+
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for f in sorted(done, key=futures.__getitem__):
+                try:
+                    result = f.result()
+                except Exception as e:
+                    logger.error(f"Fan-out task {futures[f]} failed: {e}")
+                    result = None
+                yield futures[f], result
+
+        if pending:
+            logger.warning(f"Fan-out deadline reached with {len(pending)} of {len(futures)} tasks unfinished")
+    finally:
+        # Don't block on stragglers; their results are simply discarded
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def fan_out(
+    calls: Sequence[Callable[[], T]],
+    max_workers: int,
+    timeout: Optional[float] = None,
+    task_timeout: Optional[float] = None,
+) -> List[Optional[T]]:
+    """
+    Run zero-arg callables concurrently on at most max_workers threads.
+    Returns results in input order (deterministic regardless of completion order).
+    A call that raises, runs longer than task_timeout (measured from its own start),
+    or has not finished when the overall timeout expires yields None instead.
+    Each call runs in a copy of the caller's contextvars context.
+    """
+    results: List[Optional[T]] = [None] * len(calls)
+    for index, result in fan_out_iter(calls, max_workers, timeout=timeout, task_timeout=task_timeout):
+        results[index] = result
+    return results
@@ -0,0 +1,42 @@
+"""Process-wide string interning: each distinct string is stored once and referred to by an int id."""
+from typing import Dict, List, Optional
+import threading
+
+
+class StringTable:
+    """
+    Append-only str <-> int table. Ids are stable for the life of the process
+    (not across processes, so never persist them). lookup() never grows the table,
+    which keeps one-off query strings (search candidates etc.) out of it.
+    Entries are never freed, so only intern strings from a vocabulary shared
+    across users (artist, tag, genre names), not per-user ids.
+    """
+
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {}
+        self._strings: List[str] = []
+        self._lock = threading.Lock()
+
+    def intern(self, s: str) -> int:
+        i = self._ids.get(s)
+        if i is not None:
+            return i
+        with self._lock:
+            i = self._ids.get(s)
+            if i is None:
+                i = len(self._strings)
+                self._strings.append(s)
+                self._ids[s] = i
+            return i
+
+    def lookup(self, s: str) -> Optional[int]:
+        return self._ids.get(s)
+
+    def string(self, i: int) -> str:
+        return self._strings[i]
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+
+strings = StringTable()
@@ -0,0 +1,209 @@
+"""
+Request timing spans, Server-Timing headers and Prometheus-style metrics.
+
+    with span("lastfm", method="track.getSimilar"):
+        ...
+
+Every span is observed into a process-wide latency histogram (served on /metrics)
+and, inside an HTTP request, appended to that request's span list, which the
+middleware in app/main.py renders as a Server-Timing header. The list lives in a
+ContextVar, so spans from fan_out threads, run_in_threadpool and asyncio tasks
+land on the request that started them.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+import functools
+import inspect
+import threading
+import time
+
+T = TypeVar("T")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic counter per label set."""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in values]
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram per label set (Prometheus text layout)."""
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, List[float]] = {}  # per-bucket counts..., +Inf count, sum
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _labels(labels)
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[slot] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((k, list(v)) for k, v in self._series.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, counts in series:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', le))} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {repr(round(counts[-1], 6))}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {_format_value(cumulative)}")
+        return lines
+
+
+SPAN_SECONDS = Histogram("app_span_duration_seconds", "Time spent in instrumented hot-path sections")
+SPAN_ERRORS = Counter("app_span_errors_total", "Instrumented sections that raised")
+HTTP_REQUEST_SECONDS = Histogram("app_http_request_duration_seconds", "HTTP request latency by route")
+HTTP_REQUESTS = Counter("app_http_requests_total", "HTTP requests by route and status")
+
+_METRICS = (SPAN_SECONDS, SPAN_ERRORS, HTTP_REQUEST_SECONDS, HTTP_REQUESTS)
+
+# (span name, label, seconds) for the current request; None outside a request
+_request_spans: ContextVar[Optional[List[Tuple[str, str, float]]]] = ContextVar("request_spans", default=None)
+
+
+def record_span(name: str, seconds: float, error: bool = False, **labels: Any) -> None:
+    SPAN_SECONDS.observe(seconds, span=name, **labels)
+    if error:
+        SPAN_ERRORS.inc(span=name, **labels)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((name, ".".join(str(v) for v in labels.values()), seconds))
+
+
+@contextmanager
+def span(name: str, **labels: Any) -> Iterator[None]:
+    """Time the block as `name` (extra labels, e.g. method=, are kept on the histogram)."""
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record_span(name, time.perf_counter() - started, error, **labels)
+
+
+def timed(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorator form of span() for plain and async functions."""
+    def decorator(fn: Callable[..., T]) -> Callable[..., T]:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def collect_spans() -> Iterator[List[Tuple[str, str, float]]]:
+    """Collect the spans recorded in this context (one HTTP request) into a list."""
+    spans: List[Tuple[str, str, float]] = []
+    token = _request_spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _request_spans.reset(token)
+
+
+def server_timing(spans: Sequence[Tuple[str, str, float]], total: Optional[float] = None) -> str:
+    """
+    Server-Timing header value: one entry per span name (and label), durations summed
+    in milliseconds, with the call count in desc when a section ran more than once.
+    Spans that ran concurrently (fan_out) are summed, so entries can exceed the total.
+    """
+    merged: Dict[str, List[float]] = {}
+    for name, label, seconds in spans:
+        key = f"{name}.{label}" if label else name
+        acc = merged.setdefault(key, [0.0, 0])
+        acc[0] += seconds
+        acc[1] += 1
+    parts = []
+    for key, (seconds, count) in merged.items():
+        entry = f"{key};dur={seconds * 1000:.1f}"
+        if count > 1:
+            entry += f';desc="x{int(count)}"'
+        parts.append(entry)
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def observe_request(method: str, route: str, status: int, seconds: float) -> None:
+    HTTP_REQUEST_SECONDS.observe(seconds, method=method, route=route)
+    HTTP_REQUESTS.inc(method=method, route=route, status=status)
+
+
+def render_gauges(prefix: str, stats: Dict[str, Any], help: str) -> List[str]:
+    """Numeric fields of a stats() dict as gauges named {prefix}_{field}."""
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            name = f"{prefix}_{key}"
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {_format_value(value)}"]
+    return lines
+
+
+def render_metrics(extra: Sequence[str] = ()) -> str:
+    """Prometheus text exposition of every metric above, plus pre-rendered extra lines."""
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines += metric.render()
+    lines += extra
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,41 @@
+"""Top-K partial ranking shared by the rerank paths (O(n log k) instead of a full sort)."""
+from typing import Callable, Iterable, List, Optional, TypeVar
+import heapq
+import numpy as np
+
+T = TypeVar("T")
+
+
+def top_k(items: Iterable[T], k: Optional[int], key: Callable[[T], float]) -> List[T]:
+    """
+    The k items with the highest key, best first. Ties keep their input order, so
+    the result equals sorted(items, key=key, reverse=True)[:k]. k=None ranks everything.
+    """
+    if k is None:
+        return sorted(items, key=key, reverse=True)
+    if k <= 0:
+        return []
+    # heapq.nlargest is stable: equal keys come out in input order
+    return heapq.nlargest(k, items, key=key)
+
+
+def top_k_indices(scores: np.ndarray, k: Optional[int]) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first, with ties broken by lower index.
+    Uses argpartition, so selection is O(n) and only the k winners are sorted.
+    """
+    scores = np.asarray(scores, dtype=float)
+    n = scores.shape[0]
+    if k is None or k >= n:
+        # Stable descending argsort
+        return np.lexsort((np.arange(n), -scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Score of the k-th best item; everything strictly above it is in, and the
+    # remaining slots go to items equal to it in index order (stable boundary)
+    kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+    above = np.flatnonzero(scores > kth)
+    tied = np.flatnonzero(scores == kth)[: k - above.shape[0]]
+    chosen = np.concatenate([above, tied])
+    return chosen[np.lexsort((chosen, -scores[chosen]))]
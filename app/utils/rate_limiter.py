@@ -0,0 +1,148 @@
+"""Process-wide token-bucket rate limiter with priority classes and adaptive backoff."""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Dict, Iterator, Optional
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # a user is waiting on this call (search, track/artist lookups)
+    BACKGROUND = 1  # fan-out, prefetch and refresh work that can yield
+
+
+_priority: ContextVar[Priority] = ContextVar("request_priority", default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority: Priority) -> Iterator[None]:
+    """Run the enclosed calls (and fan_out tasks started inside) at the given priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> Priority:
+    return _priority.get()
+
+
+class AdaptiveTokenBucket:
+    """
+    Token bucket refilled at `rate` tokens/second up to `burst`.
+
+    BACKGROUND callers may only take a token while more than `background_reserve`
+    of the bucket is left, so interactive calls always find headroom during bursts.
+
+    on_rate_limited() halves the refill rate (down to min_rate) and drains the
+    bucket; each on_success() adds back a small step until the base rate is
+    reached again (AIMD).
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        background_reserve: float = 0.25,
+        min_rate: float = 0.5,
+        recovery_step: float = 0.25,
+    ):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.background_reserve = background_reserve
+        self.min_rate = min(min_rate, rate)
+        self.recovery_step = recovery_step
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.waited = 0
+        self.rejected = 0
+        self.rate_limited = 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_take(self, priority: Priority) -> float:
+        """Take a token if allowed; otherwise return seconds until one should be."""
+        with self._lock:
+            self._refill(time.monotonic())
+            floor = self.background_reserve * self.burst if priority >= Priority.BACKGROUND else 0.0
+            if self._tokens >= floor + 1.0:
+                self._tokens -= 1.0
+                self.granted += 1
+                return 0.0
+            return (floor + 1.0 - self._tokens) / self.rate
+
+    def acquire(self, priority: Optional[Priority] = None, timeout: Optional[float] = None) -> bool:
+        """Block until a token is granted. Returns False if timeout elapses first."""
+        priority = current_priority() if priority is None else priority
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        waited = False
+        while True:
+            delay = self._try_take(priority)
+            if delay <= 0:
+                if waited:
+                    self._count("waited")
+                return True
+            if deadline is not None and time.monotonic() + delay > deadline:
+                self._count("rejected")
+                return False
+            waited = True
+            time.sleep(delay)
+
+    async def acquire_async(self, priority: Optional[Priority] = None, timeout: Optional[float] = None) -> bool:
+        """Awaitable acquire for the asyncio client; never blocks the event loop."""
+        priority = current_priority() if priority is None else priority
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        waited = False
+        while True:
+            delay = self._try_take(priority)
+            if delay <= 0:
+                if waited:
+                    self._count("waited")
+                return True
+            if deadline is not None and time.monotonic() + delay > deadline:
+                self._count("rejected")
+                return False
+            waited = True
+            await asyncio.sleep(delay)
+
+    def on_rate_limited(self) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2.0)
+            self._tokens = 0.0
+            self._updated = time.monotonic()
+            self.rate_limited += 1
+            rate = self.rate
+        logger.warning(f"Upstream rate limit hit, throttling to {rate:.2f} req/s")
+
+    def on_success(self) -> None:
+        with self._lock:
+            if self.rate < self.base_rate:
+                self.rate = min(self.base_rate, self.rate + self.recovery_step)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "rate": round(self.rate, 3),
+                "base_rate": self.base_rate,
+                "tokens": round(self._tokens, 3),
+                "granted": self.granted,
+                "waited": self.waited,
+                "rejected": self.rejected,
+                "rate_limited": self.rate_limited,
+            }
@@ -0,0 +1,290 @@
+"""
+Local stand-in for the Last.fm REST API, for load tests.
+
+    python -m benchmarks.fake_lastfm [--port 8765] [--latency-ms 80 --jitter-ms 40]
+                                     [--error-rate 0.01] [--rate-limit-rate 0.01]
+    python -m benchmarks.fake_lastfm --record --upstream https://ws.audioscrobbler.com/2.0/
+
+Point the app at it with LASTFM_BASE_URL=http://127.0.0.1:8765/.
+
+Responses come from recorded JSON fixtures when there is one (FIXTURE_DIR/<method>/<key>.json
+for the exact parameters, else FIXTURE_DIR/<method>.json for any call to the method)
+and are otherwise synthesized in Last.fm's response shapes, deterministically per
+parameters so repeated calls look like the same upstream data. With --record every
+request is proxied to --upstream (needs a real LASTFM_API_KEY in the query) and the
+response saved as a fixture.
+
+Injected faults: --error-rate answers HTTP 500, --rate-limit-rate answers Last.fm
+error 29 (rate limit exceeded), --timeout-rate stalls for --timeout-seconds.
+GET /_stats returns per-method call counts, POST /_reset clears them.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlencode, urlparse
+from urllib.request import urlopen
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+
+from benchmarks import synthetic
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "lastfm")
+
+# Query parameters that don't change the response
+IGNORED_PARAMS = {"method", "api_key", "format"}
+
+
+def fixture_key(params: Dict[str, str]) -> str:
+    normalized = "&".join(f"{k}={' '.join(v.strip().lower().split())}" for k, v in sorted(params.items()) if k not in IGNORED_PARAMS)
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def _limit(params: Dict[str, str], default: int = 10) -> int:
+    try:
+        return max(0, min(int(params.get("limit", default)), 200))
+    except ValueError:
+        return default
+
+
+def _track(rng: random.Random, with_match: bool = False) -> Dict[str, Any]:
+    artist = rng.choices(synthetic.ARTISTS, weights=synthetic._ARTIST_W)[0]
+    out: Dict[str, Any] = {
+        "name": synthetic.TRACKS[rng.randrange(len(synthetic.TRACKS))],
+        "mbid": "",
+        "url": "",
+        "artist": {"name": artist, "mbid": "", "url": ""},
+        "playcount": rng.randint(100, 10 ** 6),
+    }
+    if with_match:
+        out["match"] = f"{rng.random():.6f}"
+    return out
+
+
+def _artist(rng: random.Random, with_match: bool = False) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"name": rng.choices(synthetic.ARTISTS, weights=synthetic._ARTIST_W)[0], "mbid": "", "url": ""}
+    if with_match:
+        out["match"] = f"{rng.random():.6f}"
+    return out
+
+
+def _tags(rng: random.Random, n: int) -> List[Dict[str, Any]]:
+    return [{"name": t, "count": 100 - i, "url": ""} for i, t in enumerate(rng.choices(synthetic.TAGS, weights=synthetic._TAG_W, k=n))]
+
+
+def synthesize(method: str, params: Dict[str, str]) -> Dict[str, Any]:
+    """A plausible response for method/params, stable for the same parameters."""
+    rng = random.Random(zlib.crc32(f"{method}?{fixture_key(params)}".encode("utf-8")))
+    n = _limit(params)
+    if method == "track.search":
+        tracks = []
+        for _ in range(n):
+            t = _track(rng)
+            tracks.append({"name": t["name"], "artist": t["artist"]["name"], "mbid": "", "listeners": str(t["playcount"]), "url": ""})
+        return {"results": {"trackmatches": {"track": tracks}, "opensearch:totalResults": str(n * 10)}}
+    if method == "artist.search":
+        return {"results": {"artistmatches": {"artist": [_artist(rng) for _ in range(n)]}}}
+    if method == "track.getInfo":
+        return {"track": {
+            "name": params.get("track", ""),
+            "artist": {"name": params.get("artist", "")},
+            "listeners": str(rng.randint(100, 10 ** 6)),
+            "toptags": {"tag": _tags(rng, rng.randint(0, 5))},
+        }}
+    if method == "track.getSimilar":
+        return {"similartracks": {"track": [_track(rng, with_match=True) for _ in range(n)], "@attr": {"artist": params.get("artist", "")}}}
+    if method == "artist.getSimilar":
+        return {"similarartists": {"artist": [_artist(rng, with_match=True) for _ in range(n)], "@attr": {"artist": params.get("artist", "")}}}
+    if method == "tag.getSimilar":
+        return {"similartags": {"tag": _tags(rng, n)}}
+    if method == "tag.getTopArtists":
+        return {"topartists": {"artist": [_artist(rng) for _ in range(n)]}}
+    if method == "tag.getTopTracks":
+        return {"tracks": {"track": [_track(rng) for _ in range(n)]}}
+    if method == "tag.getTopAlbums":
+        return {"albums": {"album": [{"name": f"Album {rng.randrange(10 ** 5)}", "artist": _artist(rng)} for _ in range(n)]}}
+    if method == "chart.getTopArtists":
+        return {"artists": {"artist": [_artist(rng) for _ in range(n)]}}
+    if method == "chart.getTopTracks":
+        return {"tracks": {"track": [_track(rng) for _ in range(n)]}}
+    return {"error": 3, "message": "Invalid Method - No method with that name in this package"}
+
+
+class FakeLastFm:
+    """Fixture/synthetic responses plus fault injection and per-method counters."""
+
+    def __init__(
+        self,
+        fixture_dir: str = FIXTURE_DIR,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        timeout_seconds: float = 30.0,
+        upstream: Optional[str] = None,
+        seed: int = 0,
+    ):
+        self.fixture_dir = fixture_dir
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.upstream = upstream
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._fixtures: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.calls: Dict[str, int] = {}
+        self.faults: Dict[str, int] = {}
+
+    def _load(self, path: str) -> Optional[Dict[str, Any]]:
+        if path not in self._fixtures:
+            try:
+                with open(path) as f:
+                    self._fixtures[path] = json.load(f)
+            except (OSError, ValueError):
+                self._fixtures[path] = None
+        return self._fixtures[path]
+
+    def _record(self, method: str, params: Dict[str, str]) -> Dict[str, Any]:
+        with urlopen(f"{self.upstream}?{urlencode({**params, 'method': method})}", timeout=30) as resp:
+            data = json.load(resp)
+        path = os.path.join(self.fixture_dir, method, f"{fixture_key(params)}.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(data, f)
+        return data
+
+    def respond(self, method: str, params: Dict[str, str]) -> Dict[str, Any]:
+        if self.upstream:
+            return self._record(method, params)
+        exact = self._load(os.path.join(self.fixture_dir, method, f"{fixture_key(params)}.json"))
+        if exact is not None:
+            return exact
+        default = self._load(os.path.join(self.fixture_dir, f"{method}.json"))
+        return default if default is not None else synthesize(method, params)
+
+    def _count(self, table: Dict[str, int], key: str) -> None:
+        with self._lock:
+            table[key] = table.get(key, 0) + 1
+
+    def handle(self, params: Dict[str, str]) -> tuple[int, Dict[str, Any]]:
+        """(HTTP status, JSON body) for one API request, after latency and fault injection."""
+        method = params.get("method", "")
+        self._count(self.calls, method)
+        with self._lock:
+            roll = self._rng.random()
+            delay = max(0.0, self._rng.gauss(self.latency_ms, self.jitter_ms)) / 1000.0 if self.latency_ms else 0.0
+        if roll < self.timeout_rate:
+            self._count(self.faults, "timeout")
+            time.sleep(self.timeout_seconds)
+        elif delay:
+            time.sleep(delay)
+        roll -= self.timeout_rate
+        if 0 <= roll < self.error_rate:
+            self._count(self.faults, "http_500")
+            return 500, {"error": 16, "message": "There was a temporary error processing your request"}
+        roll -= self.error_rate
+        if 0 <= roll < self.rate_limit_rate:
+            self._count(self.faults, "rate_limited")
+            return 200, {"error": 29, "message": "Rate Limit Exceeded"}
+        return 200, self.respond(method, params)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"calls": dict(self.calls), "total": sum(self.calls.values()), "faults": dict(self.faults)}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.faults.clear()
+
+
+def make_server(fake: FakeLastFm, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+        def _send(self, status: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the app gave up on this call (deadline / timeout)
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            if url.path == "/_stats":
+                self._send(200, fake.stats())
+                return
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            self._send(*fake.handle(params))
+
+        def do_POST(self) -> None:
+            if urlparse(self.path).path == "/_reset":
+                fake.reset()
+                self._send(200, {"ok": True})
+            else:
+                self._send(404, {"error": "not found"})
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(fake: FakeLastFm, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Serve in a daemon thread (port 0 picks a free port: see server.server_address)."""
+    server = make_server(fake, host, port)
+    threading.Thread(target=server.serve_forever, name="fake-lastfm", daemon=True).start()
+    return server
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=FIXTURE_DIR)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-seconds", type=float, default=30.0)
+    parser.add_argument("--record", action="store_true", help="proxy to --upstream and save responses as fixtures")
+    parser.add_argument("--upstream", default="https://ws.audioscrobbler.com/2.0/")
+    args = parser.parse_args(argv)
+
+    fake = FakeLastFm(
+        fixture_dir=args.fixtures,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_seconds=args.timeout_seconds,
+        upstream=args.upstream if args.record else None,
+    )
+    server = make_server(fake, args.host, args.port)
+    print(f"Fake Last.fm on http://{args.host}:{args.port}/ (fixtures: {args.fixtures}{', recording' if args.record else ''})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
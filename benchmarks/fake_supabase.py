@@ -0,0 +1,226 @@
+"""
+In-memory stand-in for the Supabase tables and RPCs the profile builder reads, for load tests.
+
+    fake = FakeSupabase.seeded(users=50, logs_per_user=300)
+    install(fake)   # get_supabase() now returns it
+
+Covers the query-builder subset the app uses (table().select(cols, count=)
+.eq/.gt/.in_/.order/.limit/.range.execute() and rpc(name, params).execute()) over
+listening_logs, artist_logs, log_tags, preset_tags and tags, plus the
+get_user_logs_version and get_user_profile_logs functions from
+"supabase sql/profile_logs.sql". Other RPCs raise, like a database without that
+migration, so the app takes its fallback path. Every execute() is counted
+(table:<name> / rpc:<name>) and can be delayed by latency_ms to model the round trip.
+"""
+from typing import Any, Callable, Dict, List, Optional
+import random
+import threading
+import time
+
+from benchmarks import synthetic
+
+USER_ID_PREFIX = "00000000-0000-4000-8000-"
+
+
+def user_id(i: int) -> str:
+    """Deterministic UUID-shaped id of seeded user i."""
+    return f"{USER_ID_PREFIX}{i:012d}"
+
+
+class _Result:
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class _Query:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self._db = db
+        self._table = table
+        self._filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self._columns: Optional[List[str]] = None
+        self._count = False
+        self._order: Optional[tuple[str, bool]] = None
+        self._limit: Optional[int] = None
+        self._range: Optional[tuple[int, int]] = None
+
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "_Query":
+        cols = [c.strip() for c in columns.split(",") if c.strip()]
+        self._columns = None if cols == ["*"] else cols
+        self._count = count is not None
+        return self
+
+    def eq(self, column: str, value: Any) -> "_Query":
+        self._filters.append(lambda r: r.get(column) == value)
+        return self
+
+    def gt(self, column: str, value: Any) -> "_Query":
+        self._filters.append(lambda r: r.get(column) is not None and r[column] > value)
+        return self
+
+    def in_(self, column: str, values: List[Any]) -> "_Query":
+        allowed = set(values)
+        self._filters.append(lambda r: r.get(column) in allowed)
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "_Query":
+        self._order = (column, desc)
+        return self
+
+    def limit(self, n: int) -> "_Query":
+        self._limit = n
+        return self
+
+    def range(self, start: int, end: int) -> "_Query":
+        self._range = (start, end)
+        return self
+
+    def execute(self) -> _Result:
+        self._db._round_trip(f"table:{self._table}")
+        rows = [r for r in self._db.tables.get(self._table, []) if all(f(r) for f in self._filters)]
+        total = len(rows)
+        if self._order:
+            column, desc = self._order
+            rows.sort(key=lambda r: (r.get(column) is not None, r.get(column) or ""), reverse=desc)
+        if self._range:
+            rows = rows[self._range[0]:self._range[1] + 1]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        if self._columns is not None:
+            rows = [{c: r.get(c) for c in self._columns} for r in rows]
+        else:
+            rows = [dict(r) for r in rows]
+        return _Result(rows, total if self._count else None)
+
+
+class _Rpc:
+    def __init__(self, db: "FakeSupabase", name: str, params: Dict[str, Any]):
+        self._db = db
+        self._name = name
+        self._params = params
+
+    def execute(self) -> _Result:
+        self._db._round_trip(f"rpc:{self._name}")
+        fn = getattr(self._db, f"_rpc_{self._name}", None)
+        if fn is None:
+            raise RuntimeError(f"Could not find the function public.{self._name} in the schema cache")
+        return _Result(fn(**self._params))
+
+
+class FakeSupabase:
+    """Tables as lists of row dicts, queried through the supabase-py call shapes."""
+
+    def __init__(self, tables: Optional[Dict[str, List[Dict[str, Any]]]] = None, latency_ms: float = 0.0):
+        self.tables: Dict[str, List[Dict[str, Any]]] = tables or {}
+        self.latency_ms = latency_ms
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def seeded(cls, users: int = 50, logs_per_user: int = 300, artist_logs_per_user: int = 40, seed: int = 0, latency_ms: float = 0.0) -> "FakeSupabase":
+        """users with synthetic listening_logs (and tags) and artist_logs; ids from user_id(i)."""
+        rng = random.Random(seed)
+        preset_tags = [{"id": i + 1, "name": name} for i, name in enumerate(synthetic.TAGS)]
+        preset_ids = {t["name"]: t["id"] for t in preset_tags}
+        listening_logs: List[Dict[str, Any]] = []
+        artist_logs: List[Dict[str, Any]] = []
+        log_tags: List[Dict[str, Any]] = []
+        for u in range(users):
+            uid = user_id(u)
+            rows = synthetic.listening_logs(logs_per_user, seed=seed * 100_003 + u)
+            tag_names = synthetic.log_tag_names(rows, seed=seed * 100_003 + u)
+            for row in rows:
+                log_id = len(listening_logs) + 1
+                for name in tag_names.get(row["id"], []):
+                    log_tags.append({"log_id": log_id, "tag_id": preset_ids[name], "user_tag_id": None})
+                listening_logs.append({**row, "id": log_id, "user_id": uid})
+            for _ in range(artist_logs_per_user):
+                genres = rng.sample(synthetic.GENRES[:40], k=rng.randint(0, 3))
+                artist_logs.append({
+                    "id": len(artist_logs) + 1,
+                    "user_id": uid,
+                    "artist_name": rng.choices(synthetic.ARTISTS, weights=synthetic._ARTIST_W)[0],
+                    "genre": genres[0] if genres else None,
+                    "genres": genres,
+                    "liked": rng.random() < 0.3,
+                    "favorite": rng.random() < 0.1,
+                    "logged_at": rows[rng.randrange(len(rows))]["logged_at"] if rows else None,
+                })
+        tables = {
+            "listening_logs": listening_logs,
+            "artist_logs": artist_logs,
+            "log_tags": log_tags,
+            "preset_tags": preset_tags,
+            "tags": [],
+        }
+        return cls(tables, latency_ms=latency_ms)
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> _Rpc:
+        return _Rpc(self, name, params or {})
+
+    def _round_trip(self, key: str) -> None:
+        with self._lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+    def _user_rows(self, table: str, user: str, since: Optional[str]) -> List[Dict[str, Any]]:
+        rows = [r for r in self.tables.get(table, []) if r.get("user_id") == user and (since is None or (r.get("logged_at") or "") > since)]
+        rows.sort(key=lambda r: r.get("logged_at") or "", reverse=True)
+        return rows
+
+    def _tag_names(self, link_table: str) -> Dict[Any, List[str]]:
+        preset = {t["id"]: t["name"] for t in self.tables.get("preset_tags", [])}
+        custom = {t["id"]: t["name"] for t in self.tables.get("tags", [])}
+        out: Dict[Any, List[str]] = {}
+        for lt in self.tables.get(link_table, []):
+            name = preset.get(lt.get("tag_id")) or custom.get(lt.get("user_tag_id"))
+            if name and name.strip():
+                out.setdefault(lt["log_id"], []).append(name.strip())
+        return out
+
+    def _rpc_get_user_logs_version(self, p_user_id: str) -> List[Dict[str, Any]]:
+        rows = self._user_rows("listening_logs", p_user_id, None) + self._user_rows("artist_logs", p_user_id, None)
+        latest = max((r.get("logged_at") or "" for r in rows), default=None)
+        return [{"latest_logged_at": latest, "log_count": len(rows)}]
+
+    def _rpc_get_user_profile_logs(self, p_user_id: str, p_since: Optional[str] = None, p_limit: int = 500) -> List[Dict[str, Any]]:
+        track_tags = self._tag_names("log_tags")
+        artist_tags = self._tag_names("artist_log_tags")
+        out: List[Dict[str, Any]] = []
+        for r in self._user_rows("listening_logs", p_user_id, p_since)[:p_limit]:
+            out.append({
+                "source": "track", "id": r["id"], "track_id": r.get("track_id"), "track": r.get("track"),
+                "artist": r.get("artist"), "genre": r.get("genre"), "genres": [], "rating": r.get("rating"),
+                "liked": r.get("liked"), "favorite": r.get("favorite"), "logged_at": r.get("logged_at"),
+                "tag_names": track_tags.get(r["id"], []),
+            })
+        for r in self._user_rows("artist_logs", p_user_id, p_since)[:p_limit]:
+            out.append({
+                "source": "artist", "id": r["id"], "track_id": None, "track": None,
+                "artist": r.get("artist_name"), "genre": r.get("genre"), "genres": r.get("genres") or [], "rating": None,
+                "liked": r.get("liked"), "favorite": r.get("favorite"), "logged_at": r.get("logged_at"),
+                "tag_names": artist_tags.get(r["id"], []),
+            })
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"calls": dict(self.calls), "total": sum(self.calls.values())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+
+
+def install(fake: FakeSupabase) -> None:
+    """Make app.db.supabase_client.get_supabase() return fake (settings need not point anywhere)."""
+    from app.core.config import settings
+    from app.db import supabase_client
+
+    settings.SUPABASE_URL = settings.SUPABASE_URL or "http://fake-supabase.invalid"
+    settings.SUPABASE_SERVICE_ROLE_KEY = settings.SUPABASE_SERVICE_ROLE_KEY or "fake-service-role-key"
+    supabase_client._supabase = fake
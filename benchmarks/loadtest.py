@@ -0,0 +1,266 @@
+"""
+End-to-end load test: the real app under uvicorn against local Last.fm and Supabase stand-ins.
+
+Run from the repo root:
+    python -m benchmarks.loadtest                                   # every endpoint, 10 rps for 20 s each
+    python -m benchmarks.loadtest --endpoints personal,discover --rps 25 --duration 60
+    python -m benchmarks.loadtest --lastfm-latency-ms 150 --lastfm-error-rate 0.02 --cold
+    python -m benchmarks.loadtest --lastfm-rate-limit 1000 --json results.json
+
+Endpoints (one phase each, in order):
+    search    /api/search?q=&user_id=              (half the requests personalized)
+    track     /api/recommendations/track?track=&artist=
+    artist    /api/recommendations/artist?artist=
+    combined  /api/recommendations/combined?track=&artist=
+    personal  /api/recommendations/personal?user_id=
+    discover  /api/recommendations/discover?user_id=
+
+Requests are open-loop: they start on the --rps schedule whether or not earlier
+ones have finished, so a slow server shows up as latency rather than as a lower
+offered rate. Query terms and users are drawn Zipf-like from benchmarks/synthetic,
+so popular seeds repeat and caches get realistic hit rates; --cold clears the app
+cache before each phase. Last.fm is benchmarks/fake_lastfm (fixtures, else
+synthetic responses) with injectable latency and errors, Supabase is
+benchmarks/fake_supabase with --users seeded users.
+
+The app's own Last.fm rate limiter (LASTFM_RATE_LIMIT_PER_SECOND, 5/s by default)
+is kept unless --lastfm-rate-limit overrides it, so cold-cache phases measure
+what production would see. Upstream calls are attributed to the phase that was
+running; background work (snapshot refreshes, taste index writes) that outlives a
+phase can leak a few calls into the next one.
+
+Per endpoint the report shows requests, errors (non-2xx or transport failure),
+achieved throughput, p50/p95/p99 latency and Last.fm / Supabase calls per request.
+"""
+from typing import Any, Callable, Dict, List
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks import synthetic
+from benchmarks.fake_lastfm import FakeLastFm, start_in_thread
+from benchmarks.fake_supabase import FakeSupabase, install, user_id
+
+Params = Callable[[random.Random, int], Dict[str, Any]]
+
+
+def _track_and_artist(rng: random.Random) -> Dict[str, str]:
+    return {
+        "track": synthetic.TRACKS[min(int(rng.paretovariate(1.2)) - 1, len(synthetic.TRACKS) - 1)],
+        "artist": rng.choices(synthetic.ARTISTS, weights=synthetic._ARTIST_W)[0],
+    }
+
+
+def _user(rng: random.Random, users: int) -> str:
+    return user_id(min(int(rng.paretovariate(1.0)) - 1, users - 1))
+
+
+def _search(rng: random.Random, users: int) -> Dict[str, Any]:
+    params: Dict[str, Any] = {"q": _track_and_artist(rng)["track"]}
+    if rng.random() < 0.5:
+        params["user_id"] = _user(rng, users)
+    return params
+
+
+ENDPOINTS: Dict[str, tuple[str, Params]] = {
+    "search": ("/api/search", _search),
+    "track": ("/api/recommendations/track", lambda rng, users: _track_and_artist(rng)),
+    "artist": ("/api/recommendations/artist", lambda rng, users: {"artist": _track_and_artist(rng)["artist"]}),
+    "combined": ("/api/recommendations/combined", lambda rng, users: _track_and_artist(rng)),
+    "personal": ("/api/recommendations/personal", lambda rng, users: {"user_id": _user(rng, users)}),
+    "discover": ("/api/recommendations/discover", lambda rng, users: {"user_id": _user(rng, users)}),
+}
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list (0 if empty)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), int(round(q * len(sorted_values) + 0.5))))
+    return sorted_values[rank - 1]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _configure_app(args: argparse.Namespace, lastfm_url: str, workdir: str) -> None:
+    """Settings are read when app modules are imported, so set them in the environment first."""
+    os.environ["LASTFM_BASE_URL"] = lastfm_url
+    os.environ["LASTFM_API_KEY"] = os.environ.get("LASTFM_API_KEY") or "loadtest"
+    os.environ["CACHE_BACKEND"] = "memory"
+    # Keep the on-disk stores out of .cache so runs start from the same state
+    os.environ["TRACK_METADATA_PATH"] = os.path.join(workdir, "track_metadata.sqlite3")
+    os.environ["TASTE_INDEX_PATH"] = os.path.join(workdir, "taste_index.npz")
+    os.environ["COOCCURRENCE_INDEX_PATH"] = os.path.join(workdir, "cooccurrence_index.json.gz")
+    os.environ["WARM_CHECKPOINT_PATH"] = os.path.join(workdir, "warm_checkpoint.json")
+    if args.lastfm_rate_limit:
+        os.environ["LASTFM_RATE_LIMIT_PER_SECOND"] = str(args.lastfm_rate_limit)
+        os.environ["LASTFM_RATE_LIMIT_BURST"] = str(args.lastfm_rate_limit * 2)
+
+
+def _start_app(port: int) -> Any:
+    import uvicorn
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    threading.Thread(target=server.run, name="loadtest-app", daemon=True).start()
+    deadline = time.monotonic() + 15
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("app did not start within 15 s")
+        time.sleep(0.05)
+    return server
+
+
+async def _run_phase(base_url: str, path: str, make_params: Params, args: argparse.Namespace, seed: int) -> Dict[str, Any]:
+    import httpx
+
+    rng = random.Random(seed)
+    total = max(1, int(args.rps * args.duration))
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    async def one(client: httpx.AsyncClient, params: Dict[str, Any]) -> None:
+        started = time.perf_counter()
+        try:
+            r = await client.get(path, params=params)
+            key = str(r.status_code)
+        except httpx.HTTPError as e:
+            key = type(e).__name__
+        latencies.append(time.perf_counter() - started)
+        statuses[key] = statuses.get(key, 0) + 1
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=256)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        tasks = []
+        phase_start = time.perf_counter()
+        for i in range(total):
+            delay = phase_start + i / args.rps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(client, make_params(rng, args.users))))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - phase_start
+
+    latencies.sort()
+    ok = sum(n for k, n in statuses.items() if k.startswith("2"))
+    return {
+        "requests": total,
+        "errors": total - ok,
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+    }
+
+
+def _print_row(name: str, r: Dict[str, Any]) -> None:
+    n = max(r["requests"], 1)
+    print(
+        f"{name:<10} {r['requests']:>6} {r['errors']:>6} {r['throughput_rps']:>8.1f} "
+        f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} "
+        f"{r['lastfm']['total'] / n:>9.2f} {r['supabase']['total'] / n:>9.2f}"
+    )
+    sys.stdout.flush()
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma-separated endpoint names")
+    parser.add_argument("--rps", type=float, default=10.0, help="target requests per second per phase")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per phase")
+    parser.add_argument("--timeout", type=float, default=30.0, help="client timeout per request")
+    parser.add_argument("--cold", action="store_true", help="clear the app cache before each phase")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--users", type=int, default=50, help="seeded Supabase users")
+    parser.add_argument("--logs-per-user", type=int, default=300)
+    parser.add_argument("--supabase-latency-ms", type=float, default=5.0)
+    parser.add_argument("--lastfm-latency-ms", type=float, default=80.0)
+    parser.add_argument("--lastfm-jitter-ms", type=float, default=30.0)
+    parser.add_argument("--lastfm-error-rate", type=float, default=0.0, help="share of Last.fm calls answered with HTTP 500")
+    parser.add_argument("--lastfm-rate-limit-rate", type=float, default=0.0, help="share answered with Last.fm error 29")
+    parser.add_argument("--lastfm-rate-limit", type=float, default=0.0, help="override LASTFM_RATE_LIMIT_PER_SECOND (0 = keep)")
+    parser.add_argument("--fixtures", default=None, help="Last.fm fixture directory (default benchmarks/fixtures/lastfm)")
+    parser.add_argument("--json", default=None, help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    endpoints = [e for e in args.endpoints.split(",") if e]
+    unknown = [e for e in endpoints if e not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)} (choose from {', '.join(ENDPOINTS)})")
+    if args.rps <= 0 or args.duration <= 0:
+        parser.error("--rps and --duration must be positive")
+
+    fake_kwargs: Dict[str, Any] = {
+        "latency_ms": args.lastfm_latency_ms,
+        "jitter_ms": args.lastfm_jitter_ms,
+        "error_rate": args.lastfm_error_rate,
+        "rate_limit_rate": args.lastfm_rate_limit_rate,
+        "seed": args.seed,
+    }
+    if args.fixtures:
+        fake_kwargs["fixture_dir"] = args.fixtures
+    lastfm = FakeLastFm(**fake_kwargs)
+    lastfm_server = start_in_thread(lastfm)
+    lastfm_url = f"http://127.0.0.1:{lastfm_server.server_address[1]}/"
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    _configure_app(args, lastfm_url, workdir)
+    supabase = FakeSupabase.seeded(args.users, args.logs_per_user, seed=args.seed, latency_ms=args.supabase_latency_ms)
+    install(supabase)
+
+    port = _free_port()
+    server = _start_app(port)
+    # app.main configures INFO logging on import; per-request logs would swamp the report
+    logging.getLogger().setLevel(logging.WARNING)
+    from app.services.cache import get_cache
+    base_url = f"http://127.0.0.1:{port}"
+    print(
+        f"App on {base_url}, Last.fm stand-in on {lastfm_url} ({args.lastfm_latency_ms:.0f}±{args.lastfm_jitter_ms:.0f} ms), "
+        f"{args.users} Supabase users; {args.rps:g} rps x {args.duration:g} s per endpoint{' (cold cache)' if args.cold else ''}"
+    )
+    print(f"{'endpoint':<10} {'reqs':>6} {'errors':>6} {'ok rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'lastfm/r':>9} {'supa/r':>9}")
+
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        for i, name in enumerate(endpoints):
+            if args.cold:
+                get_cache().clear()
+            lastfm.reset()
+            supabase.reset()
+            path, make_params = ENDPOINTS[name]
+            result = asyncio.run(_run_phase(base_url, path, make_params, args, seed=args.seed * 1000 + i))
+            result["lastfm"] = lastfm.stats()
+            result["supabase"] = supabase.stats()
+            results[name] = result
+            _print_row(name, result)
+    finally:
+        # Abandoned background calls fail noisily once the stand-ins stop
+        logging.disable(logging.CRITICAL)
+        server.should_exit = True
+        lastfm_server.shutdown()
+
+    if args.json:
+        payload = {"config": vars(args), "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "results": results}
+        with open(args.json, "w") as f:
+            json.dump(payload, f, indent=2, sort_keys=True)
+        print(f"Wrote {args.json}")
+    return 1 if any(r["errors"] == r["requests"] for r in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Per-profile memory footprint: the previous dict/set UserProfile vs the compact one.
+
+Run from the repo root:
+    python -m benchmarks.profile_memory [--profiles 2000]
+
+Profiles are synthetic but shaped like real ones (30 artists, 50 tracks,
+20 tags, 20 genres, up to 500 logged track ids, a few liked artists) and drawn
+from a shared catalogue, so many users share the same normalized artist, tag
+and genre keys -- which is what the string table exploits. The table is
+reported separately: it is paid once per process, not per profile. Display
+names (track titles, the spellings users typed) and logged track ids are mostly
+distinct across users, so they are not interned; they count toward the
+per-profile size.
+"""
+from typing import Any, Dict
+import argparse
+import json
+import random
+import sys
+import tracemalloc
+
+from app.services.user_profile import UserProfile, _normalize_artist, _normalize_genre, _normalize_tag
+from app.utils.interning import strings
+
+
+class LegacyUserProfile:
+    """Replica of the old representation: originals plus normalized dict/set lookups."""
+
+    def __init__(self, top_artists, top_tracks, logged_track_ids, liked_artists, top_tags=None, genre_preferences=None):
+        self.top_artists = top_artists
+        self.top_tracks = top_tracks
+        self.logged_track_ids = logged_track_ids
+        self.liked_artists = liked_artists
+        self.top_tags = top_tags or []
+        self.genre_preferences = genre_preferences or {}
+        self._artist_weights = {_normalize_artist(name): (name, score) for name, score in top_artists}
+        self._artist_set = set(self._artist_weights.keys())
+        self._liked_artist_set = {_normalize_artist(a) for a in (liked_artists or set())}
+        self._genre_weights = {_normalize_genre(g): score for g, score in self.genre_preferences.items()}
+        self._tag_weights = {_normalize_tag(t): score for t, score in self.top_tags}
+
+
+def _catalogue() -> Dict[str, list[str]]:
+    return {
+        "artists": [f"Artist {i}" for i in range(3000)],
+        "tracks": [f"Track Title {i}" for i in range(20000)],
+        "tags": [f"Tag {i}" for i in range(300)],
+        "genres": [f"Genre {i}" for i in range(150)],
+    }
+
+
+def _profile_kwargs(rng: random.Random, cat: Dict[str, list[str]]) -> Dict[str, Any]:
+    # Fresh str objects (as they would arrive from a JSON payload), not shared catalogue references
+    fresh = lambda s: "".join(list(s))  # noqa: E731
+    artists = rng.sample(cat["artists"], 30)
+    tracks = [(fresh(rng.choice(cat["tracks"])), fresh(rng.choice(artists)), rng.uniform(1, 20)) for _ in range(50)]
+    logged = {fresh(f"{rng.choice(cat['artists'])}_{rng.choice(cat['tracks'])}".lower().replace(" ", "_"))
+              for _ in range(rng.randint(50, 500))}
+    return {
+        "top_artists": [(fresh(a), rng.uniform(1, 20)) for a in artists],
+        "top_tracks": tracks,
+        "logged_track_ids": logged,
+        "liked_artists": {fresh(a) for a in rng.sample(artists, 5)},
+        "top_tags": [(fresh(t), rng.uniform(1, 20)) for t in rng.sample(cat["tags"], 20)],
+        "genre_preferences": {fresh(g): rng.uniform(1, 20) for g in rng.sample(cat["genres"], 20)},
+    }
+
+
+def _measure(cls, n: int, seed: int, cat: Dict[str, list[str]]) -> tuple[list, int, int]:
+    """
+    Build n profiles from freshly generated inputs (so each profile owns whatever
+    strings it keeps, as after a cache/JSON load) and return
+    (profiles, bytes retained by the profiles, bytes retained by the string table).
+    """
+    rng = random.Random(seed)
+    first_id = len(strings)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    profiles = [cls(**_profile_kwargs(rng, cat)) for _ in range(n)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = table = 0
+    for stat in after.compare_to(before, "traceback"):
+        total += stat.size_diff
+        if stat.traceback[0].filename.endswith("interning.py"):
+            table += stat.size_diff  # the table's own dict/list growth
+    # Interned str objects are allocated by the caller but owned by the table
+    table += sum(sys.getsizeof(strings.string(i)) for i in range(first_id, len(strings)))
+    return profiles, total - table, table
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    n = args.profiles
+    cat = _catalogue()
+    legacy, legacy_bytes, _ = _measure(LegacyUserProfile, n, args.seed, cat)
+    del legacy
+
+    table_before = len(strings)
+    compact, compact_bytes, table_bytes = _measure(UserProfile, n, args.seed, cat)
+    blob = compact[0].to_bytes()
+    json_size = len(json.dumps(compact[0].to_dict()).encode())
+
+    print(f"profiles:                {n}")
+    print(f"legacy per profile:      {legacy_bytes / n:,.0f} B")
+    print(f"compact per profile:     {compact_bytes / n:,.0f} B  ({compact_bytes / max(legacy_bytes, 1):.0%} of legacy)")
+    print(f"string table (shared):   {table_bytes:,} B for {len(strings) - table_before:,} strings "
+          f"({table_bytes / n:,.0f} B amortized per profile)")
+    print(f"to_bytes size (1st):     {len(blob):,} B  (JSON {json_size:,} B)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
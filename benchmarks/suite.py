@@ -0,0 +1,256 @@
+"""
+Microbenchmarks for the personal-model hot paths, with JSON baselines.
+
+Run from the repo root:
+    python -m benchmarks.suite                    # compare against benchmarks/baselines.json
+    python -m benchmarks.suite --save             # record a new baseline
+    python -m benchmarks.suite --sizes realistic --stages profile.fold,rerank.personal
+
+Stages (sizes: realistic / extreme):
+    profile.fold          listening_logs + log tags -> ProfileSnapshot -> UserProfile (100, 1k / 10k, 100k logs)
+    candidates.normalize  track.getSimilar payload -> candidate dicts           (10, 20, 50, 1k / 10k, 50k candidates)
+    score.search_batch    score_search_results_batch                            (same candidate sizes)
+    score.search_item     score_search_result, one item at a time
+    score.discover_batch  score_discover_items_batch
+    score.discover_item   score_discover_item, one item at a time
+    rerank.personal       _rerank_by_personal_model(limit=20)
+    dedupe.recommendations  _dedupe_recommendations over RecommendationResponse (30% duplicates)
+
+Each case reports the best wall time over several runs and, from a separate run
+under tracemalloc, the peak memory allocated by the stage. A case regresses when
+its time exceeds the baseline by more than --threshold (and by at least
+--min-delta-ms, so microsecond noise doesn't fail the run), or its peak memory
+by more than --memory-threshold. Any regression exits with status 1.
+Baselines are machine-specific: re-record them on the machine that checks them.
+"""
+from typing import Any, Callable, Dict, List, Tuple
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from app.api.routes.recommendations import RecommendationResponse, _dedupe_recommendations
+from app.services.personal_model import (
+    score_discover_item,
+    score_discover_items_batch,
+    score_search_result,
+    score_search_results_batch,
+)
+from app.services.personal_recommendations import _normalize_track, _rerank_by_personal_model
+from app.services.user_profile import ProfileSnapshot, UserProfile
+from benchmarks import synthetic
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+LOG_SIZES = {"realistic": [100, 1000], "extreme": [10_000, 100_000]}
+# 20 / 50 are what /search and /discover actually score per request
+CANDIDATE_SIZES = {"realistic": [10, 20, 50, 1000], "extreme": [10_000, 50_000]}
+
+# Time budget per case: repeat until either is reached
+MAX_REPEATS = 20
+MAX_CASE_SECONDS = 2.0
+
+
+def _profile(n_logs: int = 1000) -> UserProfile:
+    rows = synthetic.listening_logs(n_logs, seed=1)
+    snap = ProfileSnapshot()
+    snap.fold(rows, synthetic.log_tag_names(rows, seed=1))
+    return snap.to_profile()
+
+
+def _stage_profile_fold(n: int) -> Callable[[], Any]:
+    rows = synthetic.listening_logs(n, seed=n)
+    tags = synthetic.log_tag_names(rows, seed=n)
+
+    def run() -> UserProfile:
+        snap = ProfileSnapshot()
+        snap.fold(rows, tags)
+        return snap.to_profile()
+    return run
+
+
+def _stage_normalize(n: int) -> Callable[[], Any]:
+    payload = synthetic.similar_tracks_payload(n, seed=n)
+
+    def run() -> List[Dict[str, Any]]:
+        out = []
+        for t in payload["similartracks"]["track"]:
+            rec = _normalize_track(t, reason="Similar to Seed", match_score=float(t["match"]) * 100)
+            if rec:
+                out.append(rec)
+        return out
+    return run
+
+
+def _stage_search_batch(n: int) -> Callable[[], Any]:
+    items, profile = synthetic.candidates(n, seed=n), _profile()
+    return lambda: score_search_results_batch(items, profile)
+
+
+def _stage_search_item(n: int) -> Callable[[], Any]:
+    items, profile = synthetic.candidates(n, seed=n), _profile()
+    return lambda: [score_search_result(item, profile) for item in items]
+
+
+def _stage_discover_batch(n: int) -> Callable[[], Any]:
+    items, profile = synthetic.candidates(n, seed=n), _profile()
+    return lambda: score_discover_items_batch(items, profile)
+
+
+def _stage_discover_item(n: int) -> Callable[[], Any]:
+    items, profile = synthetic.candidates(n, seed=n), _profile()
+    return lambda: [score_discover_item(item, profile) for item in items]
+
+
+def _stage_rerank(n: int) -> Callable[[], Any]:
+    items, profile = synthetic.candidates(n, seed=n), _profile()
+    return lambda: _rerank_by_personal_model(items, profile, limit=20)
+
+
+def _stage_dedupe(n: int) -> Callable[[], Any]:
+    items = [
+        RecommendationResponse(**{k: c[k] for k in ("track", "artist", "id", "reason", "match_score")})
+        for c in synthetic.candidates(n, seed=n, duplicate_fraction=0.3)
+    ]
+    return lambda: _dedupe_recommendations(items)
+
+
+STAGES: Dict[str, Tuple[Callable[[int], Callable[[], Any]], Dict[str, List[int]]]] = {
+    "profile.fold": (_stage_profile_fold, LOG_SIZES),
+    "candidates.normalize": (_stage_normalize, CANDIDATE_SIZES),
+    "score.search_batch": (_stage_search_batch, CANDIDATE_SIZES),
+    "score.search_item": (_stage_search_item, CANDIDATE_SIZES),
+    "score.discover_batch": (_stage_discover_batch, CANDIDATE_SIZES),
+    "score.discover_item": (_stage_discover_item, CANDIDATE_SIZES),
+    "rerank.personal": (_stage_rerank, CANDIDATE_SIZES),
+    "dedupe.recommendations": (_stage_dedupe, CANDIDATE_SIZES),
+}
+
+
+def measure(run: Callable[[], Any]) -> Dict[str, float]:
+    """Best-of-N wall time (ms) and tracemalloc peak (KiB) of one stage case."""
+    run()  # warm-up (imports, caches, first-call allocations)
+    times = []
+    budget_end = time.perf_counter() + MAX_CASE_SECONDS
+    while len(times) < MAX_REPEATS and (len(times) < 3 or time.perf_counter() < budget_end):
+        gc.collect()
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    result = run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {"ms": round(min(times) * 1000, 4), "peak_kib": round((peak - base) / 1024, 1), "runs": len(times)}
+
+
+def run_suite(stages: List[str], size_sets: List[str]) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for name in stages:
+        factory, sizes = STAGES[name]
+        for size_set in size_sets:
+            for n in sizes[size_set]:
+                key = f"{name}[{n}]"
+                results[key] = measure(factory(n))
+                r = results[key]
+                print(f"{key:<36} {r['ms']:>11.3f} ms {r['peak_kib']:>12.1f} KiB  ({int(r['runs'])} runs)")
+                sys.stdout.flush()
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float,
+    memory_threshold: float,
+    min_delta_ms: float,
+) -> List[str]:
+    """Human-readable regressions of results vs baseline (empty if none)."""
+    regressions = []
+    for key, now in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if now["ms"] > base["ms"] * (1 + threshold) and now["ms"] - base["ms"] >= min_delta_ms:
+            regressions.append(f"{key}: {now['ms']:.3f} ms vs baseline {base['ms']:.3f} ms (+{now['ms'] / base['ms'] - 1:.0%})")
+        if now["peak_kib"] > base["peak_kib"] * (1 + memory_threshold) and now["peak_kib"] - base["peak_kib"] >= 64:
+            regressions.append(
+                f"{key}: peak {now['peak_kib']:.0f} KiB vs baseline {base['peak_kib']:.0f} KiB "
+                f"(+{now['peak_kib'] / max(base['peak_kib'], 1) - 1:.0%})"
+            )
+    return regressions
+
+
+def _environment() -> Dict[str, str]:
+    return {"python": platform.python_version(), "machine": platform.machine(), "processor": platform.processor() or ""}
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated stage names")
+    parser.add_argument("--sizes", choices=["realistic", "extreme", "all"], default="all")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.3, help="allowed time regression (0.3 = +30%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.25, help="allowed peak memory regression")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="ignore time regressions smaller than this")
+    parser.add_argument("--output", default=None, help="also write this run's results to a JSON file")
+    args = parser.parse_args(argv)
+
+    # Profile rollups log at INFO on every build
+    logging.getLogger("app.services.user_profile").setLevel(logging.WARNING)
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+    size_sets = ["realistic", "extreme"] if args.sizes == "all" else [args.sizes]
+
+    results = run_suite(stages, size_sets)
+    payload = {"environment": _environment(), "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(payload, f, indent=2, sort_keys=True)
+
+    if args.save:
+        # Merge so a partial run (--stages / --sizes) only replaces its own cases
+        existing: Dict[str, Any] = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                existing = json.load(f).get("results", {})
+        payload["results"] = {**existing, **results}
+        with open(args.baseline, "w") as f:
+            json.dump(payload, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save to record one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("environment") != _environment():
+        print(f"Note: baseline recorded on {baseline.get('environment')}, this is {_environment()}")
+    regressions = compare(results, baseline.get("results", {}), args.threshold, args.memory_threshold, args.min_delta_ms)
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond threshold:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
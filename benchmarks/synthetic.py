@@ -0,0 +1,106 @@
+"""
+Synthetic inputs shaped like production data, for benchmarks and load tests.
+
+Artist / track / tag popularity is Zipf-like (a few names are everywhere, most
+are rare), logs spread over two years so every recency bucket is hit, and
+Last.fm payloads use the same JSON shapes the API returns. Everything is
+deterministic for a given seed.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+import random
+
+ARTISTS = [f"Artist {i}" for i in range(5000)]
+TRACKS = [f"Track Title {i}" for i in range(50000)]
+TAGS = [f"tag {i}" for i in range(400)]
+GENRES = [f"genre {i}" for i in range(150)]
+
+
+def _zipf_weights(n: int, s: float = 1.0) -> List[float]:
+    return [1.0 / (i + 1) ** s for i in range(n)]
+
+
+_ARTIST_W = _zipf_weights(len(ARTISTS))
+_TAG_W = _zipf_weights(len(TAGS))
+_GENRE_W = _zipf_weights(len(GENRES))
+
+
+def _logged_at(rng: random.Random, now: datetime) -> str:
+    return (now - timedelta(days=rng.uniform(0, 730))).isoformat()
+
+
+def listening_logs(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """listening_logs rows (LOG_COLUMNS) for one heavy user, newest first."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    artists = rng.choices(ARTISTS, weights=_ARTIST_W, k=n)
+    genres = rng.choices(GENRES, weights=_GENRE_W, k=n)
+    rows = []
+    for i in range(n):
+        track = TRACKS[rng.randrange(len(TRACKS))]
+        rows.append({
+            "id": i + 1,
+            "track_id": f"sp{rng.randrange(10 ** 9):09d}" if rng.random() < 0.3 else None,
+            "track": track,
+            "artist": artists[i],
+            "genre": genres[i] if rng.random() < 0.8 else None,
+            "rating": rng.randint(1, 10) if rng.random() < 0.7 else None,
+            "liked": rng.random() < 0.2,
+            "favorite": rng.random() < 0.05,
+            "logged_at": _logged_at(rng, now),
+        })
+    rows.sort(key=lambda r: r["logged_at"], reverse=True)
+    return rows
+
+
+def log_tag_names(rows: List[Dict[str, Any]], seed: int = 0, max_tags: int = 3) -> Dict[Any, List[str]]:
+    """log_id -> attached tag names (0..max_tags per log), as _fetch_log_tag_names returns them."""
+    rng = random.Random(seed)
+    out: Dict[Any, List[str]] = {}
+    for row in rows:
+        k = rng.randint(0, max_tags)
+        if k:
+            out[row["id"]] = rng.choices(TAGS, weights=_TAG_W, k=k)
+    return out
+
+
+def similar_tracks_payload(n: int, seed: int = 0) -> Dict[str, Any]:
+    """A track.getSimilar response with n tracks."""
+    rng = random.Random(seed)
+    tracks = []
+    for _ in range(n):
+        artist = rng.choices(ARTISTS, weights=_ARTIST_W)[0]
+        tracks.append({
+            "name": TRACKS[rng.randrange(len(TRACKS))],
+            "mbid": "" if rng.random() < 0.6 else f"{rng.getrandbits(128):032x}",
+            "match": f"{rng.random():.6f}",
+            "playcount": rng.randint(100, 10 ** 6),
+            "artist": {"name": artist, "mbid": "", "url": ""},
+            "url": "",
+        })
+    return {"similartracks": {"track": tracks, "@attr": {"artist": "Seed"}}}
+
+
+def candidates(n: int, seed: int = 0, duplicate_fraction: float = 0.0) -> List[Dict[str, Any]]:
+    """
+    Normalized recommendation candidates (track, artist, id, reason, match_score, tags,
+    genre) as the recommenders build them; duplicate_fraction of them repeat an earlier id.
+    """
+    rng = random.Random(seed)
+    out: List[Dict[str, Any]] = []
+    for i in range(n):
+        if out and rng.random() < duplicate_fraction:
+            out.append(dict(out[rng.randrange(len(out))]))
+            continue
+        artist = rng.choices(ARTISTS, weights=_ARTIST_W)[0]
+        track = TRACKS[rng.randrange(len(TRACKS))]
+        out.append({
+            "track": track,
+            "artist": artist,
+            "id": f"{artist}_{track}".lower().replace(" ", "_"),
+            "reason": "Similar to Seed",
+            "match_score": round(rng.uniform(0, 100), 2) if rng.random() < 0.8 else None,
+            "tags": rng.choices(TAGS, weights=_TAG_W, k=rng.randint(0, 5)),
+            "genre": rng.choices(GENRES, weights=_GENRE_W)[0] if rng.random() < 0.6 else None,
+        })
+    return out
@@ -0,0 +1,137 @@
+"""
+Recall vs latency of the "listeners like you" LSH index (app/services/taste_index.py).
+
+Run from the repo root:
+    python -m benchmarks.taste_ann [--sizes 10000,100000,1000000] [--configs 32x12x8,32x14x8]
+
+Synthetic users belong to taste clusters: most of each user's artist/tag/genre
+features come from their cluster's pool and the rest are noise, with skewed
+weights. Vectors are generated straight into CSR arrays; the 1M size needs
+~3 GB of RAM and about four minutes per config to build.
+
+Per size and (n_tables x n_bits x probes) config it reports bulk build throughput, single
+incremental insert latency, query latency (p50/p95) and recall@k against a
+brute-force scan over every user.
+"""
+from typing import Dict, List, Tuple
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from app.services.taste_index import TASTE_DIM, TasteIndex
+
+CLUSTERS = 200
+POOL = 60  # features per cluster pool
+PER_USER = 40  # features drawn from the user's cluster pool
+NOISE = 8  # features drawn from the shared noise region
+CHUNK = 100_000
+
+
+def synthetic_users(n: int, seed: int) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """CSR arrays for n users (every row has PER_USER + NOISE distinct features, unit length)."""
+    rng = np.random.default_rng(seed)
+    noise_start = CLUSTERS * POOL
+    noise_span = TASTE_DIM - noise_start
+    width = PER_USER + NOISE
+    idx = np.empty((n, width), dtype=np.int32)
+    val = np.empty((n, width), dtype=np.float32)
+    for lo in range(0, n, CHUNK):
+        m = min(CHUNK, n - lo)
+        cluster = rng.integers(CLUSTERS, size=m)
+        picks = np.argsort(rng.random((m, POOL)), axis=1)[:, :PER_USER]
+        idx[lo:lo + m, :PER_USER] = cluster[:, None] * POOL + picks
+        # Distinct noise features: a random start plus a fixed stride inside the noise region
+        start = rng.integers(noise_span, size=m)
+        idx[lo:lo + m, PER_USER:] = noise_start + (start[:, None] + np.arange(NOISE) * 509) % noise_span
+        weights = rng.gamma(2.0, size=(m, width)).astype(np.float32)
+        weights[:, PER_USER:] *= 0.3
+        val[lo:lo + m] = weights / np.linalg.norm(weights, axis=1, keepdims=True)
+    order = np.argsort(idx, axis=1)
+    idx = np.take_along_axis(idx, order, axis=1)
+    val = np.take_along_axis(val, order, axis=1)
+    indptr = np.arange(0, n * width + 1, width, dtype=np.int64)
+    return [f"u{i}" for i in range(n)], indptr, idx.ravel(), val.ravel()
+
+
+def _row(indptr: np.ndarray, idx: np.ndarray, val: np.ndarray, i: int) -> Tuple[np.ndarray, np.ndarray]:
+    return idx[indptr[i]:indptr[i + 1]], val[indptr[i]:indptr[i + 1]]
+
+
+def run_one(n: int, n_tables: int, n_bits: int, probes: int, queries: int, exact_queries: int, k: int, seed: int) -> Dict[str, float]:
+    users, indptr, idx, val = synthetic_users(n, seed)
+    index = TasteIndex(n_tables=n_tables, n_bits=n_bits, probes=probes)
+
+    started = time.perf_counter()
+    index.add_batch(users, indptr, idx, val)
+    build_s = time.perf_counter() - started
+
+    # Incremental inserts on top of the built index (new users, through the delta)
+    extra_users, extra_indptr, extra_idx, extra_val = synthetic_users(200, seed + 1)
+    insert_times = []
+    for i, user in enumerate(extra_users):
+        row_idx, row_val = _row(extra_indptr, extra_idx, extra_val, i)
+        t = time.perf_counter()
+        index.add(f"new-{user}", row_idx, row_val)
+        insert_times.append(time.perf_counter() - t)
+
+    rng = np.random.default_rng(seed + 2)
+    sample = rng.choice(n, size=queries, replace=False)
+    ann_times, recalls = [], []
+    exact_times = []
+    for qi, i in enumerate(sample):
+        row_idx, row_val = _row(indptr, idx, val, i)
+        t = time.perf_counter()
+        found = index.query(row_idx, row_val, k=k, exclude=users[i])
+        ann_times.append(time.perf_counter() - t)
+        if qi < exact_queries:
+            t = time.perf_counter()
+            truth = index.exact_query(row_idx, row_val, k=k, exclude=users[i])
+            exact_times.append(time.perf_counter() - t)
+            truth_ids = {u for u, _ in truth}
+            recalls.append(len(truth_ids & {u for u, _ in found}) / max(1, len(truth_ids)))
+
+    ms = lambda xs, p: float(np.percentile(xs, p) * 1000)  # noqa: E731
+    return {
+        "users": n,
+        "config": f"{n_tables}x{n_bits}x{probes}",
+        "build_s": round(build_s, 2),
+        "build_users_per_s": round(n / build_s),
+        "insert_p50_ms": round(ms(insert_times, 50), 3),
+        "query_p50_ms": round(ms(ann_times, 50), 3),
+        "query_p95_ms": round(ms(ann_times, 95), 3),
+        "exact_p50_ms": round(ms(exact_times, 50), 3),
+        f"recall_at_{k}": round(float(np.mean(recalls)), 3),
+        "index_mb": round(sum(a.nbytes for a in (index._sigs, index._idx, index._val, index._indptr)) / 1e6
+                          + sum(a.nbytes for a in index._sorted_sigs + index._sorted_rows) / 1e6, 1),
+    }
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated user counts")
+    parser.add_argument("--configs", default="32x12x8,32x14x8,16x10x4", help="comma-separated n_tables x n_bits x probes")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--exact-queries", type=int, default=50, help="queries also run brute force for recall")
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    configs = [tuple(int(x) for x in c.split("x")) for c in args.configs.split(",") if c]
+    for n in sizes:
+        for n_tables, n_bits, probes in configs:
+            result = run_one(n, n_tables, n_bits, probes, args.queries, min(args.exact_queries, args.queries), args.k, args.seed)
+            if args.json:
+                print(json.dumps(result))
+            else:
+                print("  ".join(f"{key}={value}" for key, value in result.items()))
+            sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
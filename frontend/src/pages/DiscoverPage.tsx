@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import { useAuth } from '../contexts/AuthContext';
-import { getDiscoverRecommendations, type RecommendationItem, type Track, type ArtistSearchResult } from '../services/api';
+import { streamDiscoverRecommendations, type RecommendationItem, type Track, type ArtistSearchResult } from '../services/api';
 import { LogSongModal } from '../components/LogSongModal';
 import { LogArtistModal } from '../components/LogArtistModal';
 
@@ -46,10 +46,16 @@ export function DiscoverPage() {
       setError(null);
 
       try {
-        const data = await getDiscoverRecommendations({
-          user_id: currentUserId ?? undefined,
-          limit: 50,
-        });
+        const data = await streamDiscoverRecommendations(
+          { user_id: currentUserId ?? undefined, limit: 50 },
+          (partial) => {
+            // Show sections as they arrive; the ranked list replaces them at the end
+            if (!cancelled) {
+              setItems(partial);
+              setLoading(false);
+            }
+          }
+        );
         if (!cancelled) {
           setItems(data);
           // Update cache
@@ -104,10 +110,16 @@ export function DiscoverPage() {
       setLoading(true);
       setError(null);
       try {
-        const data = await getDiscoverRecommendations({
-          user_id: currentUserId ?? undefined,
-          limit: 50,
-        });
+        const data = await streamDiscoverRecommendations(
+          { user_id: currentUserId ?? undefined, limit: 50 },
+          (partial) => {
+            // Show sections as they arrive; the ranked list replaces them at the end
+            if (!cancelled) {
+              setItems(partial);
+              setLoading(false);
+            }
+          }
+        );
         if (!cancelled) {
           setItems(data);
           discoverCache = {
@@ -93,3 +93,54 @@ export async function getDiscoverRecommendations(
   return res.json();
 }
 
+export interface DiscoverStreamEvent {
+  event: 'section' | 'ranked' | 'error';
+  section?: string;
+  title?: string;
+  items?: RecommendationItem[];
+  dropped?: number;
+  detail?: string;
+}
+
+/**
+ * Discover via the NDJSON stream: onPartial gets the items received so far each time
+ * a section arrives; resolves with the final ranked list (same as getDiscoverRecommendations).
+ */
+export async function streamDiscoverRecommendations(
+  options: { user_id?: string; limit?: number } | undefined,
+  onPartial: (items: RecommendationItem[]) => void
+): Promise<RecommendationItem[]> {
+  const params = new URLSearchParams({
+    limit: String(options?.limit ?? 30),
+  });
+  if (options?.user_id) params.set('user_id', options.user_id);
+
+  const url = API_BASE ? `${API_BASE}/api/recommendations/discover/stream?${params}` : `/api/recommendations/discover/stream?${params}`;
+  const res = await fetch(url);
+  if (!res.ok) {
+    const err = await res.json().catch(() => ({}));
+    throw new Error(err.detail || `Discover failed: ${res.status}`);
+  }
+  if (!res.body) return getDiscoverRecommendations(options);
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  const partial: RecommendationItem[] = [];
+  let buffer = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    buffer += decoder.decode(value, { stream: !done });
+    const lines = buffer.split('\n');
+    buffer = done ? '' : lines.pop() ?? '';
+    for (const line of lines) {
+      if (!line.trim()) continue;
+      const event: DiscoverStreamEvent = JSON.parse(line);
+      if (event.event === 'error') throw new Error(event.detail || 'Discover failed');
+      if (event.event === 'ranked') return event.items ?? [];
+      partial.push(...(event.items ?? []));
+      onPartial([...partial]);
+    }
+    if (done) return partial;
+  }
+}
+
@@ -0,0 +1,91 @@
+-- Batched read path for the profile builder (app/services/user_profile.py)
+-- Run after complete_migration.sql and artist_logs.sql
+--
+-- public.get_user_logs_version(user_id) returns the latest logged_at and the
+-- total row count over listening_logs + artist_logs: the cheap "has anything
+-- changed" probe before a cached profile is reused.
+--
+-- public.get_user_profile_logs(user_id, since, limit) returns the user's most
+-- recent listening_logs and artist_logs (up to `limit` of each, optionally only
+-- those logged after `since`) with the names of their preset/custom tags
+-- already resolved -- one call instead of logs -> log_tags -> preset_tags / tags.
+-- source is 'track' or 'artist'; artist rows have no track, track_id or rating.
+--
+-- Safe to run multiple times.
+
+begin;
+
+create or replace function public.get_user_logs_version(p_user_id uuid)
+returns table (latest_logged_at timestamptz, log_count bigint)
+language sql stable security definer set search_path = public as $$
+  select max(x.logged_at), count(*)
+  from (
+    select l.logged_at from public.listening_logs l where l.user_id = p_user_id
+    union all
+    select a.logged_at from public.artist_logs a where a.user_id = p_user_id
+  ) x
+$$;
+
+create or replace function public.get_user_profile_logs(
+  p_user_id uuid,
+  p_since timestamptz default null,
+  p_limit int default 500
+)
+returns table (
+  source     text,
+  id         bigint,
+  track_id   text,
+  track      text,
+  artist     text,
+  genre      text,
+  genres     text[],
+  rating     int,
+  liked      boolean,
+  favorite   boolean,
+  logged_at  timestamptz,
+  tag_names  text[]
+)
+language sql stable security definer set search_path = public as $$
+  (
+    select 'track', l.id, l.track_id, l.track, l.artist, l.genre, '{}'::text[],
+           l.rating::int, l.liked, l.favorite, l.logged_at,
+           array(
+             select trim(coalesce(pt.name, t.name))
+             from public.log_tags lt
+             left join public.preset_tags pt on pt.id = lt.tag_id
+             left join public.tags t on t.id = lt.user_tag_id
+             where lt.log_id = l.id
+               and trim(coalesce(pt.name, t.name, '')) <> ''
+           )
+    from public.listening_logs l
+    where l.user_id = p_user_id
+      and (p_since is null or l.logged_at > p_since)
+    order by l.logged_at desc
+    limit p_limit
+  )
+  union all
+  (
+    select 'artist', a.id, null::text, null::text, a.artist_name, a.genre, coalesce(a.genres, '{}'::text[]),
+           null::int, a.liked, a.favorite, a.logged_at,
+           array(
+             select trim(coalesce(pt.name, t.name))
+             from public.artist_log_tags alt
+             left join public.preset_tags pt on pt.id = alt.tag_id
+             left join public.tags t on t.id = alt.user_tag_id
+             where alt.log_id = a.id
+               and trim(coalesce(pt.name, t.name, '')) <> ''
+           )
+    from public.artist_logs a
+    where a.user_id = p_user_id
+      and (p_since is null or a.logged_at > p_since)
+    order by a.logged_at desc
+    limit p_limit
+  )
+$$;
+
+revoke all on function public.get_user_logs_version(uuid) from public, anon, authenticated;
+grant execute on function public.get_user_logs_version(uuid) to service_role;
+revoke all on function public.get_user_profile_logs(uuid, timestamptz, int) from public, anon, authenticated;
+grant execute on function public.get_user_profile_logs(uuid, timestamptz, int) to service_role;
+
+commit;
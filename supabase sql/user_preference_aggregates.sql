@@ -0,0 +1,447 @@
+-- Server-side per-user preference aggregates for the personal model
+-- Run after complete_migration.sql, personal_model_indexes.sql and artist_logs.sql
+--
+-- public.user_pref_daily keeps, per user, source table and day, the summed
+-- rating x favorite weight of every artist / track / genre / tag the user logged,
+-- from listening_logs and artist_logs alike. Triggers on listening_logs, log_tags,
+-- artist_logs and artist_log_tags keep it current. Recency is applied at query
+-- time from the day bucket, so stored rows never go stale.
+--
+-- public.get_user_preference_summary(user_id, limit) returns the top-N artists (30),
+-- tracks (50), genres (20) and tags (20) with recency/rating/favorite weights
+-- applied -- same formulas as app/services/user_profile.py, including how
+-- artist logs are folded (ProfileSnapshot.fold_artist_logs) -- plus the user's
+-- liked artists and logged track ids. Like the Python path it only counts the
+-- most recent `limit` (LOG_LIMIT, 500) listening_logs and artist_logs: days after
+-- the oldest day in that window come from the daily buckets, and that day itself
+-- is recomputed from the window's own logs. Logs that tie on logged_at at the
+-- window edge may fall either side, as with the LIMIT in the Python query.
+--
+-- Safe to run multiple times.
+
+begin;
+
+-- =========================
+-- 1) Summary table
+-- =========================
+-- Earlier versions had no source column. The table only holds derived data,
+-- so drop it and let the backfill below rebuild it.
+do $$
+begin
+  if exists (
+    select 1 from information_schema.tables
+    where table_schema = 'public' and table_name = 'user_pref_daily'
+  ) and not exists (
+    select 1 from information_schema.columns
+    where table_schema = 'public' and table_name = 'user_pref_daily' and column_name = 'source'
+  ) then
+    drop table public.user_pref_daily;
+  end if;
+end $$;
+
+create table if not exists public.user_pref_daily (
+  user_id    uuid not null references public.profiles (id) on delete cascade,
+  source     text not null check (source in ('track', 'artist')),  -- listening_logs / artist_logs
+  kind       text not null check (kind in ('artist', 'track', 'genre', 'tag')),
+  item_key   text not null,
+  label      text not null,
+  label2     text,              -- artist name for kind = 'track'
+  logged_on  date not null,
+  weight     double precision not null default 0,
+  primary key (user_id, source, kind, item_key, logged_on)
+);
+
+create index if not exists user_pref_daily_user_source_day_idx
+  on public.user_pref_daily (user_id, source, logged_on);
+
+alter table public.user_pref_daily enable row level security;
+
+drop policy if exists user_pref_daily_select_own on public.user_pref_daily;
+create policy user_pref_daily_select_own on public.user_pref_daily
+for select using (user_id = auth.uid());
+
+-- =========================
+-- 2) Weight helpers (mirror _calculate_rating_weight / _calculate_recency_weight)
+-- =========================
+create or replace function public.user_pref_log_weight(p_rating int, p_favorite boolean)
+returns double precision
+language sql immutable as $$
+  select (case when p_rating is null then 1.0 else 0.5 + (p_rating / 10.0) * 1.5 end)
+       * (case when coalesce(p_favorite, false) then 1.5 else 1.0 end)
+$$;
+
+-- Age in UTC calendar days: a log from 23:59 yesterday is one day old. The
+-- Python _calculate_recency_weight buckets by UTC date the same way.
+create or replace function public.user_pref_recency_weight(p_logged_on date)
+returns double precision
+language sql stable as $$
+  select case
+    when (now() at time zone 'utc')::date - p_logged_on <= 30 then 1.5
+    when (now() at time zone 'utc')::date - p_logged_on <= 90 then 1.0
+    else 0.5
+  end
+$$;
+
+drop function if exists public.user_pref_bump(uuid, text, text, text, text, date, double precision);
+
+create or replace function public.user_pref_bump(
+  p_user_id uuid, p_source text, p_kind text, p_key text, p_label text, p_label2 text,
+  p_logged_on date, p_weight double precision
+)
+returns void
+language plpgsql security definer set search_path = public as $$
+begin
+  if p_key is null or p_key = '' or p_weight = 0 then
+    return;
+  end if;
+
+  insert into public.user_pref_daily as d (user_id, source, kind, item_key, label, label2, logged_on, weight)
+  values (p_user_id, p_source, p_kind, p_key, p_label, p_label2, p_logged_on, p_weight)
+  on conflict (user_id, source, kind, item_key, logged_on)
+  do update set weight = d.weight + excluded.weight;
+
+  delete from public.user_pref_daily
+  where user_id = p_user_id and source = p_source and kind = p_kind and item_key = p_key
+    and logged_on = p_logged_on and abs(weight) < 1e-9;
+end $$;
+
+-- Names of the preset/custom tags attached to one listening log
+create or replace function public.user_pref_log_tag_names(p_log_id bigint)
+returns table (tag_name text)
+language sql stable security definer set search_path = public as $$
+  select trim(coalesce(pt.name, t.name))
+  from public.log_tags lt
+  left join public.preset_tags pt on pt.id = lt.tag_id
+  left join public.tags t on t.id = lt.user_tag_id
+  where lt.log_id = p_log_id
+    and trim(coalesce(pt.name, t.name, '')) <> ''
+$$;
+
+-- Names of the preset/custom tags attached to one artist log
+create or replace function public.user_pref_artist_log_tag_names(p_log_id bigint)
+returns table (tag_name text)
+language sql stable security definer set search_path = public as $$
+  select trim(coalesce(pt.name, t.name))
+  from public.artist_log_tags alt
+  left join public.preset_tags pt on pt.id = alt.tag_id
+  left join public.tags t on t.id = alt.user_tag_id
+  where alt.log_id = p_log_id
+    and trim(coalesce(pt.name, t.name, '')) <> ''
+$$;
+
+-- What one listening log contributes (before recency), as in ProfileSnapshot.fold
+create or replace function public.user_pref_log_items(l public.listening_logs)
+returns table (kind text, item_key text, label text, label2 text, weight double precision)
+language sql stable security definer set search_path = public as $$
+  select x.kind, x.item_key, x.label, x.label2, public.user_pref_log_weight(l.rating, l.favorite)
+  from (
+    select 'artist' as kind, trim(l.artist) as item_key, trim(l.artist) as label, null::text as label2
+    where trim(coalesce(l.artist, '')) <> ''
+    union all
+    select 'track', trim(l.artist) || '::' || trim(l.track), trim(l.track), trim(l.artist)
+    where trim(coalesce(l.artist, '')) <> '' and trim(coalesce(l.track, '')) <> ''
+    union all
+    select 'genre', trim(l.genre), trim(l.genre), null
+    where trim(coalesce(l.genre, '')) <> ''
+    union all
+    select 'tag', n.tag_name, n.tag_name, null
+    from public.user_pref_log_tag_names(l.id) n
+  ) x
+$$;
+
+-- Same for one artist log (ProfileSnapshot.fold_artist_logs): no rating, and the
+-- weight is split evenly over the artist's distinct genres (genre plus genres[])
+create or replace function public.user_pref_artist_log_items(a public.artist_logs)
+returns table (kind text, item_key text, label text, label2 text, weight double precision)
+language sql stable security definer set search_path = public as $$
+  with g as (
+    select distinct trim(x) as genre
+    from unnest(array[a.genre] || coalesce(a.genres, '{}'::text[])) as x
+    where trim(coalesce(x, '')) <> ''
+  )
+  select 'artist', trim(a.artist_name), trim(a.artist_name), null::text, public.user_pref_log_weight(null, a.favorite)
+  where trim(coalesce(a.artist_name, '')) <> ''
+  union all
+  select 'genre', g.genre, g.genre, null, public.user_pref_log_weight(null, a.favorite) / (select count(*) from g)
+  from g
+  union all
+  select 'tag', n.tag_name, n.tag_name, null, public.user_pref_log_weight(null, a.favorite)
+  from public.user_pref_artist_log_tag_names(a.id) n
+$$;
+
+-- Add (p_sign = 1) or remove (p_sign = -1) one log's contribution
+create or replace function public.user_pref_apply_log(l public.listening_logs, p_sign int)
+returns void
+language plpgsql security definer set search_path = public as $$
+declare
+  i record;
+begin
+  for i in select * from public.user_pref_log_items(l) loop
+    perform public.user_pref_bump(
+      l.user_id, 'track', i.kind, i.item_key, i.label, i.label2,
+      (l.logged_at at time zone 'utc')::date, p_sign * i.weight
+    );
+  end loop;
+end $$;
+
+create or replace function public.user_pref_apply_artist_log(a public.artist_logs, p_sign int)
+returns void
+language plpgsql security definer set search_path = public as $$
+declare
+  i record;
+begin
+  for i in select * from public.user_pref_artist_log_items(a) loop
+    perform public.user_pref_bump(
+      a.user_id, 'artist', i.kind, i.item_key, i.label, i.label2,
+      (a.logged_at at time zone 'utc')::date, p_sign * i.weight
+    );
+  end loop;
+end $$;
+
+-- =========================
+-- 3) Triggers
+-- =========================
+create or replace function public.user_pref_listening_logs_trg()
+returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+  -- BEFORE DELETE so the log's log_tags rows are still there to subtract
+  if tg_op in ('UPDATE', 'DELETE') then
+    perform public.user_pref_apply_log(old, -1);
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') then
+    perform public.user_pref_apply_log(new, 1);
+  end if;
+  return coalesce(new, old);
+end $$;
+
+drop trigger if exists user_pref_listening_logs_ins_upd on public.listening_logs;
+create trigger user_pref_listening_logs_ins_upd
+after insert or update of artist, track, genre, rating, favorite, logged_at on public.listening_logs
+for each row execute function public.user_pref_listening_logs_trg();
+
+drop trigger if exists user_pref_listening_logs_del on public.listening_logs;
+create trigger user_pref_listening_logs_del
+before delete on public.listening_logs
+for each row execute function public.user_pref_listening_logs_trg();
+
+create or replace function public.user_pref_log_tags_trg()
+returns trigger
+language plpgsql security definer set search_path = public as $$
+declare
+  lt        public.log_tags := coalesce(new, old);
+  l         public.listening_logs;
+  tag_label text;
+begin
+  -- When the parent log is being deleted it is already gone here; its trigger handled the tags
+  select * into l from public.listening_logs where id = lt.log_id;
+  if not found then
+    return lt;
+  end if;
+
+  select trim(coalesce(pt.name, t.name)) into tag_label
+  from (select 1) x
+  left join public.preset_tags pt on pt.id = lt.tag_id
+  left join public.tags t on t.id = lt.user_tag_id;
+
+  if coalesce(tag_label, '') <> '' then
+    perform public.user_pref_bump(
+      l.user_id, 'track', 'tag', tag_label, tag_label, null,
+      (l.logged_at at time zone 'utc')::date,
+      (case when tg_op = 'DELETE' then -1 else 1 end) * public.user_pref_log_weight(l.rating, l.favorite)
+    );
+  end if;
+  return lt;
+end $$;
+
+drop trigger if exists user_pref_log_tags_ins_del on public.log_tags;
+create trigger user_pref_log_tags_ins_del
+after insert or delete on public.log_tags
+for each row execute function public.user_pref_log_tags_trg();
+
+create or replace function public.user_pref_artist_logs_trg()
+returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+  -- BEFORE DELETE so the log's artist_log_tags rows are still there to subtract
+  if tg_op in ('UPDATE', 'DELETE') then
+    perform public.user_pref_apply_artist_log(old, -1);
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') then
+    perform public.user_pref_apply_artist_log(new, 1);
+  end if;
+  return coalesce(new, old);
+end $$;
+
+drop trigger if exists user_pref_artist_logs_ins_upd on public.artist_logs;
+create trigger user_pref_artist_logs_ins_upd
+after insert or update of artist_name, genre, genres, favorite, logged_at on public.artist_logs
+for each row execute function public.user_pref_artist_logs_trg();
+
+drop trigger if exists user_pref_artist_logs_del on public.artist_logs;
+create trigger user_pref_artist_logs_del
+before delete on public.artist_logs
+for each row execute function public.user_pref_artist_logs_trg();
+
+create or replace function public.user_pref_artist_log_tags_trg()
+returns trigger
+language plpgsql security definer set search_path = public as $$
+declare
+  alt       public.artist_log_tags := coalesce(new, old);
+  a         public.artist_logs;
+  tag_label text;
+begin
+  -- When the parent log is being deleted it is already gone here; its trigger handled the tags
+  select * into a from public.artist_logs where id = alt.log_id;
+  if not found then
+    return alt;
+  end if;
+
+  select trim(coalesce(pt.name, t.name)) into tag_label
+  from (select 1) x
+  left join public.preset_tags pt on pt.id = alt.tag_id
+  left join public.tags t on t.id = alt.user_tag_id;
+
+  if coalesce(tag_label, '') <> '' then
+    perform public.user_pref_bump(
+      a.user_id, 'artist', 'tag', tag_label, tag_label, null,
+      (a.logged_at at time zone 'utc')::date,
+      (case when tg_op = 'DELETE' then -1 else 1 end) * public.user_pref_log_weight(null, a.favorite)
+    );
+  end if;
+  return alt;
+end $$;
+
+drop trigger if exists user_pref_artist_log_tags_ins_del on public.artist_log_tags;
+create trigger user_pref_artist_log_tags_ins_del
+after insert or delete on public.artist_log_tags
+for each row execute function public.user_pref_artist_log_tags_trg();
+
+-- =========================
+-- 4) Rebuild / backfill
+-- =========================
+-- Recompute one user's rows from raw logs (e.g. after renaming a tag)
+create or replace function public.refresh_user_pref_daily(p_user_id uuid)
+returns void
+language plpgsql security definer set search_path = public as $$
+declare
+  l public.listening_logs;
+  a public.artist_logs;
+begin
+  delete from public.user_pref_daily where user_id = p_user_id;
+  for l in select * from public.listening_logs where user_id = p_user_id loop
+    perform public.user_pref_apply_log(l, 1);
+  end loop;
+  for a in select * from public.artist_logs where user_id = p_user_id loop
+    perform public.user_pref_apply_artist_log(a, 1);
+  end loop;
+end $$;
+
+do $$
+declare
+  u uuid;
+begin
+  for u in
+    select x.user_id from (
+      select l.user_id from public.listening_logs l
+      union
+      select a.user_id from public.artist_logs a
+    ) x
+    where not exists (select 1 from public.user_pref_daily d where d.user_id = x.user_id)
+  loop
+    perform public.refresh_user_pref_daily(u);
+  end loop;
+end $$;
+
+-- =========================
+-- 5) Read path for the API
+-- =========================
+drop function if exists public.get_user_preference_summary(uuid);
+
+create or replace function public.get_user_preference_summary(p_user_id uuid, p_limit int default 500)
+returns table (kind text, label text, label2 text, score double precision)
+language sql stable security definer set search_path = public as $$
+  with track_window as (
+    select l.id, l.track_id, l.track, l.artist, l.liked, l.logged_at
+    from public.listening_logs l
+    where l.user_id = p_user_id
+    order by l.logged_at desc
+    limit p_limit
+  ),
+  artist_window as (
+    select a.id, a.artist_name, a.liked, a.logged_at
+    from public.artist_logs a
+    where a.user_id = p_user_id
+    order by a.logged_at desc
+    limit p_limit
+  ),
+  -- Oldest day inside each full window (null when the user has fewer logs than p_limit,
+  -- in which case every daily bucket counts)
+  edges as (
+    select 'track'::text as source,
+           case when count(*) >= p_limit then (min(w.logged_at) at time zone 'utc')::date end as edge_day
+    from track_window w
+    union all
+    select 'artist',
+           case when count(*) >= p_limit then (min(w.logged_at) at time zone 'utc')::date end
+    from artist_window w
+  ),
+  items as (
+    -- Whole days inside the window, from the trigger-maintained buckets
+    select d.kind, d.item_key, d.label, d.label2, d.logged_on, d.weight
+    from public.user_pref_daily d
+    join edges e on e.source = d.source
+    where d.user_id = p_user_id
+      and (e.edge_day is null or d.logged_on > e.edge_day)
+    union all
+    -- The edge day, where older logs of the same day fall outside the window
+    select i.kind, i.item_key, i.label, i.label2, e.edge_day, i.weight
+    from track_window w
+    join edges e on e.source = 'track' and (w.logged_at at time zone 'utc')::date = e.edge_day
+    join public.listening_logs l on l.id = w.id
+    cross join lateral public.user_pref_log_items(l) i
+    union all
+    select i.kind, i.item_key, i.label, i.label2, e.edge_day, i.weight
+    from artist_window w
+    join edges e on e.source = 'artist' and (w.logged_at at time zone 'utc')::date = e.edge_day
+    join public.artist_logs a on a.id = w.id
+    cross join lateral public.user_pref_artist_log_items(a) i
+  ),
+  scored as (
+    select it.kind, it.item_key, min(it.label) as label, min(it.label2) as label2,
+           sum(it.weight * public.user_pref_recency_weight(it.logged_on)) as score
+    from items it
+    group by it.kind, it.item_key
+  ),
+  ranked as (
+    select s.*, row_number() over (partition by s.kind order by s.score desc, s.item_key) as rn
+    from scored s
+  )
+  select r.kind, r.label, r.label2, r.score
+  from ranked r
+  where r.rn <= case r.kind when 'artist' then 30 when 'track' then 50 else 20 end
+  union all
+  select 'liked_artist', x.artist, null::text, null::double precision
+  from (
+    select trim(w.artist) as artist
+    from track_window w
+    where w.liked and trim(coalesce(w.artist, '')) <> ''
+    union
+    select trim(w.artist_name)
+    from artist_window w
+    where w.liked and trim(coalesce(w.artist_name, '')) <> ''
+  ) x
+  union all
+  select distinct 'logged_track',
+         lower(trim(coalesce(
+           nullif(trim(w.track_id), ''),
+           replace(replace(lower(trim(coalesce(w.artist, ''))) || '_' || lower(trim(coalesce(w.track, ''))), ' ', '_'), '/', '_')
+         ))),
+         null::text, null::double precision
+  from track_window w
+$$;
+
+revoke all on function public.get_user_preference_summary(uuid, int) from public, anon, authenticated;
+grant execute on function public.get_user_preference_summary(uuid, int) to service_role;
+
+commit;
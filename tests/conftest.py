@@ -0,0 +1,22 @@
+"""Shared vocabularies and a random UserProfile factory for the scoring and taste-index tests."""
+import random
+
+from app.services.user_profile import UserProfile
+
+ARTISTS = [f"Artist {i}" for i in range(60)]
+TAGS = [f"tag {i}" for i in range(30)]
+GENRES = [f"genre {i}" for i in range(15)]
+
+
+def random_profile(rng: random.Random, min_artists: int = 1, max_artists: int = 20) -> UserProfile:
+    """A profile over ARTISTS/TAGS/GENRES with random weights, logged tracks and liked artists."""
+    artists = rng.sample(ARTISTS, rng.randint(min_artists, max_artists))
+    return UserProfile(
+        top_artists=[(a, rng.uniform(0.5, 40.0)) for a in artists],
+        top_tracks=[(f"Track {i}", rng.choice(artists), rng.uniform(0.5, 30.0)) for i in range(rng.randint(0, 10))],
+        logged_track_ids={f"artist {rng.randrange(len(ARTISTS))}_track {i}" for i in range(rng.randint(0, 30))},
+        liked_artists=set(rng.sample(artists, rng.randint(0, len(artists)))),
+        # Mixed case so the lower()-keyed tag lookup is exercised
+        top_tags=[(t.upper() if rng.random() < 0.3 else t, rng.uniform(0.5, 15.0)) for t in rng.sample(TAGS, rng.randint(0, 15))],
+        genre_preferences={g: rng.uniform(0.5, 30.0) for g in rng.sample(GENRES, rng.randint(0, 10))},
+    )
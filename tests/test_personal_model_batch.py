@@ -0,0 +1,82 @@
+"""The vectorized scorers must give the same scores as the per-item ones."""
+import random
+
+import numpy as np
+import pytest
+
+from app.services import personal_model
+from app.services.personal_model import (
+    score_discover_item,
+    score_discover_items_batch,
+    score_search_result,
+    score_search_results_batch,
+)
+from app.services.user_profile import UserProfile
+from tests.conftest import ARTISTS, GENRES, TAGS, random_profile
+
+TOLERANCE = 1e-9
+
+
+def _random_candidates(rng: random.Random, n: int) -> list[dict]:
+    items = []
+    for _ in range(n):
+        artist = rng.choice(ARTISTS + ["Unknown Artist", "  artist 3  "])
+        track = f"Track {rng.randrange(40)}"
+        item = {
+            "track": track,
+            "artist": artist,
+            "id": f"{artist}_{track}".lower().replace(" ", "_") if rng.random() < 0.5 else f"{artist.strip().lower()}_{track.lower()}",
+            "reason": "Similar to Seed",
+            "match_score": rng.choice([None, "not a number", round(rng.uniform(-10, 130), 2), str(round(rng.uniform(0, 100), 2))]),
+        }
+        if rng.random() < 0.7:
+            item["tags"] = [t.upper() if rng.random() < 0.2 else t for t in rng.choices(TAGS + ["unseen tag"], k=rng.randint(0, 6))]
+        if rng.random() < 0.7:
+            item["genre"] = rng.choice(GENRES + ["Genre 1", "unseen genre", ""])
+        items.append(item)
+    return items
+
+
+def _assert_batch_matches(items: list[dict], profile: UserProfile) -> None:
+    expected_search = np.array([score_search_result(item, profile) for item in items])
+    expected_discover = np.array([score_discover_item(item, profile) for item in items])
+    np.testing.assert_allclose(score_search_results_batch(items, profile), expected_search, rtol=0, atol=TOLERANCE)
+    np.testing.assert_allclose(score_discover_items_batch(items, profile), expected_discover, rtol=0, atol=TOLERANCE)
+
+
+@pytest.fixture(params=["vectorized", "default"])
+def batch_min_items(request, monkeypatch):
+    """Run once with every list on the array path, once with the small-list fallback."""
+    if request.param == "vectorized":
+        monkeypatch.setattr(personal_model, "BATCH_MIN_ITEMS", 0)
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_batch_matches_per_item_on_random_profiles(seed, batch_min_items):
+    rng = random.Random(seed)
+    _assert_batch_matches(_random_candidates(rng, rng.randint(1, 200)), random_profile(rng))
+
+
+def test_empty_profile(batch_min_items):
+    profile = UserProfile(top_artists=[], top_tracks=[], logged_track_ids=set(), liked_artists=set())
+    _assert_batch_matches(_random_candidates(random.Random(1), 50), profile)
+
+
+def test_candidates_without_tags_or_genre(batch_min_items):
+    items = [
+        {"track": "Track 1", "artist": "Artist 1", "id": "artist_1_track_1"},
+        {"track": "Track 2", "artist": "Artist 2", "id": "x", "tags": [], "genre": None},
+        {"track": "Track 3", "artist": "Artist 3", "id": "y", "tags": None, "genre": "", "match_score": 55},
+    ]
+    _assert_batch_matches(items, random_profile(random.Random(2)))
+
+
+def test_unknown_artist():
+    items = [{"track": "Song", "artist": "Nobody Anyone Knows", "id": "nobody_song", "tags": ["tag 1"], "genre": "genre 1"}]
+    _assert_batch_matches(items, random_profile(random.Random(3)))
+
+
+def test_empty_candidate_list():
+    profile = random_profile(random.Random(4))
+    assert score_search_results_batch([], profile).shape == (0,)
+    assert score_discover_items_batch([], profile).shape == (0,)
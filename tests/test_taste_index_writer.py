@@ -0,0 +1,63 @@
+"""Queued taste-index inserts and background maintenance give the same neighbors as inline inserts."""
+import random
+
+from app.services.taste_index import TasteIndex, TasteIndexWriter, profile_vector
+from app.services.user_profile import UserProfile
+from tests.conftest import random_profile
+
+
+def _profiles(seed: int, users: int, updates: int) -> list[tuple[str, UserProfile]]:
+    """users distinct ids, then updates re-inserts of random existing ids (which retire rows)."""
+    rng = random.Random(seed)
+    out = [(f"user-{i}", random_profile(rng, min_artists=3, max_artists=15)) for i in range(users)]
+    out += [(f"user-{rng.randrange(users)}", random_profile(rng, min_artists=3, max_artists=15)) for _ in range(updates)]
+    return out
+
+
+def test_writer_matches_inline_inserts():
+    items = _profiles(seed=1, users=300, updates=200)
+    inline = TasteIndex(n_tables=8, n_bits=8)
+    for user_id, profile in items:
+        inline.add_profile(user_id, profile)
+
+    queued = TasteIndex(n_tables=8, n_bits=8)
+    writer = TasteIndexWriter(queued, interval=60.0, compact_fraction=0.25)
+    for user_id, profile in items:
+        writer.submit(user_id, profile)
+    assert len(queued) == 0  # nothing is written until the writer runs
+    writer.flush()
+
+    assert len(queued) == len(inline) == 300
+    # Re-submits of a user before the flush collapse into one insert, so no rows are retired
+    assert queued.stats()["rows"] == 300
+    for user_id, profile in list(dict(items).items())[:25]:
+        idx, val = profile_vector(profile)
+        assert queued.exact_query(idx, val, k=10, exclude=user_id) == inline.exact_query(idx, val, k=10, exclude=user_id)
+
+
+def test_maintain_compacts_retired_rows():
+    index = TasteIndex(n_tables=4, n_bits=8)
+    for user_id, profile in _profiles(seed=2, users=50, updates=0):
+        index.add_profile(user_id, profile, reindex=False)
+    for user_id, profile in _profiles(seed=3, users=50, updates=0):
+        index.add_profile(user_id, profile, reindex=False)
+    assert index.stats()["retired_rows"] == 50
+
+    assert index.maintain(compact_fraction=0.25) == "compact"
+    stats = index.stats()
+    assert stats["retired_rows"] == 0 and stats["rows"] == 50 and stats["delta_rows"] == 0
+    assert index.maintain(compact_fraction=0.25) is None
+
+
+def test_reindex_keeps_rows_added_during_the_sort_in_the_delta():
+    index = TasteIndex(n_tables=4, n_bits=8)
+    items = _profiles(seed=4, users=40, updates=0)
+    for user_id, profile in items[:30]:
+        index.add_profile(user_id, profile, reindex=False)
+    index.reindex()
+    for user_id, profile in items[30:]:
+        index.add_profile(user_id, profile, reindex=False)
+    assert index.stats()["delta_rows"] == 10
+    # Every user is still found by an LSH query for their own vector
+    for user_id, profile in items:
+        assert index.query(*profile_vector(profile), k=1)[0][0] == user_id
@@ -0,0 +1,153 @@
+"""Folding new logs into the cached snapshot must give the same profile as a rebuild, and bail out when it can't."""
+from datetime import datetime, timedelta, timezone
+import math
+
+import pytest
+
+from app.services import user_profile
+from app.services.cache import TTLCache
+from app.services.user_profile import LOG_LIMIT, ProfileSnapshot, get_user_profile
+from benchmarks.fake_supabase import FakeSupabase, user_id
+
+USER = user_id(0)
+
+
+@pytest.fixture(params=["rpc", "tables"])
+def path(request, monkeypatch):
+    """Run with the get_user_profile_logs RPC and with the per-table queries."""
+    monkeypatch.setattr(user_profile.settings, "PROFILE_USE_LOGS_RPC", request.param == "rpc")
+    monkeypatch.setattr(user_profile.settings, "PROFILE_USE_SQL_AGGREGATES", False)
+    monkeypatch.setattr(user_profile, "_logs_rpc_retry_at", 0.0)
+    monkeypatch.setattr(user_profile, "get_cache", lambda cache=TTLCache(): cache)
+    return request.param
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Count full rebuilds (as opposed to incremental folds)."""
+    calls = []
+    build = user_profile._build_snapshot
+
+    def counting(supabase, uid):
+        calls.append(uid)
+        return build(supabase, uid)
+    monkeypatch.setattr(user_profile, "_build_snapshot", counting)
+    return calls
+
+
+def _install(monkeypatch, logs: int, artist_logs: int) -> FakeSupabase:
+    fake = FakeSupabase.seeded(users=1, logs_per_user=logs, artist_logs_per_user=artist_logs, seed=3)
+    monkeypatch.setattr(user_profile, "get_supabase", lambda: fake)
+    return fake
+
+
+def _now(offset_seconds: float = 0.0) -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=offset_seconds)).isoformat()
+
+
+def _add_log(fake: FakeSupabase, artist: str, offset_seconds: float, tag_id: int = 1) -> None:
+    log_id = max(r["id"] for r in fake.tables["listening_logs"]) + 1
+    fake.tables["listening_logs"].append({
+        "id": log_id, "user_id": USER, "track_id": None, "track": f"New Track {log_id}", "artist": artist,
+        "genre": "genre 1", "rating": 9, "liked": True, "favorite": False, "logged_at": _now(offset_seconds),
+    })
+    fake.tables["log_tags"].append({"log_id": log_id, "tag_id": tag_id, "user_tag_id": None})
+
+
+def _add_artist_log(fake: FakeSupabase, artist: str, offset_seconds: float) -> None:
+    fake.tables["artist_logs"].append({
+        "id": max(r["id"] for r in fake.tables["artist_logs"]) + 1, "user_id": USER, "artist_name": artist,
+        "genre": "genre 2", "genres": ["genre 2", "genre 3"], "liked": True, "favorite": True,
+        "logged_at": _now(offset_seconds),
+    })
+
+
+def _cached_snapshot() -> ProfileSnapshot:
+    return ProfileSnapshot.from_dict(user_profile.get_cache().get(user_profile._snapshot_cache_key(USER)))
+
+
+def _rebuilt(fake: FakeSupabase) -> ProfileSnapshot:
+    return user_profile._build_snapshot(fake, USER)
+
+
+def _assert_scores_close(got: dict, expected: dict) -> None:
+    assert got.keys() == expected.keys()
+    for key, score in expected.items():
+        assert math.isclose(got[key], score, rel_tol=1e-9, abs_tol=1e-9), key
+
+
+def _assert_same_snapshot(got: ProfileSnapshot, expected: ProfileSnapshot) -> None:
+    _assert_scores_close(got.artist_scores, expected.artist_scores)
+    _assert_scores_close(got.track_scores, expected.track_scores)
+    _assert_scores_close(got.genre_scores, expected.genre_scores)
+    _assert_scores_close(got.tag_counts, expected.tag_counts)
+    assert got.logged_ids == expected.logged_ids
+    assert got.liked_artists == expected.liked_artists
+    assert got.latest_logged_at == expected.latest_logged_at
+
+
+def _assert_same_profile(got, expected) -> None:
+    # Equal scores may tie-break differently at the top-N cut, so compare the score lists
+    for attr in ("top_artists", "top_tags"):
+        assert [s for _, s in getattr(got, attr)] == pytest.approx([s for _, s in getattr(expected, attr)])
+    assert sorted(got.genre_preferences.values()) == pytest.approx(sorted(expected.genre_preferences.values()))
+    assert got.logged_track_ids == expected.logged_track_ids
+    assert got.liked_artists == expected.liked_artists
+
+
+def test_new_logs_fold_into_the_cached_snapshot(path, builds, monkeypatch):
+    fake = _install(monkeypatch, logs=150, artist_logs=20)
+    assert get_user_profile(USER) is not None
+    assert len(builds) == 1
+
+    _add_log(fake, "Artist 0", 1)
+    _add_log(fake, "Brand New Artist", 2, tag_id=7)
+    _add_artist_log(fake, "Artist 1", 3)
+    profile = get_user_profile(USER)
+
+    assert len(builds) == 1  # folded, not rebuilt
+    expected = _rebuilt(fake)
+    _assert_same_snapshot(_cached_snapshot(), expected)
+    _assert_same_profile(profile, expected.to_profile())
+
+
+@pytest.mark.parametrize("change", ["delete", "edit_logged_at", "delete_and_add", "delete_and_add_two"])
+def test_edits_and_deletes_force_a_rebuild(path, builds, monkeypatch, change):
+    fake = _install(monkeypatch, logs=150, artist_logs=20)
+    get_user_profile(USER)
+    logs = fake.tables["listening_logs"]
+    oldest = min(logs, key=lambda r: r["logged_at"])
+
+    if change == "delete":
+        logs.remove(max(logs, key=lambda r: r["logged_at"]))
+    elif change == "edit_logged_at":
+        oldest["logged_at"] = _now(1)  # same count, newer latest
+    elif change == "delete_and_add":
+        logs.remove(oldest)
+        _add_log(fake, "Artist 0", 1)
+    else:
+        logs.remove(oldest)  # count grows by one but two rows are new since the snapshot
+        _add_log(fake, "Artist 0", 1)
+        _add_log(fake, "Artist 2", 2)
+    profile = get_user_profile(USER)
+
+    assert len(builds) == 2
+    expected = _rebuilt(fake)
+    _assert_same_snapshot(_cached_snapshot(), expected)
+    _assert_same_profile(profile, expected.to_profile())
+
+
+def test_window_past_log_limit_forces_a_rebuild(path, builds, monkeypatch):
+    fake = _install(monkeypatch, logs=LOG_LIMIT - 5, artist_logs=0)
+    get_user_profile(USER)
+    for i in range(10):
+        _add_log(fake, f"Artist {i}", i + 1)
+    profile = get_user_profile(USER)
+
+    # Folding the 10 new logs would keep the 5 that slid out of the LOG_LIMIT window
+    assert len(builds) == 2
+    snap = _cached_snapshot()
+    assert snap.log_count == LOG_LIMIT + 5
+    expected = _rebuilt(fake)
+    _assert_same_snapshot(snap, expected)
+    _assert_same_profile(profile, expected.to_profile())